@@ -5,7 +5,7 @@
 echo "⏰ Настройка cron..."
 
 # Устанавливаем crontab напрямую
-(echo 'PATH=/usr/local/bin:/usr/bin:/bin'; echo '* * * * * cd /app && python manage.py check_template_updates >> /app/logs/cron.log 2>&1') | crontab -
+(echo 'PATH=/usr/local/bin:/usr/bin:/bin'; echo '* * * * * cd /app && python manage.py check_template_updates >> /app/logs/cron.log 2>&1'; echo '* * * * * cd /app && python manage.py process_push_events >> /app/logs/cron.log 2>&1'; echo '30 3 * * * cd /app && python manage.py prune_update_logs >> /app/logs/cron.log 2>&1') | crontab -
 
 echo "✅ Cron настроен!"
 echo "📋 Установленные задачи:"
@@ -1,5 +1,121 @@
+from datetime import datetime
+
+from django.conf import settings
 from django.contrib import admin
-from .models import Template, UpdateLog
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.html import format_html, format_html_join
+from .models import PushEvent, Template, UpdateLog
+
+# Параметр запроса с позицией страницы: "<created_at в ISO 8601>_<id>" последней записи предыдущей страницы
+CURSOR_VAR = 'cursor'
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Постраничный вывод без полного COUNT(*) по большим таблицам
+
+    Без фильтров количество берется из статистики PostgreSQL (pg_class.reltuples),
+    если оно больше ADMIN_COUNT_LIMIT. С фильтрами записи считаются не дальше
+    ADMIN_COUNT_LIMIT + 1, и при превышении показывается "более ADMIN_COUNT_LIMIT".
+    """
+
+    # Количество оценено по статистике или ограничено сверху
+    estimated = False
+    capped = False
+
+    def _table_estimate(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        # -1, если таблица еще не анализировалась
+        return row[0] if row and row[0] >= 0 else None
+
+    @cached_property
+    def count(self):
+        limit = settings.ADMIN_COUNT_LIMIT
+        if not self.object_list.query.where:
+            estimate = self._table_estimate()
+            if estimate is not None and estimate > limit:
+                self.estimated = True
+                return estimate
+        # Порядок строк для подсчета не нужен, сортировка только замедлила бы запрос
+        count = self.object_list.order_by()[:limit + 1].count()
+        if count > limit:
+            self.capped = True
+            return limit
+        return count
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Список записей с постраничным переходом по ключу (keyset pagination)
+
+    При сортировке по умолчанию (-created_at, -id) следующая страница выбирается
+    условием "раньше последней показанной записи" по индексу, а не через OFFSET,
+    поэтому открытие дальних страниц не замедляется с ростом таблицы. При другой
+    сортировке используется обычная постраничная навигация.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR)
+        self.keyset = False
+        self.first_page_url = None
+        self.next_page_url = None
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Ссылки фильтров и сортировки ведут на первую страницу
+        if not new_params or CURSOR_VAR not in new_params:
+            remove = list(remove or []) + [CURSOR_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def _parse_cursor(self):
+        try:
+            created_at, pk = self.cursor.rsplit('_', 1)
+            return datetime.fromisoformat(created_at), int(pk)
+        except ValueError:
+            raise IncorrectLookupParameters
+
+    def get_results(self, request):
+        if ORDER_VAR in self.params or self.show_all:
+            return super().get_results(request)
+
+        queryset = self.queryset
+        if self.cursor:
+            created_at, pk = self._parse_cursor()
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+        rows = list(queryset[:self.list_per_page + 1])
+        has_next = len(rows) > self.list_per_page
+        rows = rows[:self.list_per_page]
+
+        # Количество и навигация нужны шаблону списка так же, как при обычной пагинации
+        super().get_results(request)
+        self.result_list = rows
+        self.keyset = True
+        self.can_show_all = False
+        self.multi_page = has_next or bool(self.cursor)
+        if self.cursor:
+            self.first_page_url = self.get_query_string()
+        if has_next:
+            last = rows[-1]
+            self.next_page_url = self.get_query_string({CURSOR_VAR: f'{last.created_at.isoformat()}_{last.pk}'})
 
 
 @admin.register(Template)
@@ -8,21 +124,43 @@ class TemplateAdmin(admin.ModelAdmin):
         'template_code', 
         'current_version', 
         'last_checked', 
+        'next_check_at',
         'status'
     ]
     list_filter = ['status', 'last_checked']
+    # Поиск по подстроке использует триграммный индекс template_code_trgm
     search_fields = ['template_code']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', 'latest_versions_display']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     fieldsets = (
         ('Основная информация', {
             'fields': ('template_code', 'current_version', 'status')
         }),
+        ('История версий', {
+            'fields': ('latest_versions_display',),
+            'classes': ('collapse',)
+        }),
+        ('Расписание проверок', {
+            'fields': ('next_check_at', 'check_interval')
+        }),
         ('Временные метки', {
             'fields': ('last_checked', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
+    
+    @admin.display(description='Последние версии')
+    def latest_versions_display(self, obj):
+        # Выбираются по индексу updatelog_template_version, без загрузки всей истории шаблона
+        if not obj.pk:
+            return '-'
+        update_logs = UpdateLog.objects.filter(template=obj).latest_versions(10)
+        return format_html_join(
+            '', '<div>{} ({})</div>',
+            ((update_log.new_version, update_log.created_at.strftime('%d.%m.%Y %H:%M')) for update_log in update_logs)
+        ) or '-'
 
 
 @admin.register(UpdateLog)
@@ -41,7 +179,15 @@ class UpdateLogAdmin(admin.ModelAdmin):
         'created_at'
     ]
     search_fields = ['template__template_code']
-    readonly_fields = ['created_at']
+    readonly_fields = ['created_at', 'raw_xml_display']
+    # Шаблон загружается в том же запросе (без запроса на каждую строку), исходный XML
+    # хранится в отдельной таблице и в списке не загружается
+    list_select_related = ['template']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
     
     fieldsets = (
         ('Информация об обновлении', {
@@ -56,7 +202,37 @@ class UpdateLogAdmin(admin.ModelAdmin):
             'fields': ('message_status',)
         }),
         ('Дополнительно', {
-            'fields': ('raw_xml', 'created_at'),
+            'fields': ('raw_xml_display', 'created_at'),
             'classes': ('collapse',)
         }),
-    )
\ No newline at end of file
+    )
+    
+    @admin.display(description='Исходный XML')
+    def raw_xml_display(self, obj):
+        # XML хранится сжатым и распаковывается только при открытии записи
+        if not obj.raw_xml:
+            return '-'
+        return format_html('<pre style="white-space: pre-wrap">{}</pre>', obj.raw_xml)
+
+
+@admin.register(PushEvent)
+class PushEventAdmin(admin.ModelAdmin):
+    list_display = [
+        'template_code',
+        'version',
+        'status',
+        'result',
+        'received_at',
+        'processed_at'
+    ]
+    list_filter = ['status', 'received_at']
+    search_fields = ['template_code']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    # События создаются только через /push и обрабатываются очередью
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import xml.etree.ElementTree as ET
+from typing import Optional
+
+import aiohttp
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .cache import EIASResponseCache
+from .http_client import get_async_session, request_stats
+from .metrics import record_error
+from .models import Template
+from .profiling import sweep_profiler
+from .resilience import CircuitOpenError, get_async_concurrency_limiter
+from .services import EIASAPIService, MattermostService, TemplateInfo
+
+logger = logging.getLogger(__name__)
+
+# Ответы больше этого размера (символов) разбираются в отдельном потоке,
+# чтобы разбор большого XML не останавливал остальные запросы
+PARSE_IN_THREAD_SIZE = 256 * 1024
+
+
+class AsyncEIASAPIService(EIASAPIService):
+    """
+    Асинхронный клиент API EIAS (asyncio, aiohttp)
+
+    Параметры запроса, разбор ответа, кэш ответов и выключатель общие с
+    EIASAPIService. Одновременные запросы ограничены асинхронным вариантом
+    адаптивного ограничителя с пределом не больше EIAS_ASYNC_CONCURRENCY:
+    синхронный ограничитель ожидает на блокировке потока и остановил бы цикл
+    событий. Обращения к кэшу (sqlite) выполняются в отдельном потоке.
+    Пакетные запросы в асинхронном режиме не поддерживаются.
+    """
+
+    def __init__(self, concurrency=None):
+        if settings.EIAS_BATCH_SIZE > 1:
+            raise ImproperlyConfigured(
+                'Пакетные запросы к EIAS (EIAS_BATCH_SIZE > 1) в асинхронном режиме не поддерживаются'
+            )
+        self.concurrency = max(1, settings.EIAS_ASYNC_CONCURRENCY if concurrency is None else concurrency)
+        super().__init__()
+
+    def _get_limiter(self):
+        return get_async_concurrency_limiter(self.base_url, self.concurrency)
+
+    async def aget_template_info(self, template: Template, keep_xml: bool = False) -> Optional[TemplateInfo]:
+        """
+        Асинхронный вариант get_template_info
+
+        Returns:
+            Объект TemplateInfo или None в случае ошибки. Если ответ не изменился
+            с прошлой проверки, выставлен признак not_modified
+        """
+        params = {
+            'P_TC': template.template_code,
+            'P_V': template.current_version,
+            'P_NSRF': '',
+            'P_ENTITY': '',
+            'P_EXTENDED_INFO': ''
+        }
+
+        code = template.template_code
+        cached = await asyncio.to_thread(self._get_cached_response, template) if self.cache else None
+        headers = self._conditional_headers(cached)
+        try:
+            async with self.limiter.acquire():
+                with self.breaker.call(), request_stats.measure('eias'), sweep_profiler.phase('fetch', code):
+                    async with get_async_session().get(
+                        self.base_url,
+                        params=params,
+                        headers=headers,
+                        timeout=aiohttp.ClientTimeout(total=self.timeout)
+                    ) as response:
+                        response.raise_for_status()
+                        content = await response.read()
+                        encoding = response.charset
+            if cached and response.status == 304:
+                return await asyncio.to_thread(self._not_modified_response, template, cached)
+
+            with sweep_profiler.phase('decode', code):
+                content_hash = EIASResponseCache.content_hash(content)
+            if cached and cached.content_hash == content_hash:
+                return await asyncio.to_thread(self._not_modified_response, template, cached)
+
+            with sweep_profiler.phase('decode', code):
+                xml_text = content.decode(encoding or 'utf-8') or None
+            with sweep_profiler.phase('parse', code):
+                if xml_text and len(xml_text) > PARSE_IN_THREAD_SIZE:
+                    info = await asyncio.to_thread(self._parse_xml_response, xml_text, template, keep_xml)
+                else:
+                    info = self._parse_xml_response(xml_text, template, keep_xml)
+            if info and self.cache:
+                await asyncio.to_thread(self._store_response, template, info, content_hash, response.headers)
+            return info
+
+        except CircuitOpenError:
+            logger.debug(f"Запрос к API EIAS для {template.template_code} отклонен выключателем")
+            record_error('eias', 'circuit_open')
+            return None
+        except TimeoutError as e:
+            logger.error(f"Таймаут запроса к API EIAS для {template.template_code}: {e!r}")
+            record_error('eias', 'timeout')
+            return None
+        except aiohttp.ClientError as e:
+            logger.error(f"Ошибка при запросе к API EIAS для {template.template_code}: {e}")
+            record_error('eias', 'request')
+            return None
+        except ET.ParseError as e:
+            logger.error(f"Ошибка парсинга XML для {template.template_code}: {e}")
+            record_error('eias', 'parse')
+            return None
+        except UnicodeDecodeError as e:
+            logger.error(f"Ошибка декодирования XML для {template.template_code}: {e}")
+            record_error('eias', 'decode')
+            return None
+        except Exception as e:
+            logger.error(f"Неожиданная ошибка для {template.template_code}: {e}")
+            record_error('eias', 'unexpected')
+            return None
+
+
+class AsyncMattermostService(MattermostService):
+    """Асинхронная отправка уведомлений в Mattermost (формат сообщений общий с MattermostService)"""
+
+    async def asend_digest_notification(self, update_logs) -> bool:
+        """
+        Асинхронный вариант send_digest_notification
+
+        Args:
+            update_logs: Список объектов UpdateLog с загруженными шаблонами
+
+        Returns:
+            True если уведомление отправлено успешно, False иначе
+        """
+        if not self.webhook_url:
+            logger.warning("Webhook URL для Mattermost не настроен")
+            return False
+
+        if len(update_logs) == 1:
+            message = self.format_update_message(update_logs[0])
+        else:
+            message = self.format_digest_message(update_logs)
+        if not await self._apost_message(message):
+            return False
+
+        if len(update_logs) == 1:
+            logger.info(f"Уведомление отправлено в Mattermost для {update_logs[0].template.template_code}")
+        else:
+            logger.info(f"Сводное уведомление отправлено в Mattermost ({len(update_logs)} шаблонов)")
+        return True
+
+    async def _apost_message(self, message: str) -> bool:
+        """Асинхронный вариант _post_message"""
+        try:
+            with request_stats.measure('mattermost'):
+                async with get_async_session().post(
+                    self.webhook_url,
+                    json=self._message_payload(message),
+                    timeout=aiohttp.ClientTimeout(total=10)
+                ) as response:
+                    response.raise_for_status()
+            return True
+
+        except (aiohttp.ClientError, TimeoutError) as e:
+            logger.error(f"Ошибка отправки уведомления в Mattermost: {e!r}")
+            record_error('mattermost', 'timeout' if isinstance(e, TimeoutError) else 'request')
+            return False
@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import time
+
+from asgiref.sync import async_to_sync, sync_to_async
+
+from .http_client import aclose_async_session
+from .metrics import record_notifications
+from .notifications import _STOP, NotificationDispatcher, Outbox
+from .persistence import CheckResultWriter, QueryCounter
+from .profiling import sweep_profiler
+from .scheduling import TemplateClaimer
+from .sweep import TemplateSweep
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncNotificationDispatcher(NotificationDispatcher):
+    """
+    Отправка уведомлений задачей asyncio вместо отдельного потока
+
+    Сводки, ограничение частоты и отметка результата в БД - как у
+    NotificationDispatcher. submit можно вызывать из любого потока (логи
+    передает CheckResultWriter из потока работы с БД).
+    """
+
+    def start(self):
+        """Запускает задачу отправки в текущем цикле событий"""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._arun())
+        return self
+
+    def submit(self, update_logs):
+        self._loop.call_soon_threadsafe(self._put_all, list(update_logs))
+
+    def _put_all(self, update_logs):
+        for update_log in update_logs:
+            self._queue.put_nowait(update_log)
+
+    async def aclose(self):
+        """Отправляет все накопленные уведомления и завершает задачу"""
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, _STOP)
+        await self._task
+
+    async def _arun(self):
+        pending = []
+        while True:
+            try:
+                # Ждем новые обновления не дольше linger, чтобы собрать их в сводку
+                if pending:
+                    item = await asyncio.wait_for(self._queue.get(), self.linger)
+                else:
+                    item = await self._queue.get()
+            except asyncio.TimeoutError:
+                item = None
+
+            if item is not None and item is not _STOP:
+                pending.append(item)
+                if len(pending) < self.max_items:
+                    continue
+
+            # Полные сводки отправляем сразу, остаток - по истечении linger или при остановке
+            flush_all = item is None or item is _STOP
+            while pending and (flush_all or len(pending) >= self.max_items):
+                digest = self._take_digest(pending)
+                await self._asend(digest)
+                pending = pending[len(digest):]
+
+            if item is _STOP:
+                return
+
+    async def _asend(self, digest):
+        """Асинхронный вариант NotificationDispatcher._send"""
+        if self.rate_limit > 0:
+            wait = self._last_post + 1 / self.rate_limit - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        self._last_post = time.monotonic()
+
+        self.messages += 1
+        template_codes = None
+        if sweep_profiler.enabled:
+            template_codes = [update_log.template.template_code for update_log in digest]
+        with sweep_profiler.phase('notify', template_codes):
+            success = await self.mattermost_service.asend_digest_notification(digest)
+            record_notifications(len(digest) if success else 0, 0 if success else len(digest))
+            try:
+                if success:
+                    await sync_to_async(Outbox.mark_sent)(digest)
+                    self.sent += len(digest)
+                else:
+                    await sync_to_async(Outbox.mark_failed)(digest)
+                    self.failed += len(digest)
+            except Exception as e:
+                logger.error(f'Ошибка сохранения статуса отправки уведомлений: {e}')
+
+
+class AsyncTemplateSweep(TemplateSweep):
+    """
+    Проверка обновлений шаблонов в цикле событий asyncio
+
+    Вместо пула потоков запросы к EIAS выполняются корутинами: одновременно
+    выполняется до workers запросов (EIAS_ASYNC_CONCURRENCY), каждый стоит
+    корутину, а не поток со своим стеком. Захват шаблонов, запись результатов
+    и отметка уведомлений остаются синхронным кодом ORM с транзакциями и
+    SELECT ... FOR UPDATE и выполняются через sync_to_async в вызывающем
+    потоке с его соединением с БД. Пока результаты порции записываются, уже запрашивается
+    следующая порция.
+    """
+
+    workers_label = 'Одновременных запросов (asyncio)'
+
+    def run(self, template_code=None, ignore_schedule=False):
+        """Выполняет проход проверки в новом цикле событий (см. TemplateSweep.run)"""
+        # async_to_sync возвращает вызовы sync_to_async в текущий поток
+        return async_to_sync(self.arun)(template_code, ignore_schedule)
+
+    async def arun(self, template_code=None, ignore_schedule=False):
+        """Асинхронный вариант TemplateSweep.run"""
+        try:
+            return await self._arun(template_code, ignore_schedule)
+        finally:
+            await aclose_async_session()
+
+    async def _arun(self, template_code, ignore_schedule):
+        claimer = TemplateClaimer(self.batch_size)
+        due_before = self._due_before(template_code, ignore_schedule)
+        query_counter = QueryCounter()
+
+        def in_db_thread(func):
+            # Запросы считаются в потоке работы с БД, где они выполняются
+            def tracked(*args, **kwargs):
+                with query_counter.track():
+                    return func(*args, **kwargs)
+            return sync_to_async(tracked)
+
+        stats = self._new_stats()
+        dispatcher = None
+        if not self.dry_run:
+            dispatcher = AsyncNotificationDispatcher(self.mattermost_service).start()
+            # Повторно отправляем уведомления, не отправленные в прошлых проверках
+            for update_logs in await in_db_thread(lambda: list(Outbox().claim_all_due()))():
+                dispatcher.submit(update_logs)
+                stats['outbox_retried'] = stats.get('outbox_retried', 0) + len(update_logs)
+        writer = CheckResultWriter(
+            self.batch_size,
+            on_logs_saved=dispatcher.submit if dispatcher else None
+        )
+        claim_batch = in_db_thread(claimer.claim_batch)
+        process = in_db_thread(self._process)
+        started = time.perf_counter()
+
+        last_pk = 0
+
+        async def claim():
+            nonlocal last_pk
+            batch = await claim_batch(due_before, template_code, after_pk=last_pk)
+            if batch:
+                last_pk = max(template.pk for template in batch)
+            return batch
+
+        batch = await claim()
+        fetching = asyncio.create_task(self._afetch_templates(batch)) if batch else None
+        while fetching is not None:
+            results = await fetching
+            fetching = None
+            # Завершение работы: новые шаблоны больше не захватываем, уже
+            # запрошенные обрабатываем, остальные освободятся по истечении аренды
+            if self.stop_event is None or not self.stop_event.is_set():
+                batch = await claim()
+                if batch:
+                    fetching = asyncio.create_task(self._afetch_templates(batch))
+            await process(results, writer, stats)
+        await in_db_thread(self._flush)(writer, stats)
+        stats['poll_time'] = time.perf_counter() - started
+
+        if dispatcher:
+            await dispatcher.aclose()
+            self._add_dispatcher_stats(stats, dispatcher)
+
+        stats['queries'] = query_counter.count
+        return self._finish(stats, started)
+
+    async def _afetch_templates(self, templates):
+        """
+        Запрашивает информацию о порции шаблонов в workers корутинах
+
+        Returns:
+            Список кортежей (шаблон, TemplateInfo или None, длительность запроса) в порядке шаблонов
+        """
+        results = [None] * len(templates)
+        pending = iter(enumerate(templates))
+
+        async def worker():
+            # Как пул потоков: следующий шаблон берется после ответа на предыдущий
+            for index, template in pending:
+                started = time.perf_counter()
+                info = await self.eias_service.aget_template_info(template)
+                results[index] = (template, info, time.perf_counter() - started)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.workers, len(templates)))))
+        return results
@@ -0,0 +1,227 @@
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Описания обновлений в ответах заменителя EIAS: с изменениями в проверках и без
+# (второе не подходит ни к одному правилу классификации по умолчанию)
+VALIDATION_DESCRIPTION = 'Изменены проверки на листе "Титульный"'
+PLAIN_DESCRIPTION = 'Уточнены формулировки в инструкции по заполнению'
+
+
+def build_update_info_response(rows=0, version='1.0.7', namespace='urn:eias:update-info', position='start',
+                               template_code='FORM.1.TSO.2026.ORG', description=VALIDATION_DESCRIPTION):
+    """
+    Формирует ответ GET_UPDATE_INFO с расширенной информацией
+
+    Args:
+        rows: Количество строк расширенной информации (P_EXTENDED_INFO)
+        version: Версия шаблона в ответе
+        namespace: Namespace корневого элемента ('' - без namespace)
+        position: Расположение полей версии: start - перед расширенной информацией, end - после
+        template_code: Код шаблона в ответе
+        description: Описание обновления (DESCRIPTION_UPDATE)
+    """
+    xmlns = f' xmlns="{namespace}"' if namespace else ''
+    info = (
+        f'<TEMPLATE><CODE>{template_code}</CODE><VERSION>{version}</VERSION>'
+        f'<DESCRIPTION_UPDATE>{description}</DESCRIPTION_UPDATE></TEMPLATE>'
+    )
+    extended = ''.join(
+        f'<ROW N="{i}"><ENTITY>Организация {i}</ENTITY><VERSION_HISTORY><VERSION>0.{i}</VERSION>'
+        f'<DESCRIPTION_UPDATE>Строка {i}</DESCRIPTION_UPDATE></VERSION_HISTORY></ROW>'
+        for i in range(rows)
+    )
+    extended = f'<EXTENDED_INFO>{extended}</EXTENDED_INFO>'
+    body = info + extended if position == 'start' else extended.replace('<VERSION>', '<V>').replace(
+        '</VERSION>', '</V>').replace('<DESCRIPTION_UPDATE>', '<D>').replace('</DESCRIPTION_UPDATE>', '</D>') + info
+    return f'<?xml version="1.0" encoding="utf-8"?><RESPONSE{xmlns}>{body}</RESPONSE>'
+
+
+def build_batch_update_info_response(templates, namespace='urn:eias:update-info'):
+    """
+    Формирует пакетный ответ GET_UPDATE_INFO: элемент TEMPLATE на каждый шаблон
+
+    Args:
+        templates: Тройки (код шаблона, версия в ответе, описание обновления)
+        namespace: Namespace корневого элемента ('' - без namespace)
+    """
+    xmlns = f' xmlns="{namespace}"' if namespace else ''
+    body = ''.join(
+        f'<TEMPLATE><CODE>{template_code}</CODE><VERSION>{version}</VERSION>'
+        f'<DESCRIPTION_UPDATE>{description}</DESCRIPTION_UPDATE></TEMPLATE>'
+        for template_code, version, description in templates
+    )
+    return f'<?xml version="1.0" encoding="utf-8"?><RESPONSE{xmlns}>{body}</RESPONSE>'
+
+
+class _ThreadingHTTPServer(ThreadingHTTPServer):
+    # Очередь подключений по умолчанию (5) при сотнях одновременных
+    # соединений переполняется, и клиенты ждут повторной отправки SYN
+    request_queue_size = 1024
+
+
+class _FakeServer:
+    """Локальный HTTP сервер в фоновом потоке"""
+
+    handler_class = None
+
+    def __init__(self):
+        self.requests = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(self.handler_class):
+            fake = server
+
+        self._httpd = _ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name=type(self).__name__, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address
+        return f'http://{host}:{port}'
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        return False
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, как у настоящих сервисов; без алгоритма Нейгла ответ из заголовков
+    # и тела не ждет подтверждения (иначе к каждому ответу добавляется ~40 мс)
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body=b'', content_type='text/plain; charset=utf-8'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _EIASHandler(_Handler):
+
+    def do_GET(self):
+        fake = self.fake
+        fake.count_request()
+        time.sleep(fake.latency * random.uniform(0.5, 1.5))
+        if fake.error_rate and random.random() < fake.error_rate:
+            self._reply(503, b'Service Unavailable')
+            return
+        query = parse_qs(urlparse(self.path).query, keep_blank_values=True)
+        template_code = query.get('P_TC', [''])[0]
+        version = query.get('P_V', [''])[0]
+        if fake.batch_separator in template_code:
+            if not fake.batch_support:
+                self._reply(400, b'Bad Request')
+                return
+            codes = template_code.split(fake.batch_separator)
+            versions = version.split(fake.batch_separator)
+            self._reply(200, fake.batch_response_for(zip(codes, versions)), 'text/xml; charset=utf-8')
+            return
+        self._reply(200, fake.response_for(template_code, version), 'text/xml; charset=utf-8')
+
+
+class FakeEIASServer(_FakeServer):
+    """
+    Заменитель GET_UPDATE_INFO для замеров без сети
+
+    Отвечает с задержкой latency секунд (±50%), с долей ошибок 503 error_rate.
+    Для доли change_rate шаблонов (определяется по хэшу кода) возвращает
+    версию new_version, для остальных - запрошенную версию P_V. Описание
+    обновления говорит об изменениях в проверках для доли validation_rate
+    шаблонов (тоже по хэшу кода), у остальных не подходит ни к одному правилу
+    классификации. Списки кодов
+    и версий через batch_separator обрабатываются одним пакетным ответом с той
+    же задержкой, а при batch_support=False отклоняются ошибкой 400.
+    """
+
+    handler_class = _EIASHandler
+
+    def __init__(self, latency=0.05, error_rate=0.0, xml_rows=0, change_rate=0.05, new_version='2.0',
+                 validation_rate=0.5, batch_support=True, batch_separator=','):
+        super().__init__()
+        self.batch_support = batch_support
+        self.batch_separator = batch_separator
+        self.latency = latency
+        self.error_rate = error_rate
+        self.xml_rows = xml_rows
+        self.change_rate = change_rate
+        self.new_version = new_version
+        self.validation_rate = validation_rate
+        self._responses = {}
+
+    def is_changed(self, template_code):
+        return zlib.crc32(template_code.encode()) % 10000 < self.change_rate * 10000
+
+    def description_for(self, template_code):
+        # Другой хэш, чтобы доля изменений в проверках не зависела от change_rate
+        if zlib.adler32(template_code.encode()) % 10000 < self.validation_rate * 10000:
+            return VALIDATION_DESCRIPTION
+        return PLAIN_DESCRIPTION
+
+    def response_for(self, template_code, version):
+        if self.is_changed(template_code):
+            version = self.new_version
+        description = self.description_for(template_code)
+        # Ответы кэшируются по версии и описанию: формирование большого XML не должно искажать замер
+        body = self._responses.get((version, description))
+        if body is None:
+            body = build_update_info_response(self.xml_rows, version=version, description=description).encode('utf-8')
+            self._responses[version, description] = body
+        return body
+
+    def batch_response_for(self, templates):
+        templates = [
+            (
+                template_code,
+                self.new_version if self.is_changed(template_code) else version,
+                self.description_for(template_code)
+            )
+            for template_code, version in templates
+        ]
+        return build_batch_update_info_response(templates).encode('utf-8')
+
+
+class _WebhookHandler(_Handler):
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.fake.count_request()
+        self._reply(200, b'ok')
+
+
+class FakeWebhookSink(_FakeServer):
+    """Заменитель входящего webhook Mattermost: принимает и считает сообщения"""
+
+    handler_class = _WebhookHandler
+
+
+def percentile(values, q):
+    """
+    Возвращает перцентиль q (от 0 до 1) по методу ближайшего ранга
+
+    Args:
+        values: Отсортированный список значений
+        q: Уровень перцентиля
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(q * len(values)) - 1))]
@@ -0,0 +1,169 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+
+
+@dataclass
+class CachedResponse:
+    """Запись кэша ответа API EIAS"""
+    content_hash: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    version: Optional[str]
+    has_validation_changes: bool
+    stored_at: float
+
+
+class EIASResponseCache:
+    """
+    Дисковый кэш ответов API EIAS
+
+    Ключ записи - пара (P_TC, P_V). Для каждого ключа хранится хэш содержимого
+    ответа, заголовки ETag/Last-Modified и уже разобранные поля ответа, поэтому
+    неизменившийся ответ не нужно разбирать повторно. Записи старше TTL
+    игнорируются, при превышении лимита вытесняются давно не использованные (LRU).
+
+    Чтение записи в файл не пишет: время использования обновляется вместе с
+    записью ответа (set) или подтверждением, что он не изменился (touch).
+    Устаревшие записи заменяются при следующем set или вытесняются.
+    """
+
+    def __init__(self, path=None, ttl=None, max_entries=None):
+        self.path = Path(path or settings.EIAS_CACHE_PATH)
+        self.ttl = settings.EIAS_CACHE_TTL if ttl is None else ttl
+        self.max_entries = settings.EIAS_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self._lock = threading.Lock()
+        os.makedirs(self.path.parent, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        # В режиме WAL при NORMAL фиксация не ждет fsync; потеря последних записей
+        # при сбое питания для кэша не страшна
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS eias_response (
+                template_code TEXT NOT NULL,
+                version TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                parsed_version TEXT,
+                has_validation_changes INTEGER NOT NULL DEFAULT 0,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (template_code, version)
+            )
+            '''
+        )
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS eias_response_accessed_at ON eias_response (accessed_at)'
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def content_hash(content: bytes) -> str:
+        """Вычисляет хэш содержимого ответа"""
+        return hashlib.sha256(content).hexdigest()
+
+    def get(self, template_code: str, version: str) -> Optional[CachedResponse]:
+        """
+        Возвращает запись кэша для пары (код шаблона, версия)
+
+        Args:
+            template_code: Код шаблона (P_TC)
+            version: Версия шаблона (P_V)
+
+        Returns:
+            Объект CachedResponse или None, если записи нет или она устарела
+        """
+        with self._lock:
+            row = self._connection.execute(
+                '''
+                SELECT content_hash, etag, last_modified, parsed_version, has_validation_changes, stored_at
+                FROM eias_response WHERE template_code = ? AND version = ?
+                ''',
+                (template_code, version)
+            ).fetchone()
+        if row is None or (self.ttl and time.time() - row[5] > self.ttl):
+            return None
+        return CachedResponse(
+            content_hash=row[0],
+            etag=row[1],
+            last_modified=row[2],
+            version=row[3],
+            has_validation_changes=bool(row[4]),
+            stored_at=row[5]
+        )
+
+    def set(self, template_code: str, version: str, content_hash: str, etag: Optional[str],
+            last_modified: Optional[str], parsed_version: Optional[str], has_validation_changes: bool):
+        """
+        Сохраняет ответ в кэш и вытесняет лишние записи
+
+        Args:
+            template_code: Код шаблона (P_TC)
+            version: Версия шаблона (P_V)
+            content_hash: Хэш содержимого ответа
+            etag: Значение заголовка ETag
+            last_modified: Значение заголовка Last-Modified
+            parsed_version: Версия из ответа
+            has_validation_changes: Признак изменений в проверках
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                '''
+                INSERT OR REPLACE INTO eias_response (
+                    template_code, version, content_hash, etag, last_modified,
+                    parsed_version, has_validation_changes, stored_at, accessed_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (template_code, version, content_hash, etag, last_modified,
+                 parsed_version, int(has_validation_changes), now, now)
+            )
+            self._evict()
+            self._connection.commit()
+
+    def touch(self, template_code: str, version: str):
+        """Продлевает срок жизни записи и отмечает ее использование после подтверждения, что ответ не изменился"""
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                'UPDATE eias_response SET stored_at = ?, accessed_at = ? WHERE template_code = ? AND version = ?',
+                (now, now, template_code, version)
+            )
+            self._connection.commit()
+
+    def _evict(self):
+        """Удаляет давно не использованные записи сверх лимита (вызывается под блокировкой)"""
+        if not self.max_entries:
+            return
+        count = self._connection.execute('SELECT COUNT(*) FROM eias_response').fetchone()[0]
+        if count <= self.max_entries:
+            return
+        self._connection.execute(
+            '''
+            DELETE FROM eias_response WHERE rowid IN (
+                SELECT rowid FROM eias_response ORDER BY accessed_at LIMIT ?
+            )
+            ''',
+            (count - self.max_entries,)
+        )
+
+    def clear(self):
+        """Очищает кэш"""
+        with self._lock:
+            self._connection.execute('DELETE FROM eias_response')
+            self._connection.commit()
+
+    def close(self):
+        """Закрывает соединение с файлом кэша"""
+        with self._lock:
+            self._connection.close()
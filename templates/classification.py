@@ -0,0 +1,189 @@
+import json
+import re
+import threading
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class Severity:
+    """Уровни важности изменений в порядке возрастания"""
+    MINOR = 'minor'
+    MAJOR = 'major'
+    CRITICAL = 'critical'
+
+    ORDER = (MINOR, MAJOR, CRITICAL)
+
+
+@dataclass(frozen=True, slots=True)
+class Rule:
+    """
+    Правило классификации описания обновления
+
+    keywords - начала слов без учета регистра ("провер" находит "проверка",
+    "проверки", "Проверочные"), pattern - регулярное выражение. Можно задать
+    и то, и другое.
+    """
+    category: str
+    severity: str
+    keywords: Tuple[str, ...] = ()
+    pattern: str = ''
+
+    def to_regex(self) -> str:
+        """Отдельное выражение правила (проверка правил, сравнение в benchmark_classifier)"""
+        parts = [rf'\b{re.escape(keyword)}\w*' for keyword in self.keywords]
+        if self.pattern:
+            parts.append(f'(?:{self.pattern})')
+        return '|'.join(parts)
+
+
+@dataclass(frozen=True, slots=True)
+class Classification:
+    """Результат классификации: найденные категории и наибольшая важность"""
+    categories: Tuple[str, ...] = ()
+    severity: Optional[str] = None
+
+    @property
+    def is_critical(self) -> bool:
+        """Изменения в проверках (UpdateLog.has_validation_changes)"""
+        return self.severity == Severity.CRITICAL
+
+
+# Правила по умолчанию (UPDATE_CLASSIFIER_RULES не задан)
+DEFAULT_RULES = (
+    Rule('validation', Severity.CRITICAL, keywords=('провер',)),
+    Rule('structure', Severity.MAJOR, keywords=('структур', 'лист', 'столб', 'колон', 'строк', 'показател')),
+    Rule('reference', Severity.MINOR, keywords=('справочн', 'классификатор', 'кодификатор')),
+    Rule('fix', Severity.MINOR, keywords=('исправ', 'ошибк', 'опечат')),
+)
+
+_NOTHING = Classification()
+
+
+class RuleClassifier:
+    """
+    Классификатор описаний обновлений по набору правил
+
+    Все правила компилируются один раз в одно регулярное выражение, поэтому
+    описание просматривается за один проход независимо от числа правил.
+    Ключевые слова собираются в префиксное дерево (общие начала слов
+    проверяются один раз, как в автомате Ахо-Корасик), в конце каждого слова -
+    пустая именованная группа, по которой определяется правило. Описание
+    приводится к нижнему регистру один раз, выражения правил (pattern)
+    проверяются без учета регистра. Если одно ключевое слово задано в
+    нескольких правилах, засчитывается более важное.
+    """
+
+    def __init__(self, rules: Iterable[Rule] = DEFAULT_RULES):
+        self.rules: List[Rule] = sorted(rules, key=lambda rule: -Severity.ORDER.index(rule.severity))
+        # Имя группы -> правило (match.lastgroup - группа совпавшего слова или выражения)
+        self._rules_by_group = {}
+        trie = {}
+        patterns = []
+        for index, rule in enumerate(self.rules):
+            for number, keyword in enumerate(rule.keywords):
+                node = trie
+                for char in keyword.lower():
+                    node = node.setdefault(char, {})
+                if '' not in node:
+                    node[''] = f'k{index}_{number}'
+                    self._rules_by_group[node['']] = rule
+            if rule.pattern:
+                patterns.append(f'(?P<p{index}>(?i:{rule.pattern}))')
+                self._rules_by_group[f'p{index}'] = rule
+
+        alternatives = ([f'(?<!\\w){self._trie_regex(trie)}'] if trie else []) + patterns
+        self._regex = re.compile('|'.join(alternatives)) if alternatives else None
+
+    @classmethod
+    def _trie_regex(cls, node: dict) -> str:
+        # Сначала более длинные слова, затем окончание слова в этом узле
+        alternatives = [re.escape(char) + cls._trie_regex(child) for char, child in sorted(node.items()) if char]
+        if '' in node:
+            alternatives.append(f'(?P<{node[""]}>)')
+        if len(alternatives) == 1:
+            return alternatives[0]
+        return f'(?:{"|".join(alternatives)})'
+
+    def classify(self, text: Optional[str]) -> Classification:
+        """
+        Классифицирует описание обновления
+
+        Args:
+            text: Описание обновления (DESCRIPTION_UPDATE)
+
+        Returns:
+            Объект Classification (пустой, если ни одно правило не подошло)
+        """
+        if not text or self._regex is None:
+            return _NOTHING
+
+        categories = []
+        severity = -1
+        for match in self._regex.finditer(text.lower()):
+            rule = self._rules_by_group[match.lastgroup]
+            if rule.category not in categories:
+                categories.append(rule.category)
+                severity = max(severity, Severity.ORDER.index(rule.severity))
+        if not categories:
+            return _NOTHING
+        return Classification(tuple(categories), Severity.ORDER[severity])
+
+
+def load_rules(path: str) -> List[Rule]:
+    """
+    Загружает правила из JSON файла
+
+    Формат: список объектов {"category": ..., "severity": "minor|major|critical",
+    "keywords": [...], "pattern": "..."}.
+
+    Raises:
+        ValueError: Если файл или правило некорректны
+    """
+    try:
+        with open(path, encoding='utf-8') as file:
+            items = json.load(file)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(f'Не удалось прочитать правила классификации {path}: {e}')
+    if not isinstance(items, list):
+        raise ValueError(f'{path}: ожидается список правил')
+
+    rules = []
+    for number, item in enumerate(items, start=1):
+        if not isinstance(item, dict) or not item.get('category'):
+            raise ValueError(f'{path}: правило {number} должно быть объектом с category')
+        if item.get('severity') not in Severity.ORDER:
+            raise ValueError(f'{path}: правило {number}: неизвестная важность "{item.get("severity")}"')
+        rule = Rule(
+            category=item['category'],
+            severity=item['severity'],
+            keywords=tuple(item.get('keywords') or ()),
+            pattern=item.get('pattern') or ''
+        )
+        try:
+            re.compile(rule.to_regex())
+        except re.error as e:
+            raise ValueError(f'{path}: правило {number}: некорректное выражение: {e}')
+        rules.append(rule)
+    return rules
+
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def get_classifier():
+    """
+    Возвращает классификатор, общий для процесса
+
+    Класс задается настройкой UPDATE_CLASSIFIER (создается с правилами
+    UPDATE_CLASSIFIER_RULES или DEFAULT_RULES) и собирается при первом обращении.
+    """
+    global _classifier
+    with _classifier_lock:
+        if _classifier is None:
+            rules = load_rules(settings.UPDATE_CLASSIFIER_RULES) if settings.UPDATE_CLASSIFIER_RULES else DEFAULT_RULES
+            _classifier = import_string(settings.UPDATE_CLASSIFIER)(rules)
+        return _classifier
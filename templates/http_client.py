@@ -0,0 +1,158 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import aiohttp
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .metrics import observe_request
+
+# Общая HTTP сессия для всех сервисов (пул соединений с keep-alive)
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+# Общая асинхронная HTTP сессия (привязана к циклу событий, в которой создана)
+_async_session: Optional[aiohttp.ClientSession] = None
+
+
+def get_session() -> requests.Session:
+    """
+    Возвращает общую HTTP сессию с пулом keep-alive соединений
+
+    Сессия создается один раз на процесс и переиспользуется всеми сервисами,
+    поэтому TCP/TLS соединения с eias.ru и Mattermost устанавливаются
+    однократно на всю проверку, а не на каждый запрос.
+
+    Returns:
+        Объект requests.Session
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            pool_size = settings.HTTP_POOL_SIZE
+            adapter = HTTPAdapter(
+                pool_connections=pool_size,
+                pool_maxsize=pool_size,
+                pool_block=True
+            )
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers['Connection'] = 'keep-alive'
+            _session = session
+        return _session
+
+
+def close_session():
+    """Закрывает общую HTTP сессию и все открытые соединения"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def get_async_session() -> aiohttp.ClientSession:
+    """
+    Возвращает общую асинхронную HTTP сессию с пулом keep-alive соединений
+
+    Сессия создается при первом обращении внутри цикла событий и должна быть
+    закрыта через aclose_async_session до завершения этого цикла.
+
+    Returns:
+        Объект aiohttp.ClientSession
+    """
+    global _async_session
+    if _async_session is None:
+        # Соединений хватает на все одновременные запросы к EIAS и отправку в Mattermost
+        connector = aiohttp.TCPConnector(
+            limit=settings.EIAS_ASYNC_CONCURRENCY + 2,
+            ssl=False  # ToDo: отключаем проверку SSL для отладки
+        )
+        _async_session = aiohttp.ClientSession(connector=connector)
+    return _async_session
+
+
+async def aclose_async_session():
+    """Закрывает общую асинхронную HTTP сессию и все открытые ею соединения"""
+    global _async_session
+    if _async_session is not None:
+        session, _async_session = _async_session, None
+        await session.close()
+
+
+def get_connections_count() -> int:
+    """
+    Возвращает количество соединений, открытых общей сессией
+
+    Returns:
+        Число установленных TCP соединений (каждое - отдельный handshake)
+    """
+    with _session_lock:
+        if _session is None:
+            return 0
+        count = 0
+        for adapter in _session.adapters.values():
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    count += pool.num_connections
+        return count
+
+
+class RequestStats:
+    """Потокобезопасная статистика длительности HTTP запросов по сервисам"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def record(self, name: str, elapsed: float):
+        """
+        Добавляет длительность запроса в статистику
+
+        Args:
+            name: Имя сервиса (например, eias или mattermost)
+            elapsed: Длительность запроса в секундах
+        """
+        with self._lock:
+            stats = self._data.setdefault(name, {'count': 0, 'total': 0.0, 'min': None, 'max': 0.0})
+            stats['count'] += 1
+            stats['total'] += elapsed
+            stats['max'] = max(stats['max'], elapsed)
+            stats['min'] = elapsed if stats['min'] is None else min(stats['min'], elapsed)
+        observe_request(name, elapsed)
+
+    @contextmanager
+    def measure(self, name: str):
+        """Контекстный менеджер для замера длительности запроса"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def reset(self):
+        """Сбрасывает накопленную статистику"""
+        with self._lock:
+            self._data = {}
+
+    def summary(self) -> dict:
+        """
+        Возвращает сводку по сервисам
+
+        Returns:
+            Словарь {имя: {count, total, avg, min, max}}
+        """
+        with self._lock:
+            result = {}
+            for name, stats in self._data.items():
+                result[name] = dict(stats, avg=stats['total'] / stats['count'] if stats['count'] else 0.0)
+            return result
+
+
+request_stats = RequestStats()
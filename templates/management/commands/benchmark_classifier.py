@@ -0,0 +1,121 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from templates.classification import DEFAULT_RULES, RuleClassifier, Severity, load_rules
+import random
+import re
+import time
+
+# Слова описаний обновлений, не подходящие ни к одному правилу по умолчанию
+FILLER_WORDS = (
+    'обновлена', 'версия', 'шаблона', 'отчета', 'за', 'период', 'изменен', 'порядок', 'заполнения',
+    'раздела', 'добавлены', 'новые', 'поля', 'для', 'организаций', 'тарифы', 'на', 'год', 'уточнены',
+    'формулировки', 'и', 'в', 'по', 'приказу', 'методическим', 'рекомендациям', 'сведения', 'о',
+)
+# Окончания, с которыми ключевые слова правил встречаются в описаниях
+ENDINGS = ('', 'а', 'и', 'ы', 'ов', 'ка', 'ки', 'очные', 'ение', 'ены')
+
+
+def classify_per_rule(rules, text):
+    """Прежний подход: отдельное выражение на каждое правило, поиск по всем по очереди"""
+    categories = []
+    severity = -1
+    for rule, regex in rules:
+        if regex.search(text):
+            categories.append(rule.category)
+            severity = max(severity, Severity.ORDER.index(rule.severity))
+    return tuple(categories), Severity.ORDER[severity] if categories else None
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет скорость классификации описаний обновлений (DESCRIPTION_UPDATE): одно общее '
+        'выражение для всех правил против поиска по каждому правилу'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--descriptions',
+            type=int,
+            default=50000,
+            help='Количество описаний в наборе'
+        )
+        parser.add_argument(
+            '--words',
+            type=str,
+            default='10,100,1000',
+            help='Количество слов в описании через запятую (отдельный набор для каждого)'
+        )
+        parser.add_argument(
+            '--match-rate',
+            type=float,
+            default=0.2,
+            help='Доля описаний с ключевыми словами правил'
+        )
+        parser.add_argument(
+            '--rules',
+            type=str,
+            default=settings.UPDATE_CLASSIFIER_RULES,
+            help='JSON файл с правилами (по умолчанию UPDATE_CLASSIFIER_RULES или правила по умолчанию)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=1,
+            help='Начальное значение генератора описаний'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            rules = load_rules(options['rules']) if options['rules'] else list(DEFAULT_RULES)
+        except ValueError as e:
+            raise CommandError(str(e))
+        classifier = RuleClassifier(rules)
+        per_rule = [(rule, re.compile(rule.to_regex(), re.IGNORECASE)) for rule in classifier.rules]
+        keywords = [keyword for rule in rules for keyword in rule.keywords]
+        rng = random.Random(options['seed'])
+
+        self.stdout.write(
+            f'Правил: {len(rules)}, ключевых слов: {len(keywords)}, описаний в наборе: {options["descriptions"]}, '
+            f'с ключевыми словами: {options["match_rate"]:.0%}'
+        )
+        self.stdout.write(
+            f'{"слов":>6} {"МБ":>7} {"по правилам, с":>15} {"общее, с":>9} {"описаний/с":>11} '
+            f'{"МБ/с":>7} {"ускорение":>10} {"найдено":>8}'
+        )
+        for words in [int(words) for words in options['words'].split(',') if words.strip()]:
+            corpus = [
+                self._description(rng, words, keywords if rng.random() < options['match_rate'] else ())
+                for _ in range(options['descriptions'])
+            ]
+            size = sum(len(text.encode()) for text in corpus) / 1024 / 1024
+
+            # Результаты должны совпадать (кроме пересечений правил в одном месте текста)
+            started = time.perf_counter()
+            expected = [classify_per_rule(per_rule, text) for text in corpus]
+            per_rule_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            results = [classifier.classify(text) for text in corpus]
+            combined_time = time.perf_counter() - started
+
+            mismatches = sum(
+                1 for result, (categories, severity) in zip(results, expected)
+                if set(result.categories) != set(categories) or result.severity != severity
+            )
+            if mismatches:
+                self.stdout.write(self.style.WARNING(f'Результаты различаются для {mismatches} описаний'))
+
+            self.stdout.write(
+                f'{words:>6} {size:>7.1f} {per_rule_time:>15.2f} {combined_time:>9.2f} '
+                f'{len(corpus) / combined_time:>11.0f} {size / combined_time:>7.1f} '
+                f'{"x" + format(per_rule_time / combined_time, ".1f"):>10} '
+                f'{sum(1 for result in results if result.categories):>8}'
+            )
+
+    def _description(self, rng, words, keywords):
+        """Описание из случайных слов, с одним-двумя ключевыми словами, если они переданы"""
+        text = [rng.choice(FILLER_WORDS) for _ in range(words)]
+        for _ in range(rng.randint(1, 2) if keywords else 0):
+            text[rng.randrange(words)] = rng.choice(keywords) + rng.choice(ENDINGS)
+        text[0] = text[0].capitalize()
+        return ' '.join(text)
@@ -0,0 +1,278 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, OutputWrapper
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from templates.async_services import AsyncEIASAPIService, AsyncMattermostService
+from templates.async_sweep import AsyncTemplateSweep
+from templates.benchmarking import FakeEIASServer, FakeWebhookSink, percentile
+from templates.http_client import close_session, request_stats
+from templates.models import RawPayload, Template, UpdateLog
+from templates.services import EIASAPIService, MattermostService
+from templates.sweep import TemplateSweep
+from templates.versioning import version_sort_key
+import io
+import logging
+import time
+
+
+class TimedEIASAPIService(EIASAPIService):
+    """Сервис EIAS, запоминающий время ожидания ответа каждым шаблоном"""
+
+    def __init__(self):
+        super().__init__()
+        self.latencies = []
+
+    def get_template_info(self, template, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().get_template_info(template, **kwargs)
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+    def get_templates_info(self, templates, **kwargs):
+        # Шаблон пакета ждет ответа весь пакетный запрос; запросы по одному
+        # шаблону (переход при отказе от пакетов) уже учтены в get_template_info
+        started = time.perf_counter()
+        recorded = len(self.latencies)
+        try:
+            return super().get_templates_info(templates, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.latencies.extend([elapsed] * (len(templates) - (len(self.latencies) - recorded)))
+
+
+class TimedAsyncEIASAPIService(AsyncEIASAPIService):
+    """Асинхронный сервис EIAS, запоминающий время ожидания ответа каждым шаблоном"""
+
+    def __init__(self, concurrency=None):
+        super().__init__(concurrency)
+        self.latencies = []
+
+    async def aget_template_info(self, template, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().aget_template_info(template, **kwargs)
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет скорость проверки шаблонов на локальных заменителях API EIAS и webhook Mattermost '
+        '(без сети, во временной тестовой БД)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--templates',
+            type=int,
+            default=5000,
+            help='Количество шаблонов в тестовой БД'
+        )
+        parser.add_argument(
+            '--workers',
+            type=str,
+            default='1,8,32',
+            help='Количество параллельных запросов через запятую (отдельный замер для каждого)'
+        )
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=50,
+            help='Средняя задержка ответа EIAS в миллисекундах (разброс ±50%%)'
+        )
+        parser.add_argument(
+            '--error-rate',
+            type=float,
+            default=0.0,
+            help='Доля ответов EIAS с ошибкой 503'
+        )
+        parser.add_argument(
+            '--xml-rows',
+            type=int,
+            default=0,
+            help='Количество строк расширенной информации в ответе EIAS (размер XML)'
+        )
+        parser.add_argument(
+            '--change-rate',
+            type=float,
+            default=0.05,
+            help='Доля шаблонов, для которых EIAS возвращает новую версию'
+        )
+        parser.add_argument(
+            '--validation-rate',
+            type=float,
+            default=0.5,
+            help='Доля шаблонов, в описании обновления которых есть изменения в проверках '
+                 '(у остальных описание не подходит ни к одному правилу классификации)'
+        )
+        parser.add_argument(
+            '--eias-batch',
+            type=str,
+            default='0,50',
+            help='Количество шаблонов в запросе к EIAS через запятую (0 - по одному, отдельный замер для каждого)'
+        )
+        parser.add_argument(
+            '--modes',
+            type=str,
+            default='sync,async',
+            help='Режимы проверки через запятую: sync (пул потоков), async (asyncio); '
+                 'асинхронный режим замеряется только без пакетных запросов'
+        )
+        parser.add_argument(
+            '--no-batch-support',
+            action='store_true',
+            help='Заменитель EIAS отклоняет пакетные запросы (проверка перехода на запросы по одному шаблону)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.SWEEP_DB_BATCH_SIZE,
+            help='Количество шаблонов в одной транзакции записи результатов'
+        )
+
+    def handle(self, *args, **options):
+        workers_list = [int(workers) for workers in options['workers'].split(',') if workers.strip()]
+        eias_batch_list = [int(size) for size in options['eias_batch'].split(',') if size.strip()]
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        
+        # Замер выполняется во временной БД, рабочие данные не затрагиваются
+        old_name = connection.settings_dict['NAME']
+        self.stdout.write('Создаем тестовую БД...')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        # Сообщения об ошибках сервисов (при --error-rate) не выводим на каждый шаблон
+        logging.disable(logging.ERROR)
+        try:
+            self._seed(options['templates'])
+            results = []
+            for mode in modes:
+                for eias_batch in eias_batch_list:
+                    # Асинхронный сервис запрашивает шаблоны только по одному
+                    if mode == 'async' and eias_batch > 0:
+                        continue
+                    for workers in workers_list:
+                        self.stdout.write(
+                            f'Проверка {options["templates"]} шаблонов ({mode}), параллельно: {workers}, '
+                            f'шаблонов в запросе: {eias_batch or 1}...'
+                        )
+                        try:
+                            results.append(self._run(mode, workers, eias_batch, options))
+                        except Exception as e:
+                            # Остальные замеры выполняем, строка замера выводится с ошибкой
+                            self.stdout.write(self.style.ERROR(f'Замер не выполнен: {e}'))
+                            results.append(
+                                {'mode': mode, 'workers': workers, 'eias_batch': eias_batch or 1, 'error': str(e)}
+                            )
+            self._write_results(results, options)
+        finally:
+            logging.disable(logging.NOTSET)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _seed(self, count):
+        """Создает шаблоны для проверки"""
+        Template.objects.bulk_create(
+            (
+                Template(template_code=f'BENCH.{i:06d}.2026', current_version='1.0', version_key=version_sort_key('1.0'))
+                for i in range(count)
+            ),
+            batch_size=1000
+        )
+
+    def _reset(self):
+        """Возвращает шаблоны в исходное состояние перед очередным замером"""
+        UpdateLog.objects.all().delete()
+        RawPayload.objects.all().delete()
+        Template.objects.update(
+            current_version='1.0',
+            version_key=version_sort_key('1.0'),
+            next_check_at=timezone.now(),
+            check_interval=settings.SCHEDULE_MIN_INTERVAL,
+            # Аренда остается после прерванного замера, без сброса следующий не найдет шаблонов
+            leased_until=None,
+            last_update_at=None,
+            update_cadence=None
+        )
+
+    def _run(self, mode, workers, eias_batch, options):
+        """Выполняет одну проверку всех шаблонов и возвращает результаты замера"""
+        self._reset()
+        with FakeEIASServer(
+            latency=options['latency'] / 1000,
+            error_rate=options['error_rate'],
+            xml_rows=options['xml_rows'],
+            change_rate=options['change_rate'],
+            validation_rate=options['validation_rate'],
+            batch_support=not options['no_batch_support']
+        ) as eias, FakeWebhookSink() as webhook, override_settings(
+            EIAS_API_BASE_URL=f'{eias.url}/GET_UPDATE_INFO',
+            EIAS_MAX_PER_HOST=workers,
+            EIAS_ASYNC_CONCURRENCY=workers,
+            EIAS_BATCH_SIZE=eias_batch,
+            EIAS_CACHE_ENABLED=False,
+            HTTP_POOL_SIZE=max(settings.HTTP_POOL_SIZE, workers),
+            MATTERMOST_WEBHOOK_URL=f'{webhook.url}/hooks/benchmark',
+            MATTERMOST_RATE_LIMIT=0,
+            MATTERMOST_DIGEST_LINGER=0.1,
+            METRICS_TEXTFILE=''
+        ):
+            # Новый пул соединений под размер HTTP_POOL_SIZE этого замера
+            close_session()
+            request_stats.reset()
+            
+            is_async = mode == 'async'
+            eias_service = TimedAsyncEIASAPIService(workers) if is_async else TimedEIASAPIService()
+            sweep_class = AsyncTemplateSweep if is_async else TemplateSweep
+            sweep = sweep_class(
+                eias_service,
+                AsyncMattermostService() if is_async else MattermostService(),
+                OutputWrapper(io.StringIO()),
+                self.style,
+                workers=workers,
+                batch_size=options['batch_size']
+            )
+            stats = sweep.run(ignore_schedule=True)
+            close_session()
+        
+        latencies = sorted(eias_service.latencies)
+        return {
+            'mode': mode,
+            'workers': workers,
+            'eias_batch': eias_batch or 1,
+            # None, если проверка не нашла шаблонов (например, все захвачены другим процессом)
+            'stats': stats,
+            'p50': percentile(latencies, 0.5),
+            'p99': percentile(latencies, 0.99),
+            'eias_requests': eias.requests,
+            'webhook_requests': webhook.requests,
+        }
+
+    def _write_results(self, results, options):
+        """Выводит таблицу результатов замеров"""
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Шаблонов: {options["templates"]}, задержка EIAS: {options["latency"]:.0f} мс, '
+                f'ошибок: {options["error_rate"]:.0%}, строк XML: {options["xml_rows"]}, '
+                f'новых версий: {options["change_rate"]:.0%}, с изменениями в проверках: {options["validation_rate"]:.0%}'
+            )
+        )
+        self.stdout.write(
+            f'{"режим":>6} {"паралл.":>8} {"в запросе":>10} {"шаблонов/с":>11} {"время, с":>9} {"p50, мс":>8} {"p99, мс":>8} '
+            f'{"запросов":>9} {"SQL":>6} {"ошибок":>7} {"обновл.":>8} {"сообщ.":>7}'
+        )
+        for result in results:
+            stats = result.get('stats')
+            if not stats:
+                error = result.get('error') or 'шаблоны не проверены'
+                self.stdout.write(
+                    self.style.ERROR(f'{result["mode"]:>6} {result["workers"]:>8} {result["eias_batch"]:>10} {error}')
+                )
+                continue
+            wall_time = stats['wall_time']
+            self.stdout.write(
+                f'{result["mode"]:>6} {result["workers"]:>8} {result["eias_batch"]:>10} {stats["total"] / wall_time if wall_time else 0:>11.1f} '
+                f'{wall_time:>9.2f} {result["p50"] * 1000:>8.1f} {result["p99"] * 1000:>8.1f} '
+                f'{result["eias_requests"]:>9} {stats["queries"]:>6} {stats["errors"]:>7} '
+                f'{stats["updated"]:>8} {result["webhook_requests"]:>7}'
+            )
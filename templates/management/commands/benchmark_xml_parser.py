@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from templates.benchmarking import build_update_info_response as build_response
+from templates.xml_parser import UPDATE_INFO_FIELDS, parse_update_info
+import time
+import xml.etree.ElementTree as ET
+
+
+def parse_with_tree(xml_text):
+    """Прежний способ разбора: полное дерево и поиск .// по каждому полю"""
+    root = ET.fromstring(xml_text)
+    namespace = root.tag.split('}')[0][1:] if '}' in root.tag else ''
+    return {field: root.find(f'.//{{{namespace}}}{field}').text for field in UPDATE_INFO_FIELDS}
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает потоковый разбор XML ответов EIAS с разбором через полное дерево'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=20000,
+            help='Количество строк расширенной информации в ответе'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Количество повторов разбора'
+        )
+
+    def _measure(self, func, xml_text, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func(xml_text)
+        return (time.perf_counter() - started) / repeat
+
+    def handle(self, *args, **options):
+        # Проверяем совпадение результатов на разных вариантах ответа
+        variants = {
+            'namespace, поля в начале': build_response(50),
+            'namespace, поля в конце': build_response(50, position='end'),
+            'без namespace': build_response(50, namespace=''),
+        }
+        for name, xml_text in variants.items():
+            if parse_update_info(xml_text) != parse_with_tree(xml_text):
+                self.stdout.write(self.style.ERROR(f'Результаты различаются: {name}'))
+                return
+        self.stdout.write(self.style.SUCCESS('Результаты разбора совпадают'))
+
+        self.stdout.write('-' * 50)
+        for position in ('start', 'end'):
+            xml_text = build_response(options['rows'], position=position)
+            tree_time = self._measure(parse_with_tree, xml_text, options['repeat'])
+            stream_time = self._measure(parse_update_info, xml_text, options['repeat'])
+            self.stdout.write(
+                f'Поля в {"начале" if position == "start" else "конце"} ответа '
+                f'({len(xml_text.encode()) / 1024:.0f} КБ): '
+                f'дерево {tree_time * 1000:.2f} мс, '
+                f'потоковый {stream_time * 1000:.2f} мс, '
+                f'ускорение x{tree_time / stream_time:.1f}'
+            )
@@ -1,10 +1,14 @@
-from django.core.management.base import BaseCommand
-from django.utils import timezone
-from templates.models import Template, UpdateLog
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from templates.profiling import PHASES, sweep_profiler
+from templates.async_services import AsyncEIASAPIService, AsyncMattermostService
+from templates.async_sweep import AsyncTemplateSweep
 from templates.services import EIASAPIService, MattermostService
-import logging
-
-logger = logging.getLogger(__name__)
+from templates.sweep import TemplateSweep
+import cProfile
+import io
+import pstats
 
 
 class Command(BaseCommand):
@@ -26,6 +30,47 @@ class Command(BaseCommand):
             action='store_true',
             help='Запустить в режиме отладки с debugpy сервером'
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Количество параллельных запросов к API EIAS (1 - последовательная проверка; '
+                 'по умолчанию EIAS_WORKERS, с --async - EIAS_ASYNC_CONCURRENCY)'
+        )
+        parser.add_argument(
+            '--async',
+            dest='use_async',
+            action='store_true',
+            default=settings.SWEEP_ASYNC,
+            help='Асинхронная проверка (asyncio) вместо пула потоков (по умолчанию SWEEP_ASYNC)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.SWEEP_DB_BATCH_SIZE,
+            help='Количество шаблонов в одной транзакции записи результатов'
+        )
+        parser.add_argument(
+            '--ignore-schedule',
+            action='store_true',
+            help='Проверить все активные шаблоны, не только те, чья проверка наступила по расписанию'
+        )
+        parser.add_argument(
+            '--profile',
+            action='store_true',
+            help='Замерить время по фазам проверки (запрос, декодирование, разбор XML, БД, уведомления)'
+        )
+        parser.add_argument(
+            '--profile-output',
+            type=str,
+            help='Сохранить статистику cProfile в файл (включает --profile). '
+                 'cProfile учитывает только основной поток, для запросов к API используйте --workers 1'
+        )
+        parser.add_argument(
+            '--profile-top',
+            type=int,
+            default=20,
+            help='Количество самых долгих шаблонов и функций в отчете профилирования'
+        )
 
     def handle(self, *args, **options):
         # Настройка отладки
@@ -48,101 +93,92 @@ class Command(BaseCommand):
         )
         
         # Инициализируем сервисы
-        eias_service = EIASAPIService()
-        mattermost_service = MattermostService()
-        
-        # Получаем шаблоны для проверки
-        if options['template_code']:
-            templates = Template.objects.filter(
-                template_code=options['template_code'],
-                status=Template.Status.ACTIVE
-            )
+        if options['use_async']:
+            workers = options['workers'] or settings.EIAS_ASYNC_CONCURRENCY
+            try:
+                eias_service = AsyncEIASAPIService(workers)
+            except ImproperlyConfigured as e:
+                raise CommandError(e)
+            mattermost_service = AsyncMattermostService()
+            sweep_class = AsyncTemplateSweep
         else:
-            templates = Template.objects.filter(status=Template.Status.ACTIVE)
+            workers = options['workers'] or settings.EIAS_WORKERS
+            eias_service = EIASAPIService()
+            mattermost_service = MattermostService()
+            sweep_class = TemplateSweep
         
-        if not templates.exists():
-            self.stdout.write(
-                self.style.WARNING('Не найдено активных шаблонов для проверки')
+        sweep = sweep_class(
+            eias_service,
+            mattermost_service,
+            self.stdout,
+            self.style,
+            workers=workers,
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run']
+        )
+        profile = options['profile'] or bool(options['profile_output'])
+        profiler = None
+        if profile:
+            sweep_profiler.reset()
+            sweep_profiler.enabled = True
+            if options['profile_output']:
+                profiler = cProfile.Profile()
+                profiler.enable()
+        try:
+            stats = sweep.run(
+                template_code=options['template_code'],
+                ignore_schedule=options['ignore_schedule']
             )
+        finally:
+            if profiler:
+                profiler.disable()
+            sweep_profiler.enabled = False
+        if stats is None:
             return
         
-        self.stdout.write(f'Найдено {templates.count()} шаблонов для проверки')
+        sweep.write_summary(stats)
+        if profile:
+            self._write_profile_report(stats, options['profile_top'])
+        if profiler:
+            profiler.dump_stats(options['profile_output'])
+            self.stdout.write(f'Статистика cProfile сохранена в {options["profile_output"]}')
+            self.stdout.write('Функции с наибольшим суммарным временем:')
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(options['profile_top'])
+            self.stdout.write(report.getvalue())
         
-        updated_count = 0
-        error_count = 0
-        
-        for template in templates:
-            try:
-                self.stdout.write(f'Проверяем шаблон: {template.template_code}')
-                
-                # Получаем информацию о шаблоне из API
-                update_log = eias_service.get_template_info(template)
-                if not update_log:
-                    self.stdout.write(
-                        self.style.ERROR(f'Не удалось получить данные для {template.template_code}')
-                    )
-                    error_count += 1
-                    continue
-                
-                # Проверяем, изменилась ли версия
-                if update_log.new_version == template.current_version:
-                    self.stdout.write(
-                        f'Версия актуальна: {template.template_code} ({update_log.new_version})'
-                    )
-                else:
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f'Обнаружено обновление: {template.template_code} '
-                            f'{template.current_version} → {update_log.new_version}'
-                        )
-                    )
-                    
-                    # Сохраняем запись в логе только при обновлении
-                    update_log.save()
-                    
-                    # Отправляем уведомление в Mattermost (если не dry-run)
-                    if not options['dry_run']:
-                        success = mattermost_service.send_template_update_notification(update_log)
-                        
-                        if success:
-                            update_log.message_status = UpdateLog.MessageStatus.SENT
-                            update_log.save()
-                            # Обновляем версию в базе данных
-                            template.current_version = update_log.new_version
-                            self.stdout.write(
-                                self.style.SUCCESS(f'Уведомление отправлено для {template.template_code}')
-                            )
-                        else:
-                            self.stdout.write(
-                                self.style.ERROR(f'Ошибка отправки уведомления для {template.template_code}')
-                            )
-                    else:
-                        self.stdout.write(
-                            self.style.WARNING(f'[DRY RUN] Уведомление НЕ отправлено для {template.template_code}')
-                        )
-                    updated_count += 1
-                    
-                # Обновляем время последней проверки
-                template.last_checked = timezone.now()
-                template.save()
-                
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f'Ошибка при обработке {template.template_code}: {e}')
-                )
-                error_count += 1
-                logger.error(f'Ошибка при обработке шаблона {template.template_code}: {e}')
-        
-        # Выводим итоговую статистику
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.WARNING('Запуск в режиме DRY RUN - уведомления не отправлялись')
+            )
+
+    def _write_profile_report(self, stats, top):
+        """Выводит распределение времени проверки по фазам и самые долгие шаблоны"""
+        wall_time = stats['wall_time']
         self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS('Профилирование проверки'))
+        self.stdout.write(
+            'Время фаз суммируется по всем потокам, поэтому при --workers > 1 '
+            'может превышать время проверки'
+        )
         self.stdout.write(
-            self.style.SUCCESS(f'Проверка завершена!')
+            f'{"Фаза":<10} {"всего, с":>10} {"% проверки":>11} {"вызовов":>8} '
+            f'{"среднее, мс":>12} {"макс, мс":>10}'
         )
-        self.stdout.write(f'Обновлено шаблонов: {updated_count}')
-        self.stdout.write(f'Ошибок: {error_count}')
-        self.stdout.write(f'Всего проверено: {templates.count()}')
+        for name, phase in sweep_profiler.phase_report():
+            share = phase['total'] / wall_time * 100 if wall_time > 0 else 0
+            self.stdout.write(
+                f'{name:<10} {phase["total"]:>10.2f} {share:>10.1f}% {phase["count"]:>8} '
+                f'{phase["avg"] * 1000:>12.1f} {phase["max"] * 1000:>10.1f}'
+            )
         
-        if options['dry_run']:
+        rows = sweep_profiler.template_report(top)
+        if not rows:
+            return
+        self.stdout.write(f'\nСамые долгие шаблоны (мс):')
+        self.stdout.write(f'{"Шаблон":<40} {"всего":>8} ' + ' '.join(f'{name:>8}' for name in PHASES))
+        for template_code, total, phases in rows:
             self.stdout.write(
-                self.style.WARNING('Запуск в режиме DRY RUN - уведомления не отправлялись')
+                f'{template_code:<40} {total * 1000:>8.1f} '
+                + ' '.join(f'{phases.get(name, 0) * 1000:>8.1f}' for name in PHASES)
             )
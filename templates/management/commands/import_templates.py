@@ -0,0 +1,320 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from templates.models import Template
+from templates.services import EIASAPIService
+import csv
+import io
+import json
+import os
+import sys
+
+
+class Command(BaseCommand):
+    help = 'Массово добавляет шаблоны для мониторинга из CSV, JSON или JSON Lines (файл или stdin)'
+
+    code_max_length = Template._meta.get_field('template_code').max_length
+    version_max_length = Template._meta.get_field('current_version').max_length
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source',
+            type=str,
+            nargs='?',
+            default='-',
+            help='Файл с шаблонами ("-" или без аргумента - stdin)'
+        )
+        parser.add_argument(
+            '--format',
+            type=str,
+            choices=['auto', 'csv', 'json', 'jsonl'],
+            default='auto',
+            help='Формат входных данных (по умолчанию определяется по расширению файла или содержимому)'
+        )
+        parser.add_argument(
+            '--default-version',
+            type=str,
+            default='1.0.0',
+            help='Версия для шаблонов, у которых она не указана (по умолчанию: 1.0.0)'
+        )
+        parser.add_argument(
+            '--status',
+            type=str,
+            choices=['active', 'inactive'],
+            default='active',
+            help='Статус для шаблонов, у которых он не указан (по умолчанию: active)'
+        )
+        parser.add_argument(
+            '--fetch-versions',
+            action='store_true',
+            help='Запросить текущую версию новых шаблонов без указанной версии из API EIAS'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=max(settings.EIAS_WORKERS, settings.EIAS_MAX_PER_HOST),
+            help='Количество параллельных запросов к API EIAS при --fetch-versions'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество шаблонов, добавляемых одним запросом'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только проверить входные данные и подсчитать новые шаблоны'
+        )
+
+    def handle(self, *args, **options):
+        self.default_version = options['default_version']
+        self.default_status = options['status']
+        batch_size = max(1, options['batch_size'])
+        self.eias_service = EIASAPIService() if options['fetch_versions'] and not options['dry_run'] else None
+        self.workers = max(1, options['workers'])
+
+        # Существующие коды загружаем одним запросом, дальше входные данные
+        # читаются потоком и сравниваются с этим набором
+        known = set(Template.objects.values_list('template_code', flat=True).iterator())
+        self._seen = set()
+        self.stats = {'read': 0, 'existing': 0, 'duplicates': 0, 'invalid': 0, 'created': 0,
+                      'versions_fetched': 0, 'versions_failed': 0}
+
+        stream = self._open(options['source'])
+        try:
+            batch = []
+            for line, record in self._read_records(stream, options['format'], options['source']):
+                self.stats['read'] += 1
+                template = self._build_template(line, record)
+                if template is None:
+                    self.stats['invalid'] += 1
+                    continue
+                if template.template_code in known:
+                    # Повтор кода во входных данных или уже отслеживаемый шаблон
+                    self.stats['duplicates' if template.template_code in self._seen else 'existing'] += 1
+                    continue
+                known.add(template.template_code)
+                self._seen.add(template.template_code)
+                batch.append(template)
+                if len(batch) >= batch_size:
+                    self._save(batch, options['dry_run'])
+                    batch = []
+            if batch:
+                self._save(batch, options['dry_run'])
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self._write_summary(options['dry_run'])
+
+    def _open(self, source):
+        """Открывает входной файл или stdin"""
+        if source == '-':
+            return sys.stdin
+        try:
+            return open(source, encoding='utf-8-sig', newline='')
+        except OSError as e:
+            raise CommandError(f'Не удалось открыть {source}: {e}')
+
+    def _detect_format(self, stream, source):
+        """
+        Определяет формат по расширению файла, а для stdin - по первому символу
+
+        Returns:
+            Формат и поток, из которого можно читать с начала
+        """
+        extension = os.path.splitext(source)[1].lower().lstrip('.')
+        if extension in ('csv', 'json', 'jsonl'):
+            return extension, stream
+        if extension == 'ndjson':
+            return 'jsonl', stream
+
+        # Прочитанное начало возвращаем перед остатком потока
+        head = stream.read(4096)
+        stripped = head.lstrip()
+        if stripped.startswith('['):
+            file_format = 'json'
+        elif stripped.startswith('{'):
+            file_format = 'jsonl'
+        else:
+            file_format = 'csv'
+        return file_format, _PrefixedStream(head, stream)
+
+    def _read_records(self, stream, file_format, source):
+        """
+        Читает записи о шаблонах
+
+        Yields:
+            Кортежи (номер строки или элемента, словарь с ключами template_code, version, status)
+        """
+        if file_format == 'auto':
+            file_format, stream = self._detect_format(stream, source)
+
+        if file_format == 'json':
+            # Массив JSON читается целиком; для больших каталогов используйте JSON Lines
+            try:
+                items = json.load(stream)
+            except json.JSONDecodeError as e:
+                raise CommandError(f'Некорректный JSON: {e}')
+            if not isinstance(items, list):
+                raise CommandError('JSON должен содержать массив шаблонов')
+            for number, item in enumerate(items, start=1):
+                yield number, item
+
+        elif file_format == 'jsonl':
+            for number, line in enumerate(stream, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield number, json.loads(line)
+                except json.JSONDecodeError as e:
+                    self._invalid(number, f'некорректный JSON: {e}')
+                    yield number, None
+
+        else:
+            # Строка заголовка необязательна: без нее колонки - код, версия, статус
+            reader = csv.reader(stream)
+            columns = ['template_code', 'version', 'status']
+            for row in reader:
+                if not row or not any(cell.strip() for cell in row):
+                    continue
+                if reader.line_num == 1 and row[0].strip().lower() == 'template_code':
+                    columns = [cell.strip().lower() for cell in row]
+                    continue
+                yield reader.line_num, dict(zip(columns, row))
+
+    def _build_template(self, line, record):
+        """
+        Создает (не сохраняя) шаблон из записи входных данных
+
+        Returns:
+            Объект Template или None, если запись некорректна
+        """
+        if record is None:
+            return None
+        if isinstance(record, str):
+            record = {'template_code': record}
+        if not isinstance(record, dict):
+            self._invalid(line, 'ожидается код шаблона или объект')
+            return None
+
+        template_code = str(record.get('template_code') or '').strip()
+        version = str(record.get('version') or record.get('current_version') or '').strip()
+        status = str(record.get('status') or '').strip().lower() or self.default_status
+
+        if not template_code:
+            self._invalid(line, 'не указан код шаблона')
+            return None
+        if len(template_code) > self.code_max_length:
+            self._invalid(line, f'код шаблона длиннее {self.code_max_length} символов')
+            return None
+        if len(version) > self.version_max_length:
+            self._invalid(line, f'версия длиннее {self.version_max_length} символов')
+            return None
+        if status not in Template.Status.values:
+            self._invalid(line, f'неизвестный статус "{status}"')
+            return None
+
+        return Template(template_code=template_code, current_version=version, status=status)
+
+    def _invalid(self, line, reason):
+        self.stdout.write(self.style.WARNING(f'Строка {line} пропущена: {reason}'))
+
+    def _fetch_versions(self, templates):
+        """
+        Запрашивает текущие версии шаблонов без указанной версии параллельно
+
+        Шаблоны, версию которых получить не удалось, добавляются с версией по умолчанию.
+        """
+        def fetch(template):
+            # Запрашиваем с версией по умолчанию: в ответе всегда последняя версия шаблона
+            template.current_version = self.default_version
+            info = self.eias_service.get_template_info(template)
+            return template, info
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='eias') as executor:
+            for template, info in executor.map(fetch, templates):
+                if info and info.version:
+                    template.current_version = info.version
+                    self.stats['versions_fetched'] += 1
+                else:
+                    self.stdout.write(
+                        self.style.WARNING(
+                            f'Не удалось получить версию {template.template_code}, '
+                            f'используется {self.default_version}'
+                        )
+                    )
+                    self.stats['versions_failed'] += 1
+
+    def _save(self, batch, dry_run):
+        """Добавляет пакет новых шаблонов одним запросом"""
+        without_version = [template for template in batch if not template.current_version]
+        if self.eias_service and without_version:
+            self._fetch_versions(without_version)
+        for template in without_version:
+            if not template.current_version:
+                template.current_version = self.default_version
+        # bulk_create не вызывает save, ключ сортировки версии заполняем сами
+        for template in batch:
+            template.set_version(template.current_version)
+
+        if dry_run:
+            self.stats['created'] += len(batch)
+            return
+
+        # ignore_conflicts: шаблоны, добавленные параллельно после загрузки кодов,
+        # пропускаются, а не прерывают импорт ошибкой уникальности. bulk_create не
+        # сообщает, сколько строк пропущено, поэтому добавленные считаем по БД
+        codes = [template.template_code for template in batch]
+        with transaction.atomic():
+            existing = Template.objects.filter(template_code__in=codes).count()
+            Template.objects.bulk_create(batch, ignore_conflicts=True)
+            created = Template.objects.filter(template_code__in=codes).count() - existing
+        self.stats['created'] += created
+        self.stats['existing'] += len(batch) - created
+        self.stdout.write(f'Добавлено шаблонов: {self.stats["created"]}')
+
+    def _write_summary(self, dry_run):
+        stats = self.stats
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{"[DRY RUN] Будет добавлено" if dry_run else "Добавлено"} шаблонов: {stats["created"]}'
+            )
+        )
+        self.stdout.write(f'Прочитано записей: {stats["read"]}')
+        self.stdout.write(f'Уже отслеживаются: {stats["existing"]}')
+        self.stdout.write(f'Повторы во входных данных: {stats["duplicates"]}')
+        self.stdout.write(f'Некорректных записей: {stats["invalid"]}')
+        if self.eias_service:
+            self.stdout.write(
+                f'Версий получено из EIAS: {stats["versions_fetched"]}, ошибок: {stats["versions_failed"]}'
+            )
+
+
+class _PrefixedStream(io.TextIOBase):
+    """Текстовый поток, который сначала отдает уже прочитанное начало, затем остаток"""
+
+    def __init__(self, head, stream):
+        self._head = io.StringIO(head)
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        data = self._head.read(size)
+        if size is None or size < 0:
+            return data + self._stream.read()
+        if len(data) < size:
+            data += self._stream.read(size - len(data))
+        return data
+
+    def readline(self, size=-1):
+        line = self._head.readline(size)
+        if line.endswith('\n') or (size is not None and 0 <= size == len(line)):
+            return line
+        return line + self._stream.readline(-1 if size is None or size < 0 else size - len(line))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from templates.notifications import NotificationDispatcher, Outbox
+from templates.services import MattermostService
+
+
+class Command(BaseCommand):
+    help = 'Повторно отправляет неотправленные уведомления об обновлениях шаблонов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Количество уведомлений, захватываемых за один раз'
+        )
+
+    def handle(self, *args, **options):
+        dispatcher = NotificationDispatcher(MattermostService()).start()
+        claimed = 0
+        for update_logs in Outbox(options['batch_size']).claim_all_due():
+            dispatcher.submit(update_logs)
+            claimed += len(update_logs)
+        dispatcher.close()
+        
+        if not claimed:
+            self.stdout.write('Нет уведомлений, ожидающих отправки')
+            return
+        
+        self.stdout.write(f'Уведомлений в очереди: {claimed}')
+        self.stdout.write(
+            self.style.SUCCESS(f'Отправлено: {dispatcher.sent} (сообщений: {dispatcher.messages})')
+        )
+        if dispatcher.failed:
+            self.stdout.write(
+                self.style.ERROR(f'Не отправлено (будут отправлены повторно): {dispatcher.failed}')
+            )
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from templates.push import PushProcessor
+from templates.services import EIASAPIService, MattermostService
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает входящие уведомления EIAS о новых версиях шаблонов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.SWEEP_DB_BATCH_SIZE,
+            help='Количество событий, обрабатываемых в одной транзакции'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Обработать первую порцию без сохранения результатов и отправки уведомлений'
+        )
+
+    def handle(self, *args, **options):
+        processor = PushProcessor(
+            EIASAPIService(),
+            MattermostService(),
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run']
+        )
+        stats = processor.run()
+        
+        if not stats['processed'] and not stats['ignored'] and not stats['deferred']:
+            self.stdout.write('Нет входящих уведомлений, ожидающих обработки')
+            return
+        
+        prefix = '[DRY RUN] ' if options['dry_run'] else ''
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{prefix}Обработано уведомлений: {stats["processed"]}, обновлений: {stats["updated"]}'
+            )
+        )
+        if stats['ignored']:
+            self.stdout.write(
+                self.style.WARNING(f'Пропущено (шаблон не отслеживается или ошибка): {stats["ignored"]}')
+            )
+        if stats['deferred']:
+            self.stdout.write(f'Отложено до следующего запуска (шаблон проверяется): {stats["deferred"]}')
+        if 'notifications_sent' in stats:
+            self.stdout.write(
+                f'Уведомлений отправлено: {stats["notifications_sent"]}, ошибок: {stats["notifications_failed"]}'
+            )
@@ -0,0 +1,132 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from templates.models import PushEvent, RawPayload, UpdateLog
+import gzip
+import json
+
+
+class Command(BaseCommand):
+    help = 'Удаляет (с архивированием) старые отправленные логи обновлений и неиспользуемые исходные XML'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.UPDATELOG_RETENTION_DAYS,
+            help='Срок хранения логов в днях (0 - хранить бессрочно)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество логов, удаляемых в одной транзакции'
+        )
+        parser.add_argument(
+            '--archive',
+            type=str,
+            help='Дописать удаляемые логи в файл JSON Lines со сжатием gzip'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только подсчитать логи, которые будут удалены'
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] <= 0:
+            self.stdout.write('Срок хранения не задан, логи не удаляются')
+            return
+        
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        # Неотправленные логи - записи очереди уведомлений, их не удаляем
+        logs = UpdateLog.objects.filter(
+            created_at__lt=cutoff,
+            message_status=UpdateLog.MessageStatus.SENT
+        )
+        
+        if options['dry_run']:
+            self.stdout.write(f'Будет удалено логов старше {cutoff:%d.%m.%Y}: {logs.count()}')
+            return
+        
+        archive = gzip.open(options['archive'], 'at', encoding='utf-8') if options['archive'] else None
+        deleted = 0
+        try:
+            # Удаляем порциями по первичному ключу, чтобы не держать долгих блокировок
+            while True:
+                batch = list(
+                    logs.select_related('template', 'payload').order_by('pk')[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                if archive:
+                    for update_log in batch:
+                        archive.write(json.dumps(self._serialize(update_log), ensure_ascii=False) + '\n')
+                    archive.flush()
+                with transaction.atomic():
+                    UpdateLog.objects.filter(pk__in=[update_log.pk for update_log in batch]).delete()
+                deleted += len(batch)
+        finally:
+            if archive:
+                archive.close()
+        
+        # Обработанные входящие уведомления EIAS (необработанные - очередь, их не удаляем)
+        events_deleted, _ = PushEvent.objects.filter(
+            received_at__lt=cutoff
+        ).exclude(status=PushEvent.Status.PENDING).delete()
+        
+        payloads_deleted = self._delete_orphan_payloads(cutoff)
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Удалено логов старше {cutoff:%d.%m.%Y}: {deleted}, входящих уведомлений: {events_deleted}, '
+                f'исходных XML: {payloads_deleted}'
+            )
+        )
+        if archive:
+            self.stdout.write(f'Удаленные логи сохранены в {options["archive"]}')
+
+    def _delete_orphan_payloads(self, cutoff):
+        """
+        Удаляет исходные XML, на которые больше не ссылается ни один лог и ни одно уведомление
+
+        Проверка ссылок и удаление выполняются одним запросом DELETE ... WHERE
+        NOT EXISTS: при выборке и удалении по списку ключей (QuerySet.delete)
+        CheckResultWriter.flush мог сослаться на XML между двумя запросами.
+        Если запись со ссылкой зафиксирована раньше удаления, запрос
+        завершается ошибкой внешнего ключа, а не удаляет используемый XML.
+
+        Returns:
+            Количество удаленных записей
+        """
+        quote = connection.ops.quote_name
+        payload_table = quote(RawPayload._meta.db_table)
+        payload_pk = quote(RawPayload._meta.pk.column)
+        references = ' AND '.join(
+            f'NOT EXISTS (SELECT 1 FROM {quote(model._meta.db_table)} '
+            f'WHERE {quote(model._meta.get_field("payload").column)} = {payload_table}.{payload_pk})'
+            for model in (UpdateLog, PushEvent)
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {payload_table} '
+                f'WHERE {quote(RawPayload._meta.get_field("created_at").column)} < %s AND {references}',
+                [cutoff]
+            )
+            return cursor.rowcount
+
+    def _serialize(self, update_log):
+        """Запись лога для архива"""
+        return {
+            'id': update_log.pk,
+            'template_code': update_log.template.template_code,
+            'old_version': update_log.old_version,
+            'new_version': update_log.new_version,
+            'has_validation_changes': update_log.has_validation_changes,
+            'message_status': update_log.message_status,
+            'delivery_attempts': update_log.delivery_attempts,
+            'created_at': update_log.created_at.isoformat(),
+            'raw_xml': update_log.raw_xml,
+        }
@@ -0,0 +1,147 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from templates.http_client import close_session, request_stats
+from templates.push import PushProcessor
+from templates.async_services import AsyncEIASAPIService, AsyncMattermostService
+from templates.async_sweep import AsyncTemplateSweep
+from templates.services import EIASAPIService, MattermostService
+from templates.sweep import TemplateSweep
+import logging
+import signal
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Запускает постоянно работающий мониторинг обновлений шаблонов (вместо запуска из cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=settings.SCHEDULE_MIN_INTERVAL,
+            help='Интервал между проверками в секундах'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Запустить в режиме тестирования без отправки уведомлений'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Количество параллельных запросов к API EIAS (1 - последовательная проверка; '
+                 'по умолчанию EIAS_WORKERS, с --async - EIAS_ASYNC_CONCURRENCY)'
+        )
+        parser.add_argument(
+            '--async',
+            dest='use_async',
+            action='store_true',
+            default=settings.SWEEP_ASYNC,
+            help='Асинхронная проверка (asyncio) вместо пула потоков (по умолчанию SWEEP_ASYNC)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.SWEEP_DB_BATCH_SIZE,
+            help='Количество шаблонов в одной транзакции записи результатов'
+        )
+
+    def handle(self, *args, **options):
+        stop_event = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write(
+                self.style.WARNING(f'Получен сигнал {signal.Signals(signum).name}, завершаем работу...')
+            )
+            stop_event.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        # Сервисы, HTTP пул, кэш ответов и соединение с БД живут все время работы процесса
+        # (асинхронный HTTP клиент создается заново в цикле событий каждой проверки)
+        if options['use_async']:
+            workers = options['workers'] or settings.EIAS_ASYNC_CONCURRENCY
+            try:
+                eias_service = AsyncEIASAPIService(workers)
+            except ImproperlyConfigured as e:
+                raise CommandError(e)
+            sweep = AsyncTemplateSweep(
+                eias_service,
+                AsyncMattermostService(),
+                self.stdout,
+                self.style,
+                workers=workers,
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+                stop_event=stop_event
+            )
+        else:
+            sweep = TemplateSweep(
+                EIASAPIService(),
+                MattermostService(),
+                self.stdout,
+                self.style,
+                workers=options['workers'] or settings.EIAS_WORKERS,
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+                stop_event=stop_event
+            )
+
+        # Входящие уведомления EIAS обрабатываются перед каждой проверкой
+        push_processor = PushProcessor(
+            sweep.eias_service,
+            sweep.mattermost_service,
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run']
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Мониторинг запущен, интервал проверки {options["interval"]} с')
+        )
+
+        while not stop_event.is_set():
+            started = time.monotonic()
+            self._ensure_db_connection()
+            request_stats.reset()
+            try:
+                push_stats = push_processor.run()
+                if push_stats['processed'] or push_stats['ignored'] or push_stats['deferred']:
+                    self.stdout.write(
+                        f'Обработано входящих уведомлений: {push_stats["processed"]}, '
+                        f'обновлений: {push_stats["updated"]}, пропущено: {push_stats["ignored"]}, '
+                        f'отложено: {push_stats["deferred"]}'
+                    )
+            except Exception as e:
+                self.stdout.write(
+                    self.style.ERROR(f'Ошибка при обработке входящих уведомлений: {e}')
+                )
+                logger.error(f'Ошибка при обработке входящих уведомлений: {e}')
+            try:
+                stats = sweep.run()
+                if stats is not None:
+                    sweep.write_summary(stats)
+            except Exception as e:
+                self.stdout.write(
+                    self.style.ERROR(f'Ошибка при проверке шаблонов: {e}')
+                )
+                logger.error(f'Ошибка при проверке шаблонов: {e}')
+
+            # Ждем до следующей проверки, просыпаясь сразу при получении сигнала
+            stop_event.wait(max(0, options['interval'] - (time.monotonic() - started)))
+
+        if sweep.eias_service.cache:
+            sweep.eias_service.cache.close()
+        close_session()
+        connection.close()
+        self.stdout.write(self.style.SUCCESS('Мониторинг остановлен'))
+
+    def _ensure_db_connection(self):
+        """Переоткрывает соединение с БД, если оно было разорвано"""
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
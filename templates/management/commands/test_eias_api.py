@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
+from templates.models import Template
 from templates.services import EIASAPIService
-import json
 
 
 class Command(BaseCommand):
@@ -35,11 +35,12 @@ class Command(BaseCommand):
         # Инициализируем сервис
         eias_service = EIASAPIService()
         
-        # Выполняем запрос
+        # Выполняем запрос (шаблон в БД не сохраняется)
         self.stdout.write('Отправляем запрос к API...')
-        api_data = eias_service.get_template_info(template_code, version)
+        template = Template(template_code=template_code, current_version=version)
+        info = eias_service.get_template_info(template, keep_xml=options['show_xml'])
         
-        if not api_data:
+        if not info:
             self.stdout.write(
                 self.style.ERROR('Не удалось получить данные от API')
             )
@@ -50,22 +51,16 @@ class Command(BaseCommand):
             self.style.SUCCESS('Данные успешно получены!')
         )
         
-        self.stdout.write(f'Код шаблона: {api_data.get("template_code")}')
-        self.stdout.write(f'Последняя версия: {api_data.get("latest_version")}')
-        self.stdout.write(f'Изменения в проверках: {api_data.get("has_validation_changes")}')
-        self.stdout.write(f'Время парсинга: {api_data.get("parsed_at")}')
+        self.stdout.write(f'Код шаблона: {template_code}')
+        self.stdout.write(f'Последняя версия: {info.version}')
+        self.stdout.write(f'Версия изменилась: {info.changed}')
+        self.stdout.write(f'Изменения в проверках: {info.has_validation_changes}')
+        self.stdout.write(f'Категории изменений: {", ".join(info.categories) or "-"}')
+        if info.not_modified:
+            self.stdout.write('Ответ не изменился с прошлой проверки (данные из кэша)')
         
-        if options['show_xml'] and api_data.get('raw_xml'):
+        if options['show_xml'] and info.raw_xml:
             self.stdout.write('\n' + '='*50)
             self.stdout.write('XML ОТВЕТ:')
             self.stdout.write('='*50)
-            self.stdout.write(api_data['raw_xml'])
-        
-        # Показываем структуру данных
-        self.stdout.write('\n' + '='*50)
-        self.stdout.write('СТРУКТУРА ДАННЫХ:')
-        self.stdout.write('='*50)
-        
-        for key, value in api_data.items():
-            if key != 'raw_xml':  # Пропускаем XML для краткости
-                self.stdout.write(f'{key}: {value}')
+            self.stdout.write(info.raw_xml)
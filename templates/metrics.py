@@ -0,0 +1,240 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, write_to_textfile
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from .resilience import CircuitBreaker, resilience_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Метрики процесса проверки шаблонов (cron или run_monitor). Реестр отдельный от
+# стандартного, чтобы в выгрузку не попадали метрики самого Python процесса
+registry = CollectorRegistry()
+
+HTTP_REQUEST_DURATION = Histogram(
+    'tpl_http_request_duration_seconds',
+    'Длительность HTTP запросов к внешним сервисам',
+    ['service'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+    registry=registry
+)
+ERRORS = Counter(
+    'tpl_errors',
+    'Ошибки по компонентам и типам',
+    ['component', 'error_type'],
+    registry=registry
+)
+SWEEP_DURATION = Histogram(
+    'tpl_sweep_duration_seconds',
+    'Длительность прохода проверки шаблонов',
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+    registry=registry
+)
+SWEEP_TEMPLATES = Counter(
+    'tpl_sweep_templates',
+    'Проверенные шаблоны по результату проверки',
+    ['result'],
+    registry=registry
+)
+SWEEP_THROUGHPUT = Gauge(
+    'tpl_sweep_templates_per_second',
+    'Скорость последнего прохода проверки (шаблонов в секунду)',
+    registry=registry
+)
+SWEEP_DB_QUERIES = Gauge(
+    'tpl_sweep_db_queries',
+    'Количество SQL запросов за последний проход проверки',
+    registry=registry
+)
+DB_QUERIES = Counter(
+    'tpl_db_queries',
+    'Количество SQL запросов при проверках шаблонов',
+    registry=registry
+)
+SWEEP_LAST_COMPLETED = Gauge(
+    'tpl_sweep_last_completed_timestamp_seconds',
+    'Время завершения последнего прохода проверки (Unix time)',
+    registry=registry
+)
+NOTIFICATIONS = Counter(
+    'tpl_notifications',
+    'Уведомления об обновлениях по результату отправки',
+    ['result'],
+    registry=registry
+)
+NOTIFICATION_MESSAGES = Counter(
+    'tpl_notification_messages',
+    'Отправленные в Mattermost сообщения (включая сводные)',
+    registry=registry
+)
+PUSH_EVENTS = Counter(
+    'tpl_push_events',
+    'Обработанные входящие уведомления EIAS по результату',
+    ['result'],
+    registry=registry
+)
+
+
+class ResilienceCollector:
+    """Состояние выключателей и адаптивных пределов запросов на момент выгрузки"""
+
+    def collect(self):
+        state = GaugeMetricFamily(
+            'tpl_circuit_breaker_state', 'Текущее состояние выключателя (1 - активное)', labels=['host', 'state']
+        )
+        opened = CounterMetricFamily(
+            'tpl_circuit_breaker_opened', 'Количество размыканий выключателя', labels=['host']
+        )
+        rejected = CounterMetricFamily(
+            'tpl_circuit_breaker_rejected', 'Запросы, отклоненные выключателем', labels=['host']
+        )
+        limit = GaugeMetricFamily(
+            'tpl_concurrency_limit', 'Текущий предел одновременных запросов', labels=['host']
+        )
+        decreases = CounterMetricFamily(
+            'tpl_concurrency_limit_decreases', 'Количество снижений предела одновременных запросов',
+            labels=['host']
+        )
+        for host, snapshot in resilience_snapshot().items():
+            breaker = snapshot['breaker']
+            if breaker:
+                for name in (CircuitBreaker.CLOSED, CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN):
+                    state.add_metric([host, name], 1 if breaker['state'] == name else 0)
+                opened.add_metric([host], breaker['opened'])
+                rejected.add_metric([host], breaker['rejected'])
+            limiter = snapshot['limiter']
+            if limiter:
+                limit.add_metric([host], limiter['limit'])
+                decreases.add_metric([host], limiter['decreases'])
+        return [state, opened, rejected, limit, decreases]
+
+
+registry.register(ResilienceCollector())
+
+
+class TemplateStatsCollector:
+    """
+    Показатели очереди проверок и уведомлений из БД
+
+    Значения запрашиваются тремя агрегатными запросами по индексам (status,
+    next_check_at) и (message_status, ...) и запоминаются на
+    METRICS_DB_CACHE_TTL секунд, поэтому частые опросы /metrics (несколько
+    экземпляров Prometheus) не нагружают БД. Возраст самого старого
+    уведомления считается на момент выгрузки.
+    """
+
+    def __init__(self):
+        self._values = None
+        self._queried_at = 0.0
+        self._lock = threading.Lock()
+
+    def _query(self) -> dict:
+        from django.db.models import Count, Min, Q
+        from django.utils import timezone
+        from .models import PushEvent, Template, UpdateLog
+
+        templates = Template.objects.filter(status=Template.Status.ACTIVE).aggregate(
+            active=Count('pk'),
+            due=Count('pk', filter=Q(next_check_at__lte=timezone.now()))
+        )
+        outbox = UpdateLog.objects.filter(message_status=UpdateLog.MessageStatus.NOTSENT).aggregate(
+            pending=Count('pk'),
+            oldest=Min('created_at')
+        )
+        return {
+            'active': templates['active'],
+            'due': templates['due'],
+            'outbox_pending': outbox['pending'],
+            'outbox_oldest': outbox['oldest'],
+            'push_pending': PushEvent.objects.filter(status=PushEvent.Status.PENDING).count(),
+        }
+
+    def values(self) -> dict:
+        """Показатели из БД, не старше METRICS_DB_CACHE_TTL секунд"""
+        with self._lock:
+            if self._values is None or time.monotonic() - self._queried_at >= settings.METRICS_DB_CACHE_TTL:
+                self._values = self._query()
+                self._queried_at = time.monotonic()
+            return self._values
+
+    def collect(self):
+        from django.utils import timezone
+
+        values = self.values()
+        templates = GaugeMetricFamily('tpl_templates_active', 'Количество активных шаблонов')
+        templates.add_metric([], values['active'])
+        due = GaugeMetricFamily('tpl_templates_due', 'Активные шаблоны, время проверки которых наступило')
+        due.add_metric([], values['due'])
+        outbox = GaugeMetricFamily('tpl_outbox_pending', 'Неотправленные уведомления')
+        outbox.add_metric([], values['outbox_pending'])
+        oldest = values['outbox_oldest']
+        outbox_age = GaugeMetricFamily(
+            'tpl_outbox_oldest_age_seconds', 'Возраст самого старого неотправленного уведомления'
+        )
+        outbox_age.add_metric([], (timezone.now() - oldest).total_seconds() if oldest else 0)
+        push_pending = GaugeMetricFamily('tpl_push_pending', 'Необработанные входящие уведомления EIAS')
+        push_pending.add_metric([], values['push_pending'])
+        return [templates, due, outbox, outbox_age, push_pending]
+
+
+def observe_request(service: str, elapsed: float):
+    """Добавляет длительность HTTP запроса к сервису в гистограмму"""
+    HTTP_REQUEST_DURATION.labels(service).observe(elapsed)
+
+
+def record_error(component: str, error_type: str):
+    """Учитывает ошибку компонента (eias, mattermost, sweep) по типу"""
+    ERRORS.labels(component, error_type).inc()
+
+
+def record_notifications(sent: int, failed: int):
+    """Учитывает результат отправки одного сообщения в Mattermost"""
+    NOTIFICATION_MESSAGES.inc()
+    if sent:
+        NOTIFICATIONS.labels('sent').inc(sent)
+    if failed:
+        NOTIFICATIONS.labels('failed').inc(failed)
+
+
+def record_push_events(stats: dict):
+    """Учитывает итоги обработки входящих уведомлений (см. PushProcessor.run)"""
+    unchanged = stats['processed'] - stats['updated']
+    for result, count in (('updated', stats['updated']), ('unchanged', unchanged), ('ignored', stats['ignored'])):
+        PUSH_EVENTS.labels(result).inc(count)
+
+
+def record_sweep(stats: dict):
+    """
+    Учитывает итоги прохода проверки и выгружает метрики в текстовый файл
+
+    Args:
+        stats: Статистика TemplateSweep.run
+    """
+    SWEEP_DURATION.observe(stats['wall_time'])
+    unchanged = stats['total'] - stats['updated'] - stats['errors'] - stats['not_modified']
+    for result, count in (('updated', stats['updated']), ('error', stats['errors']),
+                          ('not_modified', stats['not_modified']), ('unchanged', max(unchanged, 0))):
+        SWEEP_TEMPLATES.labels(result).inc(count)
+    SWEEP_THROUGHPUT.set(stats['total'] / stats['wall_time'] if stats['wall_time'] > 0 else 0)
+    SWEEP_DB_QUERIES.set(stats['queries'])
+    DB_QUERIES.inc(stats['queries'])
+    SWEEP_LAST_COMPLETED.set(time.time())
+    write_textfile()
+
+
+def write_textfile():
+    """
+    Записывает метрики процесса в METRICS_TEXTFILE (формат textfile collector)
+
+    Файл заменяется атомарно, поэтому его можно читать во время записи.
+    """
+    path = settings.METRICS_TEXTFILE
+    if not path:
+        return
+    try:
+        write_to_textfile(str(path), registry)
+    except OSError as e:
+        logger.error(f'Ошибка записи метрик в {path}: {e}')
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:15
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed_check_intervals(apps, schema_editor):
+    """
+    Начальный интервал проверки по истории обновлений шаблона
+
+    Интервал, до которого дорос бы шаблон при последовательных проверках без
+    изменений с последнего обновления (формула на момент миграции, не зависит
+    от последующих изменений templates.scheduling).
+    """
+    min_interval = getattr(settings, 'SCHEDULE_MIN_INTERVAL', 60)
+    max_interval = getattr(settings, 'SCHEDULE_MAX_INTERVAL', 6 * 60 * 60)
+    backoff = getattr(settings, 'SCHEDULE_BACKOFF', 1.5)
+
+    Template = apps.get_model('templates', 'Template')
+    now = django.utils.timezone.now()
+    templates = Template.objects.annotate(last_update=Max('updatelog__created_at'))
+    for template in templates.iterator(chunk_size=1000):
+        quiet_since = template.last_update or template.created_at
+        quiet_seconds = (now - quiet_since).total_seconds()
+        template.check_interval = int(min(max(quiet_seconds * (backoff - 1) / backoff, min_interval), max_interval))
+        template.next_check_at = now
+        template.save(update_fields=['check_interval', 'next_check_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('templates', '0002_remove_updatelog_priority'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='template',
+            name='check_interval',
+            field=models.PositiveIntegerField(default=60, verbose_name='Интервал проверки (сек)'),
+        ),
+        migrations.AddField(
+            model_name='template',
+            name='next_check_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Следующая проверка'),
+        ),
+        migrations.AddIndex(
+            model_name='template',
+            index=models.Index(fields=['status', 'next_check_at'], name='template_status_next_check'),
+        ),
+        migrations.RunPython(seed_check_intervals, migrations.RunPython.noop),
+    ]
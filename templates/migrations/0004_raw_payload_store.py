@@ -0,0 +1,84 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:19
+
+import gzip
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def compress_raw_xml(apps, schema_editor):
+    """Переносит raw_xml существующих логов в сжатое хранилище RawPayload"""
+    UpdateLog = apps.get_model('templates', 'UpdateLog')
+    RawPayload = apps.get_model('templates', 'RawPayload')
+
+    logs = UpdateLog.objects.filter(raw_xml__isnull=False).exclude(raw_xml='').only('id', 'raw_xml')
+    batch = []
+    for log in logs.iterator(chunk_size=500):
+        batch.append(log)
+        if len(batch) >= 500:
+            _store_batch(RawPayload, UpdateLog, batch)
+            batch = []
+    if batch:
+        _store_batch(RawPayload, UpdateLog, batch)
+
+
+def _store_batch(RawPayload, UpdateLog, logs):
+    payloads = {}
+    for log in logs:
+        raw = log.raw_xml.encode('utf-8')
+        content_hash = hashlib.sha256(raw).hexdigest()
+        if content_hash not in payloads:
+            payloads[content_hash] = RawPayload(content_hash=content_hash, data=gzip.compress(raw), size=len(raw))
+        log.payload_id = content_hash
+    RawPayload.objects.bulk_create(payloads.values(), ignore_conflicts=True)
+    UpdateLog.objects.bulk_update(logs, ['payload'])
+
+
+def decompress_raw_xml(apps, schema_editor):
+    """Возвращает raw_xml из сжатого хранилища (откат миграции)"""
+    UpdateLog = apps.get_model('templates', 'UpdateLog')
+
+    logs = UpdateLog.objects.filter(payload__isnull=False).select_related('payload')
+    batch = []
+    for log in logs.iterator(chunk_size=500):
+        log.raw_xml = gzip.decompress(bytes(log.payload.data)).decode('utf-8')
+        batch.append(log)
+        if len(batch) >= 500:
+            UpdateLog.objects.bulk_update(batch, ['raw_xml'])
+            batch = []
+    if batch:
+        UpdateLog.objects.bulk_update(batch, ['raw_xml'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('templates', '0003_template_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RawPayload',
+            fields=[
+                ('content_hash', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='SHA-256 содержимого')),
+                ('data', models.BinaryField(verbose_name='Сжатое содержимое (gzip)')),
+                ('size', models.PositiveIntegerField(verbose_name='Исходный размер (байт)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+            ],
+            options={
+                'verbose_name': 'Исходный XML',
+                'verbose_name_plural': 'Исходные XML',
+            },
+        ),
+        migrations.AddField(
+            model_name='updatelog',
+            name='payload',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='templates.rawpayload', verbose_name='Исходный XML'),
+        ),
+        migrations.RunPython(compress_raw_xml, decompress_raw_xml),
+        migrations.RemoveField(
+            model_name='updatelog',
+            name='raw_xml',
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:21
+
+from datetime import timedelta
+
+import django.utils.timezone
+from django.db import migrations, models
+
+# В очередь на отправку ставятся только недавние неотправленные логи: уведомления о
+# давних обновлениях неактуальны, а разом отправленные сводки засорили бы канал
+REQUEUE_WINDOW = timedelta(days=1)
+
+
+def assign_idempotency_keys(apps, schema_editor):
+    """
+    Заполняет ключи существующих логов
+
+    Из повторяющихся записей одного обновления (раньше неотправленные логи
+    создавались заново при каждой проверке) ключ получает только последняя.
+    На повторную отправку ставятся только логи не старше REQUEUE_WINDOW,
+    более старые остаются NOTSENT без времени попытки (в очередь не попадают).
+    """
+    UpdateLog = apps.get_model('templates', 'UpdateLog')
+    now = django.utils.timezone.now()
+    requeue_after = now - REQUEUE_WINDOW
+    seen = set()
+    batch = []
+    logs = UpdateLog.objects.order_by('-created_at', '-id').only(
+        'id', 'template_id', 'old_version', 'new_version', 'message_status', 'created_at'
+    )
+    for log in logs.iterator(chunk_size=1000):
+        key = f"{log.template_id}:{log.old_version}:{log.new_version}"
+        if key in seen:
+            continue
+        seen.add(key)
+        log.idempotency_key = key
+        if log.message_status == 'NOTSENT' and log.created_at >= requeue_after:
+            log.next_attempt_at = now
+        batch.append(log)
+        if len(batch) >= 1000:
+            UpdateLog.objects.bulk_update(batch, ['idempotency_key', 'next_attempt_at'])
+            batch = []
+    if batch:
+        UpdateLog.objects.bulk_update(batch, ['idempotency_key', 'next_attempt_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('templates', '0004_raw_payload_store'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='updatelog',
+            name='delivery_attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Попыток отправки'),
+        ),
+        migrations.AddField(
+            model_name='updatelog',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=128, null=True, unique=True, verbose_name='Ключ идемпотентности'),
+        ),
+        migrations.AddField(
+            model_name='updatelog',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Следующая попытка отправки'),
+        ),
+        migrations.AddIndex(
+            model_name='updatelog',
+            index=models.Index(fields=['message_status', 'next_attempt_at'], name='updatelog_outbox'),
+        ),
+        migrations.RunPython(assign_idempotency_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('templates', '0005_updatelog_outbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='updatelog',
+            index=models.Index(fields=['template', '-created_at'], name='updatelog_template_created'),
+        ),
+        migrations.AddIndex(
+            model_name='updatelog',
+            index=models.Index(fields=['message_status', '-created_at'], name='updatelog_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='updatelog',
+            index=models.Index(fields=['-created_at', '-id'], name='updatelog_created'),
+        ),
+        migrations.AddIndex(
+            model_name='updatelog',
+            index=models.Index(condition=models.Q(('has_validation_changes', True)), fields=['-created_at'], name='updatelog_critical_created'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('templates', '0007_template_code_trigram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PushEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('template_code', models.CharField(max_length=255, verbose_name='Код шаблона')),
+                ('version', models.CharField(max_length=50, verbose_name='Версия')),
+                ('description', models.TextField(blank=True, verbose_name='Описание обновления')),
+                ('status', models.CharField(choices=[('PENDING', 'Ожидает обработки'), ('PROCESSED', 'Обработано'), ('IGNORED', 'Пропущено')], default='PENDING', max_length=10, verbose_name='Статус')),
+                ('result', models.CharField(blank=True, max_length=255, verbose_name='Результат обработки')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='Получено')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Обработано')),
+                ('payload', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='templates.rawpayload', verbose_name='Исходный XML')),
+            ],
+            options={
+                'verbose_name': 'Входящее уведомление',
+                'verbose_name_plural': 'Входящие уведомления',
+                'ordering': ['-received_at'],
+                'indexes': [models.Index(condition=models.Q(('status', 'PENDING')), fields=['id'], name='pushevent_pending'), models.Index(fields=['-received_at'], name='pushevent_received')],
+            },
+        ),
+    ]
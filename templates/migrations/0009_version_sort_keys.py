@@ -0,0 +1,103 @@
+# Generated by Django 5.2.6 on 2026-10-17 21:02
+
+import re
+
+from django.db import migrations, models
+
+# Копия templates.versioning на момент миграции: ключи, заполненные миграцией,
+# не должны зависеть от последующих изменений модуля
+_VERSION_RE = re.compile(r'[0-9a-z._\-\s]+', re.ASCII)
+_TOKEN_RE = re.compile(r'[0-9]+|[a-z]+')
+_PREFIXES = {'v', 'ver', 'version'}
+_PRE_RELEASE = {
+    'dev': 0,
+    'a': 1, 'alpha': 1,
+    'b': 2, 'beta': 2,
+    'c': 3, 'rc': 3, 'pre': 3, 'preview': 3,
+}
+_POST_RELEASE = {'post', 'p', 'patch', 'r', 'rev', 'fix', 'hotfix'}
+SORT_KEY_MAX_LENGTH = 128
+
+
+def _encode_number(number):
+    digits = str(number)
+    return f'{len(digits):02d}{digits}'
+
+
+def version_sort_key(version):
+    """Ключ сортировки версии (см. templates.versioning.version_sort_key)"""
+    version = (version or '').lower()
+    if not _VERSION_RE.fullmatch(version):
+        return ''
+    tokens = _TOKEN_RE.findall(version)
+    if tokens and tokens[0] in _PREFIXES:
+        tokens = tokens[1:]
+
+    release = []
+    while tokens and tokens[0].isdigit():
+        release.append(int(tokens.pop(0)))
+    if not release:
+        return ''
+    while release and release[-1] == 0:
+        release.pop()
+
+    def take_number():
+        return int(tokens.pop(0)) if tokens and tokens[0].isdigit() else 0
+
+    pre = post = None
+    if tokens and tokens[0] in _PRE_RELEASE:
+        pre = (_PRE_RELEASE[tokens.pop(0)], take_number())
+    if tokens and tokens[0] in _POST_RELEASE:
+        tokens.pop(0)
+        post = take_number()
+    if tokens:
+        return ''
+
+    key = ''.join(_encode_number(number) for number in release) + '00'
+    key += f'1{pre[0]}{_encode_number(pre[1])}' if pre is not None else '2'
+    if post is not None:
+        key += f'3{_encode_number(post)}'
+    return key if len(key) <= SORT_KEY_MAX_LENGTH else ''
+
+
+def fill_version_keys(apps, schema_editor):
+    """Ключи сортировки для уже сохраненных версий шаблонов и логов обновлений"""
+    for model_name, version_field, key_field in (
+        ('Template', 'current_version', 'version_key'),
+        ('UpdateLog', 'new_version', 'new_version_key'),
+    ):
+        model = apps.get_model('templates', model_name)
+        batch = []
+        for obj in model.objects.only('pk', version_field).iterator(chunk_size=2000):
+            setattr(obj, key_field, version_sort_key(getattr(obj, version_field)))
+            batch.append(obj)
+            if len(batch) >= 2000:
+                model.objects.bulk_update(batch, [key_field])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, [key_field])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('templates', '0008_push_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='template',
+            name='version_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=128, verbose_name='Ключ сортировки версии'),
+        ),
+        migrations.AddField(
+            model_name='updatelog',
+            name='new_version_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=128, verbose_name='Ключ сортировки новой версии'),
+        ),
+        migrations.RunPython(fill_version_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='updatelog',
+            index=models.Index(fields=['template', '-new_version_key'], name='updatelog_template_version'),
+        ),
+    ]
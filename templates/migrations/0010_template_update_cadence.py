@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-17 21:25
+
+from django.db import migrations, models
+
+# Вес последнего промежутка в скользящем среднем (PollScheduler.CADENCE_WEIGHT на момент миграции)
+CADENCE_WEIGHT = 0.3
+
+
+def fill_update_history(apps, schema_editor):
+    """Время последнего обновления и средний промежуток между обновлениями по логам"""
+    Template = apps.get_model('templates', 'Template')
+    UpdateLog = apps.get_model('templates', 'UpdateLog')
+
+    batch = []
+    template_id = last_update = cadence = None
+
+    def finish():
+        if template_id is not None:
+            batch.append(Template(pk=template_id, last_update_at=last_update,
+                                  update_cadence=int(cadence) if cadence else None))
+        if len(batch) >= 1000:
+            Template.objects.bulk_update(batch, ['last_update_at', 'update_cadence'])
+            batch.clear()
+
+    logs = UpdateLog.objects.order_by('template_id', 'created_at').values_list('template_id', 'created_at')
+    for log_template_id, created_at in logs.iterator(chunk_size=2000):
+        if log_template_id != template_id:
+            finish()
+            template_id, last_update, cadence = log_template_id, created_at, None
+            continue
+        gap = (created_at - last_update).total_seconds()
+        if gap > 0:
+            cadence = gap if cadence is None else CADENCE_WEIGHT * gap + (1 - CADENCE_WEIGHT) * cadence
+        last_update = created_at
+    finish()
+    if batch:
+        Template.objects.bulk_update(batch, ['last_update_at', 'update_cadence'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('templates', '0009_version_sort_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='template',
+            name='last_update_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последнее обнаруженное обновление'),
+        ),
+        migrations.AddField(
+            model_name='template',
+            name='update_cadence',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Типичный промежуток между обновлениями (сек)'),
+        ),
+        migrations.RunPython(fill_update_history, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 21:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('templates', '0010_template_update_cadence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='template',
+            name='leased_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Захвачен проверкой до'),
+        ),
+    ]
@@ -1,6 +1,13 @@
+import gzip
+import hashlib
+
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Cast, Upper
 from django.utils import timezone
 
+from .versioning import SORT_KEY_MAX_LENGTH, is_newer, version_sort_key
+
 
 class Template(models.Model):
     """Модель для хранения информации о шаблонах"""
@@ -18,10 +25,43 @@ class Template(models.Model):
         max_length=50, 
         verbose_name="Текущая версия"
     )
+    # Заполняется при сохранении; при bulk_create/bulk_update/update - вызовом version_sort_key
+    version_key = models.CharField(
+        max_length=SORT_KEY_MAX_LENGTH,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name="Ключ сортировки версии"
+    )
     last_checked = models.DateTimeField(
         default=timezone.now, 
         verbose_name="Последняя проверка"
     )
+    next_check_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Следующая проверка"
+    )
+    check_interval = models.PositiveIntegerField(
+        default=60,
+        verbose_name="Интервал проверки (сек)"
+    )
+    # Шаблон захвачен проверкой до этого времени (см. scheduling.TemplateClaimer)
+    leased_until = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Захвачен проверкой до"
+    )
+    # История обновлений для расписания проверок (см. scheduling.PollScheduler)
+    last_update_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Последнее обнаруженное обновление"
+    )
+    update_cadence = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        verbose_name="Типичный промежуток между обновлениями (сек)"
+    )
     status = models.CharField(
         max_length=10,
         choices=Status.choices,
@@ -41,10 +81,85 @@ class Template(models.Model):
         verbose_name = "Шаблон"
         verbose_name_plural = "Шаблоны"
         ordering = ['template_code']
+        indexes = [
+            models.Index(fields=['status', 'next_check_at'], name='template_status_next_check'),
+            # Поиск по подстроке кода (icontains в админке: UPPER(template_code::text) LIKE UPPER('%...%'))
+            GinIndex(
+                OpClass(Upper(Cast('template_code', models.TextField())), name='gin_trgm_ops'),
+                name='template_code_trgm'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.template_code} (v{self.current_version})"
 
+    def is_newer(self, version: str) -> bool:
+        """Новее ли версия текущей версии шаблона (см. versioning.is_newer)"""
+        return is_newer(version, self.current_version, self.version_key or None)
+
+    def set_version(self, version: str, version_key: str = None):
+        """Задает текущую версию вместе с ключом сортировки"""
+        self.current_version = version
+        self.version_key = version_sort_key(version) if version_key is None else version_key
+
+    def save(self, *args, **kwargs):
+        self.version_key = version_sort_key(self.current_version)
+        super().save(*args, **kwargs)
+
+
+class RawPayload(models.Model):
+    """Сжатый исходный XML ответа API, адресуемый по хэшу содержимого"""
+    
+    content_hash = models.CharField(
+        max_length=64,
+        primary_key=True,
+        verbose_name="SHA-256 содержимого"
+    )
+    data = models.BinaryField(
+        verbose_name="Сжатое содержимое (gzip)"
+    )
+    size = models.PositiveIntegerField(
+        verbose_name="Исходный размер (байт)"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Создано"
+    )
+
+    class Meta:
+        verbose_name = "Исходный XML"
+        verbose_name_plural = "Исходные XML"
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.size} байт)"
+
+    @classmethod
+    def from_text(cls, text: str) -> 'RawPayload':
+        """Создает (не сохраняя) сжатую запись для текста"""
+        raw = text.encode('utf-8')
+        return cls(
+            content_hash=hashlib.sha256(raw).hexdigest(),
+            data=gzip.compress(raw),
+            size=len(raw)
+        )
+
+    @property
+    def text(self) -> str:
+        """Распакованный текст"""
+        return gzip.decompress(bytes(self.data)).decode('utf-8')
+
+
+class UpdateLogQuerySet(models.QuerySet):
+    """Выборки логов обновлений по порядку версий (индекс updatelog_template_version)"""
+
+    def newer_than(self, version: str):
+        """Логи обновлений на версии новее заданной"""
+        return self.filter(new_version_key__gt=version_sort_key(version)).exclude(new_version_key='')
+
+    def latest_versions(self, limit: int):
+        """Последние limit обновлений по номеру версии (для выборки по одному шаблону)"""
+        return self.exclude(new_version_key='').order_by('-new_version_key', '-id')[:limit]
+
 
 class UpdateLog(models.Model):
     """Лог поиска обновлений шаблонов"""
@@ -66,6 +181,13 @@ class UpdateLog(models.Model):
         max_length=50, 
         verbose_name="Новая версия"
     )
+    new_version_key = models.CharField(
+        max_length=SORT_KEY_MAX_LENGTH,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name="Ключ сортировки новой версии"
+    )
     has_validation_changes = models.BooleanField(
         default=False, 
         verbose_name="Изменения в проверках"
@@ -76,20 +198,182 @@ class UpdateLog(models.Model):
         default=MessageStatus.NOTSENT,
         verbose_name="Статус сообщения"
     )
+    idempotency_key = models.CharField(
+        max_length=128,
+        unique=True,
+        blank=True,
+        null=True,
+        verbose_name="Ключ идемпотентности"
+    )
+    delivery_attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name="Попыток отправки"
+    )
+    next_attempt_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Следующая попытка отправки"
+    )
     created_at = models.DateTimeField(
         auto_now_add=True, 
         verbose_name="Создано"
     )
-    raw_xml = models.TextField(
+    payload = models.ForeignKey(
+        RawPayload,
+        on_delete=models.PROTECT,
         blank=True,
         null=True,
         verbose_name="Исходный XML"
     )
 
+    objects = UpdateLogQuerySet.as_manager()
+
+    # Текст XML, заданный при создании записи, или распакованный из payload
+    _raw_xml = None
+
     class Meta:
         verbose_name = "Лог обновления"
         verbose_name_plural = "Логи обновлений"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['message_status', 'next_attempt_at'], name='updatelog_outbox'),
+            # История шаблона, список в админке (сортировка по дате, фильтры по статусу и дате)
+            models.Index(fields=['template', '-created_at'], name='updatelog_template_created'),
+            # Последние версии шаблона и сравнение версий в запросе (UpdateLogQuerySet)
+            models.Index(fields=['template', '-new_version_key'], name='updatelog_template_version'),
+            models.Index(fields=['message_status', '-created_at'], name='updatelog_status_created'),
+            models.Index(fields=['-created_at', '-id'], name='updatelog_created'),
+            models.Index(
+                fields=['-created_at'],
+                condition=models.Q(has_validation_changes=True),
+                name='updatelog_critical_created'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.template.template_code}: {self.old_version} → {self.new_version}"
+
+    @property
+    def raw_xml(self):
+        """Исходный XML ответа (распаковывается при первом обращении)"""
+        if self._raw_xml is None and self.payload_id:
+            self._raw_xml = self.payload.text
+        return self._raw_xml
+
+    @raw_xml.setter
+    def raw_xml(self, value):
+        self._raw_xml = value
+        self.payload = None
+
+    @staticmethod
+    def build_idempotency_key(template_id, previous_update_at, new_version: str) -> str:
+        """
+        Ключ обнаруженного обновления: одно обновление - одна запись и одно уведомление
+
+        Переход между теми же версиями может законно повториться (например, после
+        отката версии в админке), поэтому ключ включает время предыдущего
+        обнаруженного обновления шаблона (Template.last_update_at): при повторной
+        обработке того же ответа оно совпадает, после любого обновления - нет.
+        """
+        since = int(previous_update_at.timestamp() * 1_000_000) if previous_update_at else 0
+        return f"{template_id}:{since}:{new_version}"
+
+    def ensure_idempotency_key(self) -> str:
+        """
+        Заполняет ключ идемпотентности, если он не задан
+
+        Вызывается до того, как шаблон переведен на новую версию (до PollScheduler.record_update).
+        """
+        if not self.idempotency_key:
+            self.idempotency_key = self.build_idempotency_key(
+                self.template_id, self.template.last_update_at, self.new_version
+            )
+        return self.idempotency_key
+
+    def prepare_payload(self):
+        """
+        Готовит сжатую запись для заданного raw_xml и привязывает ее к логу
+        
+        Returns:
+            Несохраненный объект RawPayload или None, если XML не задан или уже привязан
+        """
+        if self.payload_id or not self._raw_xml:
+            return None
+        payload = RawPayload.from_text(self._raw_xml)
+        self.payload_id = payload.content_hash
+        return payload
+
+    def save(self, *args, **kwargs):
+        self.ensure_idempotency_key()
+        if not self.new_version_key:
+            self.new_version_key = version_sort_key(self.new_version)
+        payload = self.prepare_payload()
+        if payload is not None:
+            RawPayload.objects.bulk_create([payload], ignore_conflicts=True)
+        super().save(*args, **kwargs)
+
+
+class PushEvent(models.Model):
+    """Входящее уведомление EIAS о версии шаблона (очередь обработки)"""
+    
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Ожидает обработки'
+        PROCESSED = 'PROCESSED', 'Обработано'
+        IGNORED = 'IGNORED', 'Пропущено'
+    
+    template_code = models.CharField(
+        max_length=255,
+        verbose_name="Код шаблона"
+    )
+    version = models.CharField(
+        max_length=50,
+        verbose_name="Версия"
+    )
+    description = models.TextField(
+        blank=True,
+        verbose_name="Описание обновления"
+    )
+    payload = models.ForeignKey(
+        RawPayload,
+        on_delete=models.PROTECT,
+        blank=True,
+        null=True,
+        verbose_name="Исходный XML"
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name="Статус"
+    )
+    result = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="Результат обработки"
+    )
+    received_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Получено"
+    )
+    processed_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Обработано"
+    )
+
+    class Meta:
+        verbose_name = "Входящее уведомление"
+        verbose_name_plural = "Входящие уведомления"
+        ordering = ['-received_at']
+        indexes = [
+            # Очередь обработки: только необработанные события
+            models.Index(
+                fields=['id'],
+                condition=models.Q(status='PENDING'),
+                name='pushevent_pending'
+            ),
+            models.Index(fields=['-received_at'], name='pushevent_received'),
+        ]
 
     def __str__(self):
-        return f"{self.template.template_code}: {self.old_version} → {self.new_version}"
\ No newline at end of file
+        return f"{self.template_code}: {self.version} ({self.get_status_display()})"
@@ -0,0 +1,206 @@
+import logging
+import queue
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .metrics import record_notifications
+from .models import UpdateLog
+from .profiling import sweep_profiler
+
+logger = logging.getLogger(__name__)
+
+# Служебный элемент очереди: остановка потока после отправки накопленного
+_STOP = object()
+
+
+class NotificationDispatcher:
+    """
+    Фоновая отправка уведомлений об обновлениях в Mattermost
+
+    Проверка шаблонов только ставит сохраненные UpdateLog в очередь, отправка
+    идет в отдельном потоке и не задерживает запросы к EIAS. Обновления,
+    пришедшие подряд (например, новая версия целого семейства FORM.*.2026),
+    собираются в сводные сообщения ограниченного размера, а сообщения
+    отправляются не чаще MATTERMOST_RATE_LIMIT в секунду. После успешной
+    отправки логи помечаются отправленными, при ошибке - получают время
+    следующей попытки (см. Outbox).
+    """
+
+    def __init__(self, mattermost_service, max_items=None, max_chars=None, rate_limit=None, linger=None):
+        self.mattermost_service = mattermost_service
+        self.max_items = settings.MATTERMOST_DIGEST_MAX_ITEMS if max_items is None else max_items
+        self.max_chars = settings.MATTERMOST_DIGEST_MAX_CHARS if max_chars is None else max_chars
+        self.rate_limit = settings.MATTERMOST_RATE_LIMIT if rate_limit is None else rate_limit
+        self.linger = settings.MATTERMOST_DIGEST_LINGER if linger is None else linger
+        self.sent = 0
+        self.failed = 0
+        self.messages = 0
+        self._last_post = 0.0
+
+    def start(self):
+        """Запускает поток отправки"""
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='mattermost-dispatcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, update_logs):
+        """
+        Ставит сохраненные логи обновлений в очередь на отправку
+
+        Args:
+            update_logs: Список сохраненных объектов UpdateLog
+        """
+        for update_log in update_logs:
+            self._queue.put(update_log)
+
+    def close(self, timeout=None):
+        """Отправляет все накопленные уведомления и останавливает поток"""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        pending = []
+        try:
+            while True:
+                try:
+                    # Ждем новые обновления не дольше linger, чтобы собрать их в сводку
+                    item = self._queue.get(timeout=self.linger if pending else None)
+                except queue.Empty:
+                    item = None
+
+                if item is not None and item is not _STOP:
+                    pending.append(item)
+                    if len(pending) < self.max_items:
+                        continue
+
+                # Полные сводки отправляем сразу, остаток - по истечении linger или при остановке
+                flush_all = item is None or item is _STOP
+                while pending and (flush_all or len(pending) >= self.max_items):
+                    digest = self._take_digest(pending)
+                    self._send(digest)
+                    pending = pending[len(digest):]
+
+                if item is _STOP:
+                    return
+        finally:
+            # Поток использует собственное соединение с БД
+            connection.close()
+
+    def _take_digest(self, pending):
+        """Возвращает первые обновления из очереди, помещающиеся в одно сообщение"""
+        digest = []
+        length = 0
+        for update_log in pending[:self.max_items]:
+            length += len(self.mattermost_service.format_digest_line(update_log)) + 1
+            if digest and length > self.max_chars:
+                break
+            digest.append(update_log)
+        return digest
+
+    def _send(self, digest):
+        """Отправляет сводное сообщение с учетом ограничения частоты и отмечает результат в БД"""
+        if self.rate_limit > 0:
+            wait = self._last_post + 1 / self.rate_limit - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        self._last_post = time.monotonic()
+
+        self.messages += 1
+        template_codes = None
+        if sweep_profiler.enabled:
+            template_codes = [update_log.template.template_code for update_log in digest]
+        with sweep_profiler.phase('notify', template_codes):
+            success = self.mattermost_service.send_digest_notification(digest)
+            record_notifications(len(digest) if success else 0, 0 if success else len(digest))
+            try:
+                if success:
+                    Outbox.mark_sent(digest)
+                    self.sent += len(digest)
+                else:
+                    Outbox.mark_failed(digest)
+                    self.failed += len(digest)
+            except Exception as e:
+                logger.error(f'Ошибка сохранения статуса отправки уведомлений: {e}')
+
+
+class Outbox:
+    """
+    Очередь неотправленных уведомлений в таблице UpdateLog
+
+    Лог обновления сохраняется со статусом NOTSENT в той же транзакции, что и
+    новая версия шаблона, и служит записью исходящей очереди. Записи с
+    наступившим next_attempt_at захватываются через SELECT ... FOR UPDATE SKIP
+    LOCKED с арендой, поэтому параллельные процессы не отправляют одно
+    уведомление дважды. После неудачной отправки следующая попытка
+    откладывается экспоненциально: OUTBOX_RETRY_BASE * 2^(попытка - 1), но не
+    дольше OUTBOX_RETRY_MAX.
+    """
+
+    def __init__(self, batch_size=100):
+        self.batch_size = max(1, batch_size)
+
+    @staticmethod
+    def lease_until():
+        """Время окончания аренды записи, взятой в отправку"""
+        return timezone.now() + timedelta(seconds=settings.OUTBOX_LEASE)
+
+    @staticmethod
+    def retry_delay(attempts: int) -> int:
+        """Задержка перед следующей попыткой отправки в секундах"""
+        return min(settings.OUTBOX_RETRY_BASE * 2 ** max(attempts - 1, 0), settings.OUTBOX_RETRY_MAX)
+
+    def claim_due(self):
+        """
+        Захватывает порцию записей, ожидающих отправки
+
+        Returns:
+            Список объектов UpdateLog с загруженными шаблонами
+        """
+        with transaction.atomic():
+            update_logs = list(
+                UpdateLog.objects.select_related('template')
+                .filter(
+                    message_status=UpdateLog.MessageStatus.NOTSENT,
+                    next_attempt_at__lte=timezone.now()
+                )
+                .order_by('next_attempt_at')
+                .select_for_update(skip_locked=True, of=('self',))[:self.batch_size]
+            )
+            if update_logs:
+                UpdateLog.objects.filter(pk__in=[update_log.pk for update_log in update_logs]).update(
+                    next_attempt_at=self.lease_until()
+                )
+        return update_logs
+
+    def claim_all_due(self):
+        """Генератор всех записей, ожидающих отправки, захватываемых порциями"""
+        while True:
+            update_logs = self.claim_due()
+            if not update_logs:
+                return
+            yield update_logs
+
+    @staticmethod
+    def mark_sent(update_logs):
+        """Помечает записи отправленными"""
+        UpdateLog.objects.filter(pk__in=[update_log.pk for update_log in update_logs]).update(
+            message_status=UpdateLog.MessageStatus.SENT,
+            next_attempt_at=None,
+            delivery_attempts=F('delivery_attempts') + 1
+        )
+
+    @classmethod
+    def mark_failed(cls, update_logs):
+        """Назначает записям следующую попытку отправки"""
+        now = timezone.now()
+        for update_log in update_logs:
+            update_log.delivery_attempts += 1
+            update_log.next_attempt_at = now + timedelta(seconds=cls.retry_delay(update_log.delivery_attempts))
+        UpdateLog.objects.bulk_update(update_logs, ['delivery_attempts', 'next_attempt_at'])
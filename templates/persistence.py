@@ -0,0 +1,160 @@
+import logging
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import RawPayload, Template, UpdateLog
+from .profiling import sweep_profiler
+from .scheduling import PollScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """Счетчик SQL запросов к базе данных (работает и при DEBUG=False)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def track(self):
+        """Считает запросы, выполненные внутри блока"""
+        with connection.execute_wrapper(self):
+            yield self
+
+
+class CheckResultWriter:
+    """
+    Пакетная запись результатов проверки шаблонов
+
+    Результаты копятся в памяти и записываются порциями по chunk_size
+    шаблонов в одной транзакции: bulk_create для RawPayload и UpdateLog, bulk_update
+    шаблонов (время и интервал следующей проверки, новая версия). Аренда
+    шаблонов (TemplateClaimer) снимается той же записью.
+    """
+
+    def __init__(self, chunk_size: int = 500, scheduler: PollScheduler = None, on_logs_saved=None):
+        self.chunk_size = max(1, chunk_size)
+        self.scheduler = scheduler or PollScheduler()
+        # Вызывается со списком сохраненных UpdateLog после фиксации транзакции
+        self.on_logs_saved = on_logs_saved
+        self.checked_templates = []
+        self.changed_templates = []
+        self.failed_templates = []
+        self.update_logs = []
+        self.written = 0
+
+    def __len__(self):
+        return len(self.checked_templates) + len(self.changed_templates) + len(self.failed_templates)
+
+    def add_checked(self, template: Template, changed: bool = False):
+        """
+        Отмечает шаблон проверенным без изменения версии
+
+        Args:
+            template: Объект шаблона
+            changed: Обнаружена новая версия, но не сохраняется (режим dry-run)
+        """
+        self.scheduler.schedule(template, timezone.now(), changed=changed)
+        template.leased_until = None
+        self.checked_templates.append(template)
+        self._flush_if_full()
+
+    def add_failed(self, template: Template):
+        """
+        Отмечает шаблон, который не удалось проверить (повторная проверка через минимальный интервал)
+
+        Args:
+            template: Объект шаблона
+        """
+        self.scheduler.schedule_retry(template, timezone.now())
+        template.leased_until = None
+        self.failed_templates.append(template)
+        self._flush_if_full()
+
+    def add_update(self, template: Template, update_log: UpdateLog):
+        """
+        Добавляет найденное обновление шаблона
+
+        Шаблон переводится на новую версию в той же транзакции, в которой
+        сохраняется лог со статусом NOTSENT - запись исходящей очереди
+        уведомлений (см. notifications.Outbox).
+
+        Args:
+            template: Объект шаблона
+            update_log: Запись лога обновления для сохранения
+        """
+        update_log.ensure_idempotency_key()
+        self.update_logs.append(update_log)
+        self.scheduler.schedule(template, timezone.now(), changed=True)
+        template.set_version(update_log.new_version, update_log.new_version_key or None)
+        template.leased_until = None
+        self.changed_templates.append(template)
+        self._flush_if_full()
+
+    def _flush_if_full(self):
+        if len(self) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Записывает накопленные результаты в базу данных одной транзакцией"""
+        if not len(self) and not self.update_logs:
+            return
+
+        schedule_fields = ['last_checked', 'next_check_at', 'check_interval', 'leased_until']
+        created_logs = []
+        template_codes = None
+        if sweep_profiler.enabled:
+            template_codes = [
+                template.template_code
+                for template in self.checked_templates + self.changed_templates + self.failed_templates
+            ]
+        try:
+            with sweep_profiler.phase('db_write', template_codes), transaction.atomic():
+                if self.update_logs:
+                    # Лог одного и того же обновления не создаем повторно (и в пределах порции)
+                    keys = [update_log.idempotency_key for update_log in self.update_logs]
+                    existing = set(
+                        UpdateLog.objects.filter(idempotency_key__in=keys).values_list('idempotency_key', flat=True)
+                    )
+                    for update_log in self.update_logs:
+                        if update_log.idempotency_key not in existing:
+                            existing.add(update_log.idempotency_key)
+                            created_logs.append(update_log)
+                    # Исходный XML сохраняется сжатым, одинаковые ответы - одной записью
+                    payloads = {}
+                    for update_log in created_logs:
+                        payload = update_log.prepare_payload()
+                        if payload is not None:
+                            payloads[payload.content_hash] = payload
+                    if payloads:
+                        RawPayload.objects.bulk_create(payloads.values(), ignore_conflicts=True)
+                    UpdateLog.objects.bulk_create(created_logs)
+                if self.changed_templates:
+                    for template in self.changed_templates:
+                        template.updated_at = template.last_checked
+                    Template.objects.bulk_update(
+                        self.changed_templates,
+                        ['current_version', 'version_key', 'updated_at', 'last_update_at', 'update_cadence']
+                        + schedule_fields
+                    )
+                if self.checked_templates:
+                    Template.objects.bulk_update(self.checked_templates, schedule_fields)
+                if self.failed_templates:
+                    Template.objects.bulk_update(self.failed_templates, ['next_check_at', 'leased_until'])
+            self.written += len(self)
+            if self.on_logs_saved and created_logs:
+                self.on_logs_saved(created_logs)
+        except Exception as e:
+            logger.error(f'Ошибка записи результатов проверки ({len(self)} шаблонов): {e}')
+            raise
+        finally:
+            self.checked_templates = []
+            self.changed_templates = []
+            self.failed_templates = []
+            self.update_logs = []
@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+# Фазы проверки шаблона в порядке выполнения
+PHASES = ('fetch', 'decode', 'parse', 'cache', 'process', 'db_write', 'notify')
+
+_NULL_CONTEXT = nullcontext()
+
+
+class _PhaseTimer:
+    """Замер одной фазы; время вложенных фаз вычитается из времени внешней"""
+
+    __slots__ = ('profiler', 'name', 'templates', 'started', 'children', 'token')
+
+    def __init__(self, profiler, name, templates):
+        self.profiler = profiler
+        self.name = name
+        self.templates = templates
+        self.children = 0.0
+
+    def __enter__(self):
+        stack = self.profiler._stack.get()
+        self.token = self.profiler._stack.set(stack + (self,))
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        self.profiler._stack.reset(self.token)
+        stack = self.profiler._stack.get()
+        if stack:
+            stack[-1].children += elapsed
+        self.profiler.record(self.name, elapsed - self.children, self.templates)
+        return False
+
+
+class SweepProfiler:
+    """
+    Распределение времени проверки по фазам и шаблонам
+
+    Фазы размечаются в коде сервисов и проверки через phase(). Пока профилирование
+    выключено, phase() возвращает пустой контекстный менеджер и почти ничего не
+    стоит. Время фазы считается без вложенных фаз (например, запись пакета в БД
+    внутри обработки шаблона). Время пакетных фаз (запись в БД, отправка сводного
+    уведомления) делится поровну между шаблонами пакета. Стек вложенных фаз
+    хранится в ContextVar: у каждого потока и каждой задачи asyncio он свой,
+    поэтому фазы корутин, чередующихся в одном потоке, не смешиваются.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        # Кортеж открытых фаз; set/reset не меняют стек, видимый другим контекстам
+        self._stack = ContextVar(f'sweep_profiler_stack_{id(self)}', default=())
+        self.reset()
+
+    def reset(self):
+        """Сбрасывает накопленные замеры"""
+        with self._lock:
+            self.phases = defaultdict(lambda: {'total': 0.0, 'count': 0, 'max': 0.0})
+            self.templates = defaultdict(lambda: defaultdict(float))
+
+    def phase(self, name: str, templates=None):
+        """
+        Контекстный менеджер для замера фазы
+
+        Args:
+            name: Имя фазы (см. PHASES)
+            templates: Код шаблона или список кодов шаблонов, к которым относится фаза
+        """
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return _PhaseTimer(self, name, templates)
+
+    def record(self, name: str, elapsed: float, templates=None):
+        """
+        Добавляет замер фазы
+
+        Args:
+            name: Имя фазы
+            elapsed: Длительность в секундах
+            templates: Код шаблона или список кодов шаблонов
+        """
+        if isinstance(templates, str):
+            templates = (templates,)
+        with self._lock:
+            stats = self.phases[name]
+            stats['total'] += elapsed
+            stats['count'] += 1
+            stats['max'] = max(stats['max'], elapsed)
+            if templates:
+                share = elapsed / len(templates)
+                for template_code in templates:
+                    self.templates[template_code][name] += share
+
+    def phase_report(self):
+        """
+        Returns:
+            Список (фаза, {total, count, max, avg}) по убыванию суммарного времени
+        """
+        with self._lock:
+            rows = [
+                (name, dict(stats, avg=stats['total'] / stats['count'] if stats['count'] else 0.0))
+                for name, stats in self.phases.items()
+            ]
+        return sorted(rows, key=lambda row: row[1]['total'], reverse=True)
+
+    def template_report(self, top: int = 20):
+        """
+        Returns:
+            Список (код шаблона, суммарное время, {фаза: время}) для самых долгих шаблонов
+        """
+        with self._lock:
+            rows = [
+                (template_code, sum(phases.values()), dict(phases))
+                for template_code, phases in self.templates.items()
+            ]
+        rows.sort(key=lambda row: row[1], reverse=True)
+        return rows[:top]
+
+
+sweep_profiler = SweepProfiler()
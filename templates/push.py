@@ -0,0 +1,207 @@
+import logging
+from typing import Dict, List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from .metrics import record_push_events
+from .models import PushEvent, RawPayload, Template
+from .notifications import NotificationDispatcher, Outbox
+from .persistence import CheckResultWriter
+from .scheduling import not_leased
+from .xml_parser import parse_update_info, parse_update_info_batch
+
+logger = logging.getLogger(__name__)
+
+
+def parse_push_body(xml_text: str, template_code: Optional[str] = None) -> List[Dict[str, str]]:
+    """
+    Извлекает версии шаблонов из входящего уведомления EIAS
+
+    Уведомление имеет формат ответа GET_UPDATE_INFO: пакетный (элемент
+    TEMPLATE с CODE на каждый шаблон) или ответ по одному шаблону, код
+    которого передается параметром запроса P_TC.
+
+    Args:
+        xml_text: XML текст уведомления
+        template_code: Код шаблона для ответа по одному шаблону
+
+    Returns:
+        Список словарей с ключами CODE, VERSION, DESCRIPTION_UPDATE
+
+    Raises:
+        ET.ParseError: Если XML некорректен
+        ValueError: Если в уведомлении нет версии или кода шаблона
+    """
+    try:
+        records = parse_update_info_batch(xml_text)
+    except ValueError:
+        if not template_code:
+            raise ValueError('Не указан код шаблона: нет элементов TEMPLATE/CODE и параметра P_TC')
+        fields = parse_update_info(xml_text)
+        return [dict(fields, CODE=template_code)]
+    return [dict(fields, CODE=code) for code, fields in records.items()]
+
+
+def enqueue_push(xml_text: str, template_code: Optional[str] = None) -> int:
+    """
+    Разбирает входящее уведомление и ставит события в очередь обработки
+
+    Исходный XML сохраняется сжатым (одинаковые уведомления - одной записью)
+    и затем привязывается к логам обновлений.
+
+    Returns:
+        Количество поставленных в очередь событий
+
+    Raises:
+        ET.ParseError, ValueError: Если уведомление некорректно (см. parse_push_body)
+    """
+    records = parse_push_body(xml_text, template_code)
+    code_length = PushEvent._meta.get_field('template_code').max_length
+    version_length = PushEvent._meta.get_field('version').max_length
+    for record in records:
+        if not record['VERSION'] or len(record['VERSION']) > version_length:
+            raise ValueError(f'Некорректная версия шаблона {record["CODE"]}: "{record["VERSION"]}"')
+        if len(record['CODE']) > code_length:
+            raise ValueError(f'Код шаблона длиннее {code_length} символов')
+
+    payload = RawPayload.from_text(xml_text)
+    with transaction.atomic():
+        RawPayload.objects.bulk_create([payload], ignore_conflicts=True)
+        PushEvent.objects.bulk_create(
+            PushEvent(
+                template_code=record['CODE'],
+                version=record['VERSION'].strip(),
+                description=record['DESCRIPTION_UPDATE'] or '',
+                payload_id=payload.content_hash
+            )
+            for record in records
+        )
+    return len(records)
+
+
+class PushProcessor:
+    """
+    Обработка очереди входящих уведомлений EIAS
+
+    События захватываются порциями через SELECT ... FOR UPDATE SKIP LOCKED,
+    поэтому параллельные процессы (cron и run_monitor) не обрабатывают одно
+    событие дважды. Новая версия записывается так же, как при проверке
+    опросом: CheckResultWriter сохраняет лог NOTSENT вместе с версией
+    шаблона, уведомление отправляет NotificationDispatcher, а при ошибке -
+    очередь Outbox. Порция событий и ее результаты фиксируются одной
+    транзакцией; при повторной обработке после сбоя ключ идемпотентности не
+    дает создать лог повторно. События неизвестных и неактивных шаблонов
+    пропускаются. События шаблонов, захваченных сейчас проверкой опросом
+    (TemplateClaimer), остаются в очереди до следующего запуска, чтобы не
+    перезаписать результаты этой проверки.
+    """
+
+    def __init__(self, eias_service, mattermost_service, batch_size=500, dry_run=False):
+        self.eias_service = eias_service
+        self.mattermost_service = mattermost_service
+        self.batch_size = max(1, batch_size)
+        self.dry_run = dry_run
+
+    def run(self) -> dict:
+        """
+        Обрабатывает все ожидающие события
+
+        Returns:
+            Словарь со статистикой: processed, updated, ignored, deferred
+        """
+        stats = {'processed': 0, 'updated': 0, 'ignored': 0, 'deferred': 0}
+        # Отложенные события (шаблон захвачен проверкой) в этом запуске больше не выбираем
+        deferred = set()
+        dispatcher = None
+        if not self.dry_run:
+            dispatcher = NotificationDispatcher(self.mattermost_service).start()
+        try:
+            while True:
+                created_logs = []
+                with transaction.atomic():
+                    events = list(
+                        PushEvent.objects.filter(status=PushEvent.Status.PENDING)
+                        .exclude(pk__in=deferred)
+                        .order_by('id')
+                        .select_for_update(skip_locked=True)[:self.batch_size]
+                    )
+                    if not events:
+                        break
+                    deferred.update(self._process(events, stats, created_logs.extend))
+                    if self.dry_run:
+                        transaction.set_rollback(True)
+                # Уведомления отправляем только после фиксации транзакции с логами
+                if dispatcher and created_logs:
+                    dispatcher.submit(created_logs)
+                if self.dry_run:
+                    break
+        finally:
+            if dispatcher:
+                dispatcher.close()
+                stats['notifications_sent'] = dispatcher.sent
+                stats['notifications_failed'] = dispatcher.failed
+        if not self.dry_run:
+            # Выгружаются в METRICS_TEXTFILE вместе с метриками следующей проверки (run_monitor)
+            record_push_events(stats)
+        return stats
+
+    def _process(self, events, stats, on_logs_saved):
+        """
+        Применяет порцию событий к шаблонам и отмечает события обработанными
+
+        Returns:
+            Идентификаторы отложенных событий (шаблон захвачен проверкой)
+        """
+        now = timezone.now()
+        codes = {event.template_code for event in events}
+        active = Template.objects.filter(template_code__in=codes, status=Template.Status.ACTIVE)
+        # Блокировка строк не дает проверке захватить шаблон, пока события не записаны
+        templates = {
+            template.template_code: template
+            for template in active.filter(not_leased(now)).select_for_update(skip_locked=True)
+        }
+        busy = set(active.exclude(template_code__in=list(templates)).values_list('template_code', flat=True))
+        writer = CheckResultWriter(len(events) + 1, on_logs_saved=on_logs_saved)
+
+        processed = []
+        deferred = []
+        for event in events:
+            if event.template_code in busy:
+                deferred.append(event.pk)
+                stats['deferred'] += 1
+                continue
+            processed.append(event)
+            event.processed_at = now
+            event.status = PushEvent.Status.PROCESSED
+            template = templates.get(event.template_code)
+            if template is None:
+                event.status = PushEvent.Status.IGNORED
+                event.result = 'Шаблон не отслеживается'
+                stats['ignored'] += 1
+                continue
+            fields = {'VERSION': event.version, 'DESCRIPTION_UPDATE': event.description}
+            try:
+                info = self.eias_service.build_template_info(template, fields, None)
+            except Exception as e:
+                logger.error(f'Ошибка обработки уведомления {event.pk} для {event.template_code}: {e}')
+                event.status = PushEvent.Status.IGNORED
+                event.result = f'Ошибка обработки: {e}'[:255]
+                stats['ignored'] += 1
+                continue
+            stats['processed'] += 1
+            if not info.changed:
+                event.result = 'Версия актуальна' if info.version == template.current_version else 'Версия не новее текущей'
+                writer.add_checked(template)
+                continue
+            # Лог ссылается на уже сохраненный исходный XML уведомления
+            update_log = info.to_update_log()
+            update_log.payload_id = event.payload_id
+            update_log.next_attempt_at = Outbox.lease_until()
+            event.result = f'Обновление {template.current_version} → {info.version}'
+            writer.add_update(template, update_log)
+            stats['updated'] += 1
+
+        writer.flush()
+        PushEvent.objects.bulk_update(processed, ['status', 'result', 'processed_at'])
+        return deferred
@@ -0,0 +1,339 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager, contextmanager
+from urllib.parse import urlparse
+
+import aiohttp
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Запрос отклонен: автоматический выключатель разомкнут"""
+
+
+def is_overload_error(error: Exception) -> bool:
+    """
+    Проверяет, говорит ли ошибка о неработоспособности или перегрузке сервера
+
+    Ошибки соединения, таймауты, ответы 5xx и 429 считаются отказами. Ответы
+    4xx (например, неизвестный код шаблона) означают, что сервер работает.
+    Учитываются ошибки requests (синхронные сервисы) и aiohttp (асинхронные).
+    """
+    if isinstance(error, requests.HTTPError):
+        status = error.response.status_code if error.response is not None else 500
+        return status >= 500 or status == 429
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status >= 500 or error.status == 429
+    return isinstance(error, (requests.RequestException, aiohttp.ClientError, TimeoutError))
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель для запросов к внешнему API
+
+    В замкнутом состоянии учитывает результаты последних window запросов. Если
+    среди них доля отказов или медленных ответов (дольше slow_call секунд)
+    достигает порога, выключатель размыкается и запросы отклоняются сразу, без
+    ожидания таймаута. Через open_time секунд выключатель переходит в
+    полуоткрытое состояние и пропускает half_open_calls пробных запросов:
+    если они успешны - замыкается, иначе снова размыкается.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, window=None, min_calls=None, failure_rate=None, slow_call=None,
+                 slow_rate=None, open_time=None, half_open_calls=None):
+        self.name = name
+        self.window = settings.EIAS_BREAKER_WINDOW if window is None else window
+        self.min_calls = settings.EIAS_BREAKER_MIN_CALLS if min_calls is None else min_calls
+        self.failure_rate = settings.EIAS_BREAKER_FAILURE_RATE if failure_rate is None else failure_rate
+        self.slow_call = settings.EIAS_BREAKER_SLOW_CALL if slow_call is None else slow_call
+        self.slow_rate = settings.EIAS_BREAKER_SLOW_RATE if slow_rate is None else slow_rate
+        self.open_time = settings.EIAS_BREAKER_OPEN_TIME if open_time is None else open_time
+        self.half_open_calls = max(1, settings.EIAS_BREAKER_HALF_OPEN_CALLS if half_open_calls is None
+                                   else half_open_calls)
+        self.state = self.CLOSED
+        # Количество переходов в каждое состояние и отклоненных запросов (метрики)
+        self.transitions = Counter()
+        self.rejected = 0
+        self._results = deque(maxlen=max(1, self.window))
+        self._opened_at = 0.0
+        self._trial_calls = 0
+        self._trial_successes = 0
+        self._lock = threading.Lock()
+
+    def _set_state(self, state):
+        if state == self.state:
+            return
+        logger.warning(f'Выключатель {self.name}: {self.state} → {state}')
+        self.state = state
+        self.transitions[state] += 1
+        self._results.clear()
+        self._trial_calls = 0
+        self._trial_successes = 0
+        if state == self.OPEN:
+            self._opened_at = time.monotonic()
+
+    def _allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.open_time:
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and self._trial_calls < self.half_open_calls:
+                self._trial_calls += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def _record(self, failed: bool, duration: float):
+        slow = duration >= self.slow_call
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                if failed or slow:
+                    self._set_state(self.OPEN)
+                else:
+                    self._trial_successes += 1
+                    if self._trial_successes >= self.half_open_calls:
+                        self._set_state(self.CLOSED)
+                return
+            if self.state != self.CLOSED:
+                return
+            self._results.append((failed, slow))
+            calls = len(self._results)
+            if calls < self.min_calls:
+                return
+            failures = sum(1 for result in self._results if result[0])
+            slow_calls = sum(1 for result in self._results if result[1])
+            if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_rate:
+                self._set_state(self.OPEN)
+
+    @contextmanager
+    def call(self):
+        """
+        Выполняет запрос под контролем выключателя
+
+        Raises:
+            CircuitOpenError: Если выключатель разомкнут
+        """
+        if not self._allow():
+            raise CircuitOpenError(f'Выключатель {self.name} разомкнут')
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self._record(is_overload_error(e), time.monotonic() - started)
+            raise
+        self._record(False, time.monotonic() - started)
+
+    def snapshot(self) -> dict:
+        """Текущее состояние и счетчики выключателя"""
+        with self._lock:
+            return {
+                'state': self.state,
+                'opened': self.transitions[self.OPEN],
+                'rejected': self.rejected,
+            }
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Ограничение одновременных запросов к хосту по алгоритму AIMD
+
+    Пока ответы приходят быстрее target_latency, предел увеличивается примерно
+    на единицу за каждые limit запросов (аддитивный рост). Медленный ответ или
+    отказ сервера уменьшает предел в decrease_factor раз (мультипликативное
+    снижение), но не чаще раза за target_latency, чтобы пачка одновременно
+    завершившихся медленных запросов не обрушила предел до минимума. Запросы,
+    отклоненные выключателем (CircuitOpenError), предел не меняют.
+    """
+
+    # Режим запросов: sync - пул потоков, async - asyncio
+    mode = 'sync'
+
+    def __init__(self, name, max_limit, min_limit=None, target_latency=None, decrease_factor=None):
+        self.name = name
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(settings.EIAS_MIN_CONCURRENCY if min_limit is None else min_limit,
+                                    self.max_limit))
+        self.target_latency = settings.EIAS_TARGET_LATENCY if target_latency is None else target_latency
+        self.decrease_factor = (settings.EIAS_CONCURRENCY_DECREASE if decrease_factor is None
+                                else decrease_factor)
+        self.limit = float(self.max_limit)
+        # Количество снижений предела (метрика)
+        self.decreases = 0
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def _release(self, overloaded: bool, latency: float, adjust: bool = True):
+        with self._condition:
+            self._in_flight -= 1
+            if adjust:
+                self._adjust(overloaded, latency)
+            self._condition.notify_all()
+
+    def _adjust(self, overloaded: bool, latency: float):
+        now = time.monotonic()
+        if overloaded or latency > self.target_latency:
+            if now - self._last_decrease >= self.target_latency:
+                limit = max(self.min_limit, self.limit * self.decrease_factor)
+                if int(limit) < int(self.limit):
+                    logger.warning(
+                        f'Предел одновременных запросов {self.name}: {int(self.limit)} → {int(limit)}'
+                    )
+                self.limit = limit
+                self.decreases += 1
+                self._last_decrease = now
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    @contextmanager
+    def acquire(self):
+        """Ожидает свободного места в пределе и выполняет запрос"""
+        with self._condition:
+            while self._in_flight >= int(self.limit):
+                self._condition.wait()
+            self._in_flight += 1
+        started = time.monotonic()
+        try:
+            yield
+        except CircuitOpenError:
+            # Запрос не дошел до сервера - о его нагрузке ничего не известно
+            self._release(False, 0.0, adjust=False)
+            raise
+        except Exception as e:
+            self._release(is_overload_error(e), time.monotonic() - started)
+            raise
+        self._release(False, time.monotonic() - started)
+
+    def snapshot(self) -> dict:
+        """Текущий предел и счетчики ограничителя"""
+        with self._condition:
+            return {
+                'limit': int(self.limit),
+                'in_flight': self._in_flight,
+                'decreases': self.decreases,
+            }
+
+
+class AsyncAdaptiveConcurrencyLimiter(AdaptiveConcurrencyLimiter):
+    """
+    Вариант AdaptiveConcurrencyLimiter для asyncio
+
+    Предел подстраивается так же (AIMD), но место в пределе ожидается на
+    asyncio.Condition: ожидание на блокировке потока остановило бы цикл
+    событий. Условие привязано к циклу событий и создается заново, когда
+    ограничитель используется в новом цикле (каждая проверка выполняется в
+    своем цикле), предел при этом сохраняется. Отмененный запрос освобождает
+    место, не меняя предел.
+    """
+
+    mode = 'async'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._async_condition = None
+        self._loop = None
+
+    def _get_async_condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._async_condition = asyncio.Condition()
+            self._loop = loop
+        return self._async_condition
+
+    async def _arelease(self, condition, overloaded: bool, latency: float, adjust: bool = True):
+        async with condition:
+            # Состояние под блокировкой потока: snapshot читается из других потоков (метрики)
+            self._release(overloaded, latency, adjust)
+            condition.notify_all()
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Ожидает свободного места в пределе и выполняет запрос"""
+        condition = self._get_async_condition()
+        async with condition:
+            await condition.wait_for(lambda: self._in_flight < int(self.limit))
+            with self._condition:
+                self._in_flight += 1
+        started = time.monotonic()
+        try:
+            yield
+        except CircuitOpenError:
+            await self._arelease(condition, False, 0.0, adjust=False)
+            raise
+        except Exception as e:
+            await self._arelease(condition, is_overload_error(e), time.monotonic() - started)
+            raise
+        except BaseException:
+            # Отмена задачи: о нагрузке сервера ничего не известно
+            await self._arelease(condition, False, 0.0, adjust=False)
+            raise
+        await self._arelease(condition, False, time.monotonic() - started)
+
+
+# Выключатели и ограничители по хостам (общие для всех потоков и экземпляров сервисов).
+# Асинхронные ограничители хранятся отдельно: их предел не делится с пулом потоков
+_breakers = {}
+_limiters = {}
+_async_limiters = {}
+_registry_lock = threading.Lock()
+
+
+def get_circuit_breaker(url: str) -> CircuitBreaker:
+    """Возвращает выключатель, общий для всех запросов к хосту"""
+    host = urlparse(url).netloc
+    with _registry_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker(host)
+        return breaker
+
+
+def get_concurrency_limiter(url: str, max_limit: int) -> AdaptiveConcurrencyLimiter:
+    """Возвращает ограничитель одновременных запросов, общий для всех запросов к хосту"""
+    host = urlparse(url).netloc
+    with _registry_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = _limiters[host] = AdaptiveConcurrencyLimiter(host, max_limit)
+        return limiter
+
+
+def get_async_concurrency_limiter(url: str, max_limit: int) -> AsyncAdaptiveConcurrencyLimiter:
+    """Возвращает асинхронный ограничитель одновременных запросов, общий для всех запросов к хосту"""
+    host = urlparse(url).netloc
+    with _registry_lock:
+        limiter = _async_limiters.get(host)
+        if limiter is None:
+            limiter = _async_limiters[host] = AsyncAdaptiveConcurrencyLimiter(host, max_limit)
+        return limiter
+
+
+def resilience_snapshot() -> dict:
+    """
+    Состояние всех выключателей и ограничителей по хостам
+
+    Для хоста выводится ограничитель того режима, в котором к нему шли
+    запросы (поле mode); если использовались оба - асинхронный.
+    """
+    with _registry_lock:
+        breakers = dict(_breakers)
+        limiters = dict(_limiters)
+        limiters.update(_async_limiters)
+    return {
+        host: {
+            'breaker': breakers[host].snapshot() if host in breakers else None,
+            'limiter': dict(limiters[host].snapshot(), mode=limiters[host].mode) if host in limiters else None,
+        }
+        for host in sorted(set(breakers) | set(limiters))
+    }
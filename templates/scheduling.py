@@ -0,0 +1,165 @@
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Template
+
+
+class PollScheduler:
+    """
+    Адаптивное расписание проверок шаблонов
+
+    Интервал проверки шаблона без изменений растет геометрически
+    (SCHEDULE_BACKOFF) до SCHEDULE_MAX_INTERVAL, после обнаружения новой
+    версии сбрасывается до SCHEDULE_MIN_INTERVAL. Небольшой случайный разброс
+    не дает шаблонам с одинаковой историей проверяться в одну и ту же минуту.
+
+    Рост интервала ограничен и историей обновлений шаблона: при каждой новой
+    версии обновляется скользящее среднее промежутка между обновлениями
+    (update_cadence), и интервал не превышает его долю
+    SCHEDULE_CADENCE_FRACTION. Часто обновляемые шаблоны проверяются чаще,
+    редко обновляемые дорастают до SCHEDULE_MAX_INTERVAL.
+    """
+
+    # Вес последнего промежутка между обновлениями в скользящем среднем
+    CADENCE_WEIGHT = 0.3
+
+    def __init__(self, min_interval=None, max_interval=None, backoff=None, jitter=None, cadence_fraction=None):
+        self.min_interval = settings.SCHEDULE_MIN_INTERVAL if min_interval is None else min_interval
+        self.max_interval = settings.SCHEDULE_MAX_INTERVAL if max_interval is None else max_interval
+        self.backoff = settings.SCHEDULE_BACKOFF if backoff is None else backoff
+        self.jitter = settings.SCHEDULE_JITTER if jitter is None else jitter
+        self.cadence_fraction = (settings.SCHEDULE_CADENCE_FRACTION if cadence_fraction is None
+                                 else cadence_fraction)
+
+    def _clamp(self, interval: float, max_interval=None) -> int:
+        return int(min(max(interval, self.min_interval), self.max_interval if max_interval is None else max_interval))
+
+    def max_interval_for(self, template: Template) -> int:
+        """Наибольший интервал шаблона с учетом типичного промежутка между его обновлениями"""
+        if template.update_cadence and self.cadence_fraction:
+            return self._clamp(template.update_cadence * self.cadence_fraction)
+        return self.max_interval
+
+    def record_update(self, template: Template, now):
+        """
+        Учитывает обнаруженную новую версию в истории обновлений шаблона
+
+        Args:
+            template: Объект шаблона
+            now: Время обнаружения новой версии
+        """
+        if template.last_update_at:
+            gap = (now - template.last_update_at).total_seconds()
+            if gap > 0:
+                cadence = gap if not template.update_cadence else (
+                    self.CADENCE_WEIGHT * gap + (1 - self.CADENCE_WEIGHT) * template.update_cadence
+                )
+                template.update_cadence = int(cadence)
+        template.last_update_at = now
+
+    def schedule(self, template: Template, now, changed: bool):
+        """
+        Выставляет шаблону интервал и время следующей проверки
+
+        Args:
+            template: Объект шаблона
+            now: Время текущей проверки
+            changed: Обнаружена ли новая версия
+        """
+        if changed:
+            self.record_update(template, now)
+            interval = self.min_interval
+        else:
+            interval = self._clamp(
+                (template.check_interval or self.min_interval) * self.backoff, self.max_interval_for(template)
+            )
+        delay = interval * (1 + random.uniform(-self.jitter, self.jitter))
+        template.check_interval = interval
+        template.last_checked = now
+        template.next_check_at = now + timedelta(seconds=max(delay, self.min_interval))
+
+    def schedule_retry(self, template: Template, now):
+        """Назначает повторную проверку после ошибки, не меняя интервал шаблона"""
+        template.next_check_at = now + timedelta(seconds=self.min_interval)
+
+
+def not_leased(now) -> Q:
+    """Условие выборки шаблонов, не захваченных сейчас проверкой"""
+    return Q(leased_until__isnull=True) | Q(leased_until__lte=now)
+
+
+class TemplateClaimer:
+    """
+    Захват шаблонов для проверки без пересечения между процессами
+
+    Шаблоны выбираются порциями через SELECT ... FOR UPDATE SKIP LOCKED и в
+    той же транзакции получают аренду: leased_until на SWEEP_CLAIM_LEASE
+    секунд вперед. Параллельные запуски (наложившийся cron, несколько
+    контейнеров, проверка всех шаблонов без расписания) пропускают
+    заблокированные и уже арендованные шаблоны и делят набор между собой.
+    Аренда снимается при записи результатов (CheckResultWriter); если процесс
+    упал, не записав результаты, шаблоны снова станут доступны по ее истечении.
+    """
+
+    fields = ('id', 'template_code', 'current_version', 'version_key', 'check_interval',
+              'last_update_at', 'update_cadence')
+
+    def __init__(self, batch_size: int = 500, lease=None):
+        self.batch_size = max(1, batch_size)
+        self.lease = settings.SWEEP_CLAIM_LEASE if lease is None else lease
+
+    def claim(self, due_before=None, template_code=None):
+        """
+        Возвращает генератор захваченных шаблонов
+
+        Args:
+            due_before: Захватывать только шаблоны с next_check_at не позднее
+                этого времени; None - все активные шаблоны
+            template_code: Захватить только шаблон с этим кодом
+
+        Yields:
+            Объекты Template с полями из TemplateClaimer.fields
+        """
+        last_pk = 0
+        while True:
+            batch = self.claim_batch(due_before, template_code, after_pk=last_pk)
+            if not batch:
+                return
+            last_pk = max(template.pk for template in batch)
+            yield from batch
+
+    def claim_batch(self, due_before=None, template_code=None, after_pk=0):
+        """
+        Захватывает одну порцию шаблонов
+
+        Args:
+            due_before: См. claim
+            template_code: См. claim
+            after_pk: Без due_before - захватывать шаблоны с первичным ключом больше этого
+
+        Returns:
+            Список объектов Template (пустой, если шаблонов для проверки не осталось)
+        """
+        now = timezone.now()
+        templates = Template.objects.filter(not_leased(now), status=Template.Status.ACTIVE)
+        if template_code:
+            templates = templates.filter(template_code=template_code)
+        if due_before is not None:
+            templates = templates.filter(next_check_at__lte=due_before).order_by('next_check_at')
+        else:
+            templates = templates.filter(pk__gt=after_pk).order_by('pk')
+
+        with transaction.atomic():
+            batch = list(
+                templates.select_for_update(skip_locked=True).only(*self.fields)[:self.batch_size]
+            )
+            if batch:
+                Template.objects.filter(pk__in=[template.pk for template in batch]).update(
+                    leased_until=now + timedelta(seconds=self.lease)
+                )
+        return batch
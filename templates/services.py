@@ -1,32 +1,95 @@
 import requests
 import xml.etree.ElementTree as ET
-from typing import Optional
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 from django.conf import settings
 from django.utils import timezone
 import logging
-import re
+from .cache import CachedResponse, EIASResponseCache
+from .classification import get_classifier
+from .http_client import get_session, request_stats
+from .metrics import record_error
+from .profiling import sweep_profiler
 from .models import UpdateLog, Template
+from .resilience import CircuitOpenError, get_circuit_breaker, get_concurrency_limiter
+from .versioning import version_sort_key
+from .xml_parser import parse_update_info, parse_update_info_batch
 
 logger = logging.getLogger(__name__)
 
+# Адреса API, отклонившие пакетный запрос (общие для всех потоков и экземпляров сервиса)
+_batch_unsupported = set()
+
+
+@dataclass(slots=True)
+class TemplateInfo:
+    """
+    Результат запроса информации о шаблоне к API EIAS
+    
+    Большинство проверок не находит новой версии, поэтому сервис возвращает
+    легкую запись, а объект UpdateLog создается только для нового обновления.
+    """
+    template: Template
+    version: str
+    has_validation_changes: bool
+    # Категории изменений по описанию обновления (см. classification)
+    categories: Tuple[str, ...] = ()
+    # Ответ не изменился с прошлой проверки (XML не разбирался)
+    not_modified: bool = False
+    # XML ответа сохраняется только при новой версии шаблона
+    raw_xml: Optional[str] = None
+    
+    @property
+    def changed(self) -> bool:
+        """Версия в ответе новее текущей версии шаблона (понижение и другая запись той же версии - нет)"""
+        return self.template.is_newer(self.version)
+    
+    def to_update_log(self) -> UpdateLog:
+        """Создает (не сохраняя) лог обновления шаблона на версию из ответа"""
+        return UpdateLog(
+            template=self.template,
+            old_version=self.template.current_version,
+            new_version=self.version,
+            new_version_key=version_sort_key(self.version),
+            has_validation_changes=self.has_validation_changes,
+            raw_xml=self.raw_xml,
+            message_status=UpdateLog.MessageStatus.NOTSENT
+        )
+
 
 class EIASAPIService:
     """Сервис для работы с API EIAS"""
     
     def __init__(self):
         self.base_url = settings.EIAS_API_BASE_URL
-        self.timeout = 30
+        self.timeout = settings.EIAS_TIMEOUT
+        self.session = get_session()
+        # Выключатель и адаптивный предел одновременных запросов общие для всех потоков
+        self.breaker = get_circuit_breaker(self.base_url)
+        self.limiter = self._get_limiter()
+        self.cache = EIASResponseCache() if settings.EIAS_CACHE_ENABLED else None
+        self.batch_size = settings.EIAS_BATCH_SIZE
+    
+    def _get_limiter(self):
+        """Адаптивный ограничитель одновременных запросов к хосту EIAS"""
+        return get_concurrency_limiter(self.base_url, settings.EIAS_MAX_PER_HOST)
     
-    def get_template_info(self, template: Template) -> Optional[UpdateLog]:
+    @property
+    def batch_enabled(self) -> bool:
+        """Включены ли пакетные запросы и не отклонил ли их EIAS"""
+        return self.batch_size > 1 and self.base_url not in _batch_unsupported
+    
+    def get_template_info(self, template: Template, keep_xml: bool = False) -> Optional[TemplateInfo]:
         """
         Получает информацию о шаблоне из API EIAS
         
         Args:
-            template: Объект шаблона
-            version: Версия шаблона для запроса
+            template: Объект шаблона (запрашивается его текущая версия)
+            keep_xml: Сохранить XML ответа, даже если версия не изменилась
             
         Returns:
-            Объект UpdateLog с информацией о шаблоне или None в случае ошибки
+            Объект TemplateInfo или None в случае ошибки. Если ответ не изменился
+            с прошлой проверки, выставлен признак not_modified и XML не разбирается повторно
         """
         params = {
             'P_TC': template.template_code,
@@ -36,73 +99,309 @@ class EIASAPIService:
             'P_EXTENDED_INFO': ''
         }
         
+        code = template.template_code
+        cached = self._get_cached_response(template) if self.cache else None
+        headers = self._conditional_headers(cached)
+        
         try:
-            response = requests.get(
-                self.base_url, 
-                params=params, 
-                timeout=self.timeout,
-                verify=False  # ToDo: отключаем проверку SSL для отладки
-            )
-            response.raise_for_status()
+            # Метод может вызываться из нескольких потоков - ограничиваем нагрузку на хост,
+            # а при недоступности EIAS отклоняем запросы сразу, не дожидаясь таймаута.
+            # Выключатель внутри ограничителя: ожидание в очереди не считается временем ответа
+            with self.limiter.acquire(), self.breaker.call(), request_stats.measure('eias'), \
+                    sweep_profiler.phase('fetch', code):
+                response = self.session.get(
+                    self.base_url, 
+                    params=params, 
+                    headers=headers,
+                    timeout=self.timeout,
+                    verify=False  # ToDo: отключаем проверку SSL для отладки
+                )
+                response.raise_for_status()
+            if cached and response.status_code == 304:
+                return self._not_modified_response(template, cached)
             
-            # Определяем кодировку и декодируем содержимое
             content = response.content
-            xml_text = content.decode(response.encoding or 'utf-8') or None
+            with sweep_profiler.phase('decode', code):
+                content_hash = EIASResponseCache.content_hash(content)
+            if cached and cached.content_hash == content_hash:
+                return self._not_modified_response(template, cached)
             
-            return self._parse_xml_response(xml_text, template)
+            # Определяем кодировку и декодируем содержимое
+            with sweep_profiler.phase('decode', code):
+                xml_text = content.decode(response.encoding or 'utf-8') or None
+            
+            with sweep_profiler.phase('parse', code):
+                info = self._parse_xml_response(xml_text, template, keep_xml)
+            if info and self.cache:
+                self._store_response(template, info, content_hash, response.headers)
+            return info
             
+        except CircuitOpenError:
+            logger.debug(f"Запрос к API EIAS для {template.template_code} отклонен выключателем")
+            record_error('eias', 'circuit_open')
+            return None
+        except requests.Timeout as e:
+            logger.error(f"Таймаут запроса к API EIAS для {template.template_code}: {e}")
+            record_error('eias', 'timeout')
+            return None
         except requests.RequestException as e:
             logger.error(f"Ошибка при запросе к API EIAS для {template.template_code}: {e}")
+            record_error('eias', 'request')
             return None
         except ET.ParseError as e:
             logger.error(f"Ошибка парсинга XML для {template.template_code}: {e}")
+            record_error('eias', 'parse')
             return None
-        except UnicodeDecodeError:
+        except UnicodeDecodeError as e:
             logger.error(f"Ошибка декодирования XML для {template.template_code}: {e}")
+            record_error('eias', 'decode')
             return None
         except Exception as e:
             logger.error(f"Неожиданная ошибка для {template.template_code}: {e}")
+            record_error('eias', 'unexpected')
             return None
     
-    def _parse_xml_response(self, xml_text: str, template: Template) -> Optional[UpdateLog]:
+    def _get_cached_response(self, template: Template) -> Optional[CachedResponse]:
         """
-        Парсит XML ответ от API EIAS и создает объект UpdateLog
+        Возвращает запись кэша для текущей версии шаблона
+        
+        Кэш используем только если в прошлом ответе не было версии новее текущей,
+        иначе обновление еще не обработано и ответ нужно разобрать полностью
+        """
+        with sweep_profiler.phase('cache', template.template_code):
+            cached = self.cache.get(template.template_code, template.current_version)
+        if cached and template.is_newer(cached.version):
+            return None
+        return cached
+    
+    @staticmethod
+    def _conditional_headers(cached: Optional[CachedResponse]) -> dict:
+        """Заголовки условного запроса по записи кэша"""
+        headers = {}
+        if cached:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+        return headers
+    
+    def _store_response(self, template: Template, info: TemplateInfo, content_hash: str, headers):
+        """
+        Сохраняет разобранный ответ в кэш
+        
+        Args:
+            template: Объект шаблона
+            info: Результат разбора ответа
+            content_hash: Хэш содержимого ответа
+            headers: Заголовки ответа (ETag, Last-Modified)
+        """
+        with sweep_profiler.phase('cache', template.template_code):
+            self.cache.set(
+                template.template_code,
+                template.current_version,
+                content_hash,
+                headers.get('ETag'),
+                headers.get('Last-Modified'),
+                info.version,
+                info.has_validation_changes
+            )
+    
+    def _not_modified_response(self, template: Template, cached: CachedResponse) -> TemplateInfo:
+        """
+        Создает результат для ответа, не изменившегося с прошлой проверки
+        
+        Args:
+            template: Объект шаблона
+            cached: Запись кэша с результатами прошлого разбора
+            
+        Returns:
+            Объект TemplateInfo с признаком not_modified
+        """
+        with sweep_profiler.phase('cache', template.template_code):
+            self.cache.touch(template.template_code, template.current_version)
+        return TemplateInfo(
+            template=template,
+            version=cached.version,
+            has_validation_changes=cached.has_validation_changes,
+            not_modified=True
+        )
+    
+    def _parse_xml_response(self, xml_text: str, template: Template,
+                            keep_xml: bool = False) -> Optional[TemplateInfo]:
+        """
+        Парсит XML ответ от API EIAS
         
         Args:
             xml_text: XML текст ответа
             template: Объект шаблона
+            keep_xml: Сохранить XML, даже если версия не изменилась
             
         Returns:
-            Объект UpdateLog или None в случае ошибки
+            Объект TemplateInfo или None в случае ошибки
         """
         try:
-            root = ET.fromstring(xml_text)
-            # Сначала определяем namespace
-            namespace = root.tag.split('}')[0][1:] if '}' in root.tag else ''
-        
-            # Проверяем изменения в проверках
-            description_update = root.find(f'.//{{{namespace}}}DESCRIPTION_UPDATE').text
-            if re.search( r'\bпровер\w*\b', description_update, re.IGNORECASE):
-                has_validation_changes = True
-            
-            # Создаем объект UpdateLog
-            update_log = UpdateLog(
-                template=template,
-                old_version=template.current_version,
-                new_version=root.find(f'.//{{{namespace}}}VERSION').text,
-                has_validation_changes=has_validation_changes,
-                raw_xml=xml_text,
-                message_status=UpdateLog.MessageStatus.NOTSENT
-            )
-            
-            return update_log
+            # Потоковый разбор: нужные поля извлекаются за один проход без построения всего дерева
+            fields = parse_update_info(xml_text)
+        
+            return self.build_template_info(template, fields, xml_text, keep_xml)
             
         except ET.ParseError as e:
             logger.error(f"Ошибка парсинга XML для {template.template_code}: {e}")
+            record_error('eias', 'parse')
             return None
         except Exception as e:
             logger.error(f"Неожиданная ошибка при парсинге XML для {template.template_code}: {e}")
+            record_error('eias', 'parse')
             return None
+    
+    def build_template_info(self, template: Template, fields: dict, xml_text: str,
+                            keep_xml: bool = False) -> TemplateInfo:
+        """
+        Создает результат проверки шаблона по полям ответа
+        
+        Используется для ответов на запросы и для входящих уведомлений EIAS (см. push).
+        
+        Args:
+            template: Объект шаблона
+            fields: Поля ответа (VERSION, DESCRIPTION_UPDATE)
+            xml_text: XML текст ответа
+            keep_xml: Сохранить XML, даже если версия не изменилась
+        """
+        # Категории изменений по описанию; критичные - изменения в проверках
+        classification = get_classifier().classify(fields['DESCRIPTION_UPDATE'])
+        
+        # XML нужен только для лога обновления, при той же версии ссылку на него не держим
+        version = fields['VERSION']
+        return TemplateInfo(
+            template=template,
+            version=version,
+            has_validation_changes=classification.is_critical,
+            categories=classification.categories,
+            raw_xml=xml_text if keep_xml or template.is_newer(version) else None
+        )
+    
+    def get_templates_info(self, templates: List[Template],
+                           keep_xml: bool = False) -> Dict[str, Optional[TemplateInfo]]:
+        """
+        Получает информацию о нескольких шаблонах пакетными запросами
+        
+        Шаблоны запрашиваются пакетами по EIAS_BATCH_SIZE. Шаблоны, которых нет
+        в пакетном ответе, и все шаблоны, если пакетные запросы выключены или
+        EIAS их отклонил, запрашиваются по одному через get_template_info.
+        
+        Args:
+            templates: Список шаблонов
+            keep_xml: Сохранить XML ответа, даже если версия не изменилась
+            
+        Returns:
+            Словарь {код шаблона: TemplateInfo или None в случае ошибки}
+        """
+        results = {}
+        if len(templates) > 1:
+            for offset in range(0, len(templates), max(1, self.batch_size)):
+                if not self.batch_enabled:
+                    break
+                results.update(self._get_batch_info(templates[offset:offset + self.batch_size], keep_xml))
+        for template in templates:
+            if template.template_code not in results:
+                results[template.template_code] = self.get_template_info(template, keep_xml=keep_xml)
+        return results
+    
+    def _get_batch_info(self, templates: List[Template],
+                        keep_xml: bool = False) -> Dict[str, Optional[TemplateInfo]]:
+        """
+        Выполняет один пакетный запрос
+        
+        Пакетный ответ не кэшируется (ETag и хэш относятся ко всему пакету), в лог
+        обновления сохраняется XML всего ответа (хранится один раз, см. RawPayload).
+        
+        Returns:
+            Словарь {код шаблона: TemplateInfo или None}. Шаблонов, которых нет в
+            ответе, в словаре нет. При ошибке запроса все шаблоны пакета - None, а
+            если EIAS не поддерживает пакетные запросы, словарь пуст
+        """
+        codes = [template.template_code for template in templates]
+        separator = settings.EIAS_BATCH_SEPARATOR
+        params = {
+            'P_TC': separator.join(codes),
+            'P_V': separator.join(template.current_version for template in templates),
+            'P_NSRF': '',
+            'P_ENTITY': '',
+            'P_EXTENDED_INFO': ''
+        }
+        
+        try:
+            with self.limiter.acquire(), self.breaker.call(), request_stats.measure('eias_batch'), \
+                    sweep_profiler.phase('fetch', codes):
+                response = self.session.get(
+                    self.base_url,
+                    params=params,
+                    timeout=self.timeout,
+                    verify=False  # ToDo: отключаем проверку SSL для отладки
+                )
+                response.raise_for_status()
+            with sweep_profiler.phase('decode', codes):
+                xml_text = response.content.decode(response.encoding or 'utf-8')
+            with sweep_profiler.phase('parse', codes):
+                records = parse_update_info_batch(xml_text)
+        
+        except CircuitOpenError:
+            logger.debug(f"Пакетный запрос к API EIAS ({len(codes)} шаблонов) отклонен выключателем")
+            record_error('eias', 'circuit_open')
+            return dict.fromkeys(codes)
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else 500
+            if 400 <= status < 500 and status != 429:
+                self._disable_batch(f'HTTP {status}')
+                return {}
+            logger.error(f"Ошибка пакетного запроса к API EIAS ({len(codes)} шаблонов): {e}")
+            record_error('eias', 'request')
+            return dict.fromkeys(codes)
+        except requests.Timeout as e:
+            logger.error(f"Таймаут пакетного запроса к API EIAS ({len(codes)} шаблонов): {e}")
+            record_error('eias', 'timeout')
+            return dict.fromkeys(codes)
+        except requests.RequestException as e:
+            logger.error(f"Ошибка пакетного запроса к API EIAS ({len(codes)} шаблонов): {e}")
+            record_error('eias', 'request')
+            return dict.fromkeys(codes)
+        except ET.ParseError as e:
+            logger.error(f"Ошибка парсинга пакетного XML ({len(codes)} шаблонов): {e}")
+            record_error('eias', 'parse')
+            return dict.fromkeys(codes)
+        except UnicodeDecodeError as e:
+            # Подкласс ValueError: проверяется раньше, чтобы не выключать пакетные запросы
+            logger.error(f"Ошибка декодирования пакетного XML ({len(codes)} шаблонов): {e}")
+            record_error('eias', 'decode')
+            return dict.fromkeys(codes)
+        except ValueError as e:
+            self._disable_batch(str(e))
+            return {}
+        
+        results = {}
+        with sweep_profiler.phase('parse', codes):
+            for template in templates:
+                fields = records.get(template.template_code)
+                if fields is None:
+                    continue
+                try:
+                    results[template.template_code] = self.build_template_info(
+                        template, fields, xml_text, keep_xml
+                    )
+                except Exception as e:
+                    logger.error(f"Неожиданная ошибка при парсинге XML для {template.template_code}: {e}")
+                    record_error('eias', 'parse')
+                    results[template.template_code] = None
+        if not results:
+            # Ответ без запрошенных шаблонов: параметры-списки не поняты сервером
+            self._disable_batch('в ответе нет запрошенных шаблонов')
+        return results
+    
+    def _disable_batch(self, reason: str):
+        """Переходит на запросы по одному шаблону до перезапуска процесса"""
+        if self.base_url not in _batch_unsupported:
+            _batch_unsupported.add(self.base_url)
+            logger.warning(f"EIAS не поддерживает пакетные запросы ({reason}), запросы по одному шаблону")
 
 
 class MattermostService:
@@ -111,6 +410,7 @@ class MattermostService:
     def __init__(self):
         self.webhook_url = settings.MATTERMOST_WEBHOOK_URL
         self.channel = settings.MATTERMOST_CHANNEL
+        self.session = get_session()
     
     def send_template_update_notification(self, update_log: UpdateLog) -> bool:
         """
@@ -126,7 +426,23 @@ class MattermostService:
             logger.warning("Webhook URL для Mattermost не настроен")
             return False
         
-        # Формируем сообщение
+        message = self.format_update_message(update_log)
+        
+        if self._post_message(message):
+            logger.info(f"Уведомление отправлено в Mattermost для {update_log.template.template_code}")
+            return True
+        return False
+    
+    def format_update_message(self, update_log: UpdateLog) -> str:
+        """
+        Формирует сообщение об одном обновлении шаблона
+        
+        Args:
+            update_log: Объект UpdateLog с информацией об обновлении
+            
+        Returns:
+            Текст сообщения в формате Markdown
+        """
         emoji = "🚨" if update_log.has_validation_changes else "📝"
         title = f"{emoji} Обновление шаблона"
         
@@ -139,25 +455,101 @@ class MattermostService:
             message += "🔍 **Изменения в проверках**\n"
         
         message += f"**Время:** {update_log.created_at.strftime('%d.%m.%Y %H:%M:%S')}"
+        return message
+    
+    def format_digest_line(self, update_log: UpdateLog) -> str:
+        """
+        Формирует строку сводного уведомления для одного обновления
+        
+        Args:
+            update_log: Объект UpdateLog с информацией об обновлении
+            
+        Returns:
+            Строка сообщения в формате Markdown
+        """
+        emoji = "🚨" if update_log.has_validation_changes else "📝"
+        line = (
+            f"{emoji} `{update_log.template.template_code}`: "
+            f"`{update_log.old_version}` → `{update_log.new_version}`"
+        )
+        if update_log.has_validation_changes:
+            line += " ⚠️ **изменения в проверках**"
+        return line
+    
+    def format_digest_message(self, update_logs) -> str:
+        """
+        Формирует сводное сообщение о нескольких обновлениях шаблонов
+        
+        Args:
+            update_logs: Список объектов UpdateLog
+            
+        Returns:
+            Текст сообщения в формате Markdown
+        """
+        critical_count = sum(1 for update_log in update_logs if update_log.has_validation_changes)
+        emoji = "🚨" if critical_count else "📝"
+        
+        message = f"**{emoji} Обновления шаблонов: {len(update_logs)}**\n\n"
+        if critical_count:
+            message += f"⚠️ **КРИТИЧНЫХ ОБНОВЛЕНИЙ: {critical_count}**\n\n"
+        message += "\n".join(self.format_digest_line(update_log) for update_log in update_logs)
+        message += f"\n\n**Время:** {update_logs[-1].created_at.strftime('%d.%m.%Y %H:%M:%S')}"
+        return message
+    
+    def send_digest_notification(self, update_logs) -> bool:
+        """
+        Отправляет одно сводное уведомление о нескольких обновлениях шаблонов
+        
+        Args:
+            update_logs: Список объектов UpdateLog
+            
+        Returns:
+            True если уведомление отправлено успешно, False иначе
+        """
+        if len(update_logs) == 1:
+            return self.send_template_update_notification(update_logs[0])
         
-        payload = {
+        if not self.webhook_url:
+            logger.warning("Webhook URL для Mattermost не настроен")
+            return False
+        
+        message = self.format_digest_message(update_logs)
+        
+        if self._post_message(message):
+            logger.info(f"Сводное уведомление отправлено в Mattermost ({len(update_logs)} шаблонов)")
+            return True
+        return False
+    
+    def _message_payload(self, message: str) -> dict:
+        """Тело запроса к webhook Mattermost"""
+        return {
             "text": message,
             "channel": self.channel,
             "username": "p4e_tpl_version_monitoring",
             "icon_emoji": ":robot_face:"
         }
+    
+    def _post_message(self, message: str) -> bool:
+        """
+        Отправляет сообщение в webhook Mattermost
         
+        Args:
+            message: Текст сообщения
+            
+        Returns:
+            True если сообщение отправлено успешно, False иначе
+        """
         try:
-            response = requests.post(
-                self.webhook_url, 
-                json=payload, 
-                timeout=10
-            )
+            with request_stats.measure('mattermost'):
+                response = self.session.post(
+                    self.webhook_url, 
+                    json=self._message_payload(message), 
+                    timeout=10
+                )
             response.raise_for_status()
-            
-            logger.info(f"Уведомление отправлено в Mattermost для {update_log.template.template_code}")
             return True
             
         except requests.RequestException as e:
             logger.error(f"Ошибка отправки уведомления в Mattermost: {e}")
+            record_error('mattermost', 'timeout' if isinstance(e, requests.Timeout) else 'request')
             return False
@@ -0,0 +1,346 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import logging
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .http_client import get_connections_count, request_stats
+from .metrics import record_error, record_sweep
+from .notifications import NotificationDispatcher, Outbox
+from .persistence import CheckResultWriter, QueryCounter
+from .profiling import sweep_profiler
+from .resilience import resilience_snapshot
+from .scheduling import TemplateClaimer
+
+logger = logging.getLogger(__name__)
+
+
+class TemplateSweep:
+    """
+    Проверка обновлений шаблонов (один проход по шаблонам, ожидающим проверки)
+    
+    Используется командой check_template_updates для разового запуска из cron
+    и командой run_monitor, которая выполняет проходы в одном процессе,
+    переиспользуя сервисы, HTTP соединения и соединение с БД.
+    """
+    
+    # Чем выполняются параллельные запросы (для итогов проверки)
+    workers_label = 'Потоков запросов'
+    
+    def __init__(self, eias_service, mattermost_service, stdout, style,
+                 workers=1, batch_size=500, dry_run=False, stop_event=None):
+        self.eias_service = eias_service
+        self.mattermost_service = mattermost_service
+        self.stdout = stdout
+        self.style = style
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.stop_event = stop_event
+
+    def _fetch_templates(self, templates):
+        """
+        Запрашивает информацию о шаблонах из API EIAS
+        
+        При workers > 1 запросы выполняются в пуле потоков, но результаты
+        возвращаются в исходном порядке шаблонов, поэтому запись в БД и отправка
+        уведомлений остаются последовательными и выполняются в основном потоке.
+        При EIAS_BATCH_SIZE > 1 шаблоны запрашиваются пакетами (см.
+        EIASAPIService.get_templates_info), в пул передаются пакеты.
+        
+        Args:
+            templates: Итерируемый набор шаблонов
+            
+        Yields:
+            Кортежи (шаблон, TemplateInfo или None, длительность запроса в секундах)
+        """
+        def fetch(template):
+            started = time.perf_counter()
+            info = self.eias_service.get_template_info(template)
+            return template, info, time.perf_counter() - started
+        
+        def fetch_batch(batch):
+            # Время пакетного запроса делится поровну между шаблонами пакета
+            started = time.perf_counter()
+            results = self.eias_service.get_templates_info(batch)
+            elapsed = (time.perf_counter() - started) / len(batch)
+            return [(template, results.get(template.template_code), elapsed) for template in batch]
+        
+        if self.eias_service.batch_enabled:
+            batches = self._chunks(templates, self.eias_service.batch_size)
+            if self.workers <= 1:
+                for batch in batches:
+                    yield from fetch_batch(batch)
+                return
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='eias') as executor:
+                pending = deque()
+                for batch in batches:
+                    pending.append(executor.submit(fetch_batch, batch))
+                    if len(pending) >= self.workers * 2:
+                        yield from pending.popleft().result()
+                while pending:
+                    yield from pending.popleft().result()
+            return
+        
+        if self.workers <= 1:
+            for template in templates:
+                yield fetch(template)
+            return
+        
+        # Ограничиваем число запросов "в полете", чтобы не загружать все шаблоны сразу
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='eias') as executor:
+            pending = deque()
+            for template in templates:
+                pending.append(executor.submit(fetch, template))
+                if len(pending) >= self.workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    @staticmethod
+    def _chunks(templates, size):
+        """Разбивает поток шаблонов на списки по size штук"""
+        batch = []
+        for template in templates:
+            batch.append(template)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def run(self, template_code=None, ignore_schedule=False):
+        """
+        Проверяет шаблоны и записывает результаты пакетами
+        
+        Args:
+            template_code: Проверить только шаблон с этим кодом
+            ignore_schedule: Проверить все активные шаблоны независимо от расписания
+            
+        Returns:
+            Словарь со статистикой проверки или None, если шаблонов для проверки нет
+        """
+        # Захватываем шаблоны порциями: параллельные запуски делят набор шаблонов,
+        # а не проверяют его повторно; память не зависит от числа шаблонов
+        claimer = TemplateClaimer(self.batch_size)
+        templates = claimer.claim(
+            due_before=self._due_before(template_code, ignore_schedule),
+            template_code=template_code
+        )
+        
+        stats = self._new_stats()
+        # Уведомления отправляются в фоне по мере записи логов в БД
+        dispatcher = None
+        if not self.dry_run:
+            dispatcher = NotificationDispatcher(self.mattermost_service).start()
+            # Повторно отправляем уведомления, не отправленные в прошлых проверках
+            for update_logs in Outbox().claim_all_due():
+                dispatcher.submit(update_logs)
+                stats['outbox_retried'] = stats.get('outbox_retried', 0) + len(update_logs)
+        writer = CheckResultWriter(
+            self.batch_size,
+            on_logs_saved=dispatcher.submit if dispatcher else None
+        )
+        query_counter = QueryCounter()
+        started = time.perf_counter()
+        
+        with query_counter.track():
+            self._process(self._fetch_templates(templates), writer, stats, templates)
+            self._flush(writer, stats)
+        stats['poll_time'] = time.perf_counter() - started
+        
+        if dispatcher:
+            dispatcher.close()
+            self._add_dispatcher_stats(stats, dispatcher)
+        
+        stats['queries'] = query_counter.count
+        return self._finish(stats, started)
+
+    def _due_before(self, template_code, ignore_schedule):
+        """Граница времени проверки для захвата шаблонов (None - все активные шаблоны)"""
+        if template_code or ignore_schedule:
+            return None
+        # Берем шаблоны, чья проверка наступила (с запасом в половину минимального
+        # интервала, чтобы запуск cron раз в минуту не пропускал шаблоны на секунды)
+        return timezone.now() + timedelta(seconds=settings.SCHEDULE_MIN_INTERVAL / 2)
+
+    def _new_stats(self):
+        return {
+            'updated': 0,
+            'errors': 0,
+            'not_modified': 0,
+            'total': 0,
+            'fetch_time': 0.0,
+            'workers': self.workers,
+        }
+
+    @staticmethod
+    def _add_dispatcher_stats(stats, dispatcher):
+        stats['notifications_sent'] = dispatcher.sent
+        stats['notifications_failed'] = dispatcher.failed
+        stats['notification_messages'] = dispatcher.messages
+
+    def _finish(self, stats, started):
+        """Завершает статистику прохода и выгружает метрики"""
+        stats['wall_time'] = time.perf_counter() - started
+        record_sweep(stats)
+        if not stats['total']:
+            self.stdout.write(
+                self.style.WARNING('Не найдено активных шаблонов, ожидающих проверки')
+            )
+            return None
+        return stats
+
+    def _process(self, results, writer, stats, templates=None):
+        """
+        Обрабатывает результаты запросов к API и передает их на запись
+        
+        Args:
+            results: Кортежи (шаблон, TemplateInfo или None, длительность запроса)
+            writer: CheckResultWriter
+            stats: Статистика проверки
+            templates: Генератор захвата шаблонов, закрываемый при остановке
+        """
+        for template, info, elapsed in results:
+            stats['fetch_time'] += elapsed
+            stats['total'] += 1
+            if templates is not None and self.stop_event is not None and self.stop_event.is_set():
+                # Завершение работы: новые шаблоны больше не захватываем, уже
+                # запрошенные обрабатываем, остальные освободятся по истечении аренды
+                templates.close()
+            with sweep_profiler.phase('process', template.template_code):
+                try:
+                    self.stdout.write(f'Проверяем шаблон: {template.template_code}')
+                    
+                    # Информация о шаблоне уже получена из API
+                    if not info:
+                        self.stdout.write(
+                            self.style.ERROR(f'Не удалось получить данные для {template.template_code}')
+                        )
+                        stats['errors'] += 1
+                        writer.add_failed(template)
+                        continue
+                    
+                    # Ответ не изменился с прошлой проверки - пропускаем обработку
+                    if info.not_modified:
+                        self.stdout.write(
+                            f'Ответ не изменился: {template.template_code} ({info.version})'
+                        )
+                        stats['not_modified'] += 1
+                        writer.add_checked(template)
+                        continue
+                    
+                    # Проверяем, вышла ли новая версия
+                    if not info.changed:
+                        if info.version != template.current_version:
+                            # Понижение версии или та же версия в другой записи
+                            self.stdout.write(
+                                self.style.WARNING(
+                                    f'Версия в ответе не новее текущей: {template.template_code} '
+                                    f'({info.version}, текущая {template.current_version})'
+                                )
+                            )
+                        else:
+                            self.stdout.write(
+                                f'Версия актуальна: {template.template_code} ({info.version})'
+                            )
+                        writer.add_checked(template)
+                        continue
+                    
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f'Обнаружено обновление: {template.template_code} '
+                            f'{template.current_version} → {info.version}'
+                        )
+                    )
+                    
+                    if self.dry_run:
+                        self.stdout.write(
+                            self.style.WARNING(f'[DRY RUN] Уведомление НЕ отправлено для {template.template_code}')
+                        )
+                        writer.add_checked(template, changed=True)
+                        stats['updated'] += 1
+                        continue
+                    
+                    # Новая версия и лог NOTSENT сохраняются одной транзакцией, уведомление
+                    # отправится в фоне, а при ошибке будет отправлено повторно из очереди
+                    update_log = info.to_update_log()
+                    update_log.next_attempt_at = Outbox.lease_until()
+                    writer.add_update(template, update_log)
+                    self.stdout.write(f'Уведомление поставлено в очередь для {template.template_code}')
+                    stats['updated'] += 1
+                    
+                except Exception as e:
+                    self.stdout.write(
+                        self.style.ERROR(f'Ошибка при обработке {template.template_code}: {e}')
+                    )
+                    stats['errors'] += 1
+                    record_error('sweep', 'processing')
+                    logger.error(f'Ошибка при обработке шаблона {template.template_code}: {e}')
+
+    def _flush(self, writer, stats):
+        """Записывает оставшиеся результаты проверки"""
+        try:
+            writer.flush()
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'Ошибка записи результатов проверки: {e}')
+            )
+            stats['errors'] += 1
+            record_error('sweep', 'db_write')
+
+    def write_summary(self, stats):
+        """Выводит итоговую статистику проверки"""
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(
+            self.style.SUCCESS(f'Проверка завершена!')
+        )
+        self.stdout.write(f'Обновлено шаблонов: {stats["updated"]}')
+        self.stdout.write(f'Ошибок: {stats["errors"]}')
+        self.stdout.write(f'Ответов без изменений (из кэша): {stats["not_modified"]}')
+        self.stdout.write(f'Всего проверено: {stats["total"]}')
+        self.stdout.write(f'SQL запросов за проверку: {stats["queries"]}')
+        if stats.get('outbox_retried'):
+            self.stdout.write(f'Повторно отправлялось уведомлений из очереди: {stats["outbox_retried"]}')
+        if 'notifications_sent' in stats:
+            self.stdout.write(
+                f'Уведомлений отправлено: {stats["notifications_sent"]} '
+                f'(сообщений: {stats["notification_messages"]}), ошибок: {stats["notifications_failed"]}'
+            )
+        
+        # Сравниваем фактическое время с суммарным временем запросов (время последовательной проверки)
+        wall_time = stats['wall_time']
+        self.stdout.write(f'{self.workers_label}: {stats["workers"]}')
+        self.stdout.write(f'Время проверки: {wall_time:.2f} с (опрос API: {stats["poll_time"]:.2f} с)')
+        self.stdout.write(f'Суммарное время запросов к API (последовательно): {stats["fetch_time"]:.2f} с')
+        if wall_time > 0:
+            self.stdout.write(
+                f'Ускорение относительно последовательной проверки: x{stats["fetch_time"] / wall_time:.1f}'
+            )
+        
+        # Задержки HTTP запросов и количество установленных соединений (handshake)
+        for name, http_stats in request_stats.summary().items():
+            self.stdout.write(
+                f'HTTP {name}: запросов {http_stats["count"]}, '
+                f'среднее {http_stats["avg"] * 1000:.0f} мс, '
+                f'мин {http_stats["min"] * 1000:.0f} мс, '
+                f'макс {http_stats["max"] * 1000:.0f} мс'
+            )
+        self.stdout.write(f'Открыто HTTP соединений: {get_connections_count()}')
+        
+        # Состояние выключателей и адаптивных пределов одновременных запросов
+        for host, state in resilience_snapshot().items():
+            breaker, limiter = state['breaker'], state['limiter']
+            if breaker:
+                self.stdout.write(
+                    f'Выключатель {host}: {breaker["state"]}, размыканий {breaker["opened"]}, '
+                    f'отклонено запросов {breaker["rejected"]}'
+                )
+            if limiter:
+                self.stdout.write(
+                    f'Предел одновременных запросов {host} ({limiter["mode"]}): {limiter["limit"]}, '
+                    f'снижений {limiter["decreases"]}'
+                )
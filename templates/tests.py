@@ -1,3 +1,1187 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import Mock, patch
 
-# Create your tests here.
+import aiohttp
+import requests
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from prometheus_client import CollectorRegistry
+
+from . import services, views
+from .admin import UpdateLogAdmin
+from .async_services import AsyncEIASAPIService
+from .benchmarking import FakeEIASServer, PLAIN_DESCRIPTION, VALIDATION_DESCRIPTION, build_batch_update_info_response
+from .benchmarking import build_update_info_response as build_response
+from .classification import DEFAULT_RULES, Rule, RuleClassifier, Severity, load_rules
+from .management.commands.benchmark_sweep import Command as BenchmarkSweepCommand
+from .management.commands.benchmark_xml_parser import parse_with_tree
+from .management.commands.import_templates import Command as ImportTemplatesCommand
+from .metrics import TemplateStatsCollector
+from .models import PushEvent, RawPayload, Template, UpdateLog
+from .notifications import NotificationDispatcher, Outbox
+from .persistence import CheckResultWriter, QueryCounter
+from .profiling import SweepProfiler
+from .push import PushProcessor
+from .http_client import aclose_async_session
+from .resilience import (
+    AdaptiveConcurrencyLimiter, AsyncAdaptiveConcurrencyLimiter, CircuitBreaker, CircuitOpenError,
+    is_overload_error, resilience_snapshot,
+)
+from .scheduling import PollScheduler, TemplateClaimer
+from .services import EIASAPIService
+from .versioning import is_newer, parse_version, version_sort_key
+from .xml_parser import STREAM_PREFIX_SIZE, parse_update_info, parse_update_info_batch
+
+
+class VersionSortKeyTests(SimpleTestCase):
+    """Порядок версий по ключам сортировки"""
+
+    def assertOrdered(self, *versions):
+        keys = [version_sort_key(version) for version in versions]
+        self.assertTrue(all(keys), f'Не все версии разобраны: {versions}')
+        self.assertEqual(keys, sorted(keys), f'Неверный порядок: {versions}')
+        self.assertEqual(len(set(keys)), len(keys), f'Совпадающие ключи: {versions}')
+
+    def test_numbers_compared_as_numbers(self):
+        self.assertOrdered('1.9', '1.10', '1.100', '2.0', '10.0')
+        self.assertOrdered('1.2', '1.2.1', '1.3')
+        self.assertTrue(is_newer('1.10', '1.9'))
+
+    def test_pre_and_post_releases(self):
+        self.assertOrdered('1.2.dev1', '1.2a1', '1.2b2', '1.2rc1', '1.2rc2', '1.2', '1.2.post1', '1.2.post2', '1.2.1')
+        self.assertTrue(is_newer('1.2', '1.2rc1'))
+        self.assertTrue(is_newer('1.2-post1', '1.2'))
+        self.assertFalse(is_newer('1.2rc1', '1.2'))
+
+    def test_equivalent_spellings(self):
+        for version in ('v1.2.0', '1.2.0', 'ver. 1.2', 'version 1.2', '1-2'):
+            with self.subTest(version=version):
+                self.assertEqual(version_sort_key(version), version_sort_key('1.2'))
+                self.assertFalse(is_newer(version, '1.2'))
+                self.assertFalse(is_newer('1.2', version))
+
+    def test_downgrade_is_not_newer(self):
+        self.assertFalse(is_newer('1.9', '1.10'))
+        self.assertFalse(is_newer('1.0.7', '2.0'))
+
+    def test_unparseable_versions_fall_back_to_inequality(self):
+        for version in ('1.2а', '1.2 (испр.)', 'б/н', '1.2xyz', ''):
+            with self.subTest(version=version):
+                self.assertIsNone(parse_version(version))
+                self.assertEqual(version_sort_key(version), '')
+        # 1.2а с кириллицей - другая версия, а не 1.2
+        self.assertTrue(is_newer('1.2а', '1.2'))
+        self.assertTrue(is_newer('1.2', '1.2 (испр.)'))
+        self.assertFalse(is_newer('1.2а', '1.2а'))
+        self.assertFalse(is_newer(' 1.2а ', '1.2а'))
+
+    def test_stored_key_is_used(self):
+        self.assertTrue(is_newer('1.3', 'что угодно', current_key=version_sort_key('1.2')))
+        self.assertFalse(is_newer('1.2', 'что угодно', current_key=version_sort_key('1.2')))
+
+
+class UpdateLogQuerySetTests(TestCase):
+    """Выборка версий по ключам сортировки в запросе к БД"""
+
+    def setUp(self):
+        self.template = Template.objects.create(template_code='FORM.TEST', current_version='1.0')
+        previous = '1.0'
+        for version in ('1.2rc1', '1.9', '1.10', '1.2', 'б/н'):
+            UpdateLog.objects.create(template=self.template, old_version=previous, new_version=version)
+            previous = version
+
+    def versions(self, queryset):
+        return [log.new_version for log in queryset]
+
+    def test_newer_than(self):
+        self.assertEqual(
+            sorted(self.versions(UpdateLog.objects.newer_than('1.2')), key=version_sort_key),
+            ['1.9', '1.10']
+        )
+        self.assertEqual(self.versions(UpdateLog.objects.newer_than('1.10')), [])
+
+    def test_newer_than_skips_unparseable_versions(self):
+        self.assertEqual(
+            sorted(self.versions(UpdateLog.objects.newer_than('0.1')), key=version_sort_key),
+            ['1.2rc1', '1.2', '1.9', '1.10']
+        )
+
+    def test_latest_versions(self):
+        self.assertEqual(self.versions(UpdateLog.objects.latest_versions(3)), ['1.10', '1.9', '1.2'])
+        self.assertEqual(
+            self.versions(UpdateLog.objects.filter(template=self.template).latest_versions(10)),
+            ['1.10', '1.9', '1.2', '1.2rc1']
+        )
+
+
+class PruneUpdateLogsTests(TestCase):
+    """Удаление старых исходных XML, на которые нет ссылок"""
+
+    def test_orphan_payloads_deleted(self):
+        template = Template.objects.create(template_code='FORM.PRUNE', current_version='1.0')
+        orphan = RawPayload.from_text('<orphan/>')
+        referenced = RawPayload.from_text('<referenced/>')
+        pushed = RawPayload.from_text('<pushed/>')
+        fresh = RawPayload.from_text('<fresh/>')
+        RawPayload.objects.bulk_create([orphan, referenced, pushed, fresh])
+        UpdateLog.objects.create(template=template, old_version='1.0', new_version='1.1', payload=referenced)
+        PushEvent.objects.create(template_code='FORM.PRUNE', version='1.1', payload=pushed)
+        RawPayload.objects.exclude(pk=fresh.pk).update(created_at=timezone.now() - timedelta(days=30))
+
+        call_command('prune_update_logs', days=7, stdout=StringIO())
+
+        self.assertEqual(
+            set(RawPayload.objects.values_list('pk', flat=True)),
+            {referenced.pk, pushed.pk, fresh.pk}
+        )
+
+
+class CheckResultWriterTests(TestCase):
+    """Пакетная запись результатов проверки"""
+
+    def setUp(self):
+        self.templates = [
+            Template.objects.create(template_code=f'FORM.W{number}', current_version='1.0')
+            for number in range(3)
+        ]
+        self.saved = []
+        self.writer = CheckResultWriter(100, on_logs_saved=self.saved.extend)
+
+    def _update_log(self, template, version, raw_xml='<response/>'):
+        return UpdateLog(
+            template=template,
+            old_version=template.current_version,
+            new_version=version,
+            raw_xml=raw_xml,
+            message_status=UpdateLog.MessageStatus.NOTSENT
+        )
+
+    def test_flush_writes_batch_with_constant_queries(self):
+        checked, changed, failed = self.templates
+        checked.leased_until = failed.leased_until = timezone.now() + timedelta(minutes=5)
+        self.writer.add_checked(checked)
+        self.writer.add_update(changed, self._update_log(changed, '1.1'))
+        self.writer.add_failed(failed)
+        before_failed = Template.objects.get(pk=failed.pk)
+
+        with QueryCounter().track() as counter:
+            self.writer.flush()
+
+        # Проверка ключей, RawPayload, UpdateLog и по bulk_update на каждую группу шаблонов
+        self.assertLessEqual(counter.count, 8)
+        self.assertEqual(self.writer.written, 3)
+        self.assertEqual(len(self.writer), 0)
+
+        checked.refresh_from_db()
+        self.assertIsNotNone(checked.last_checked)
+        self.assertGreater(checked.next_check_at, timezone.now())
+        self.assertIsNone(checked.leased_until)
+
+        changed.refresh_from_db()
+        self.assertEqual(changed.current_version, '1.1')
+        self.assertEqual(changed.updated_at, changed.last_checked)
+        self.assertIsNotNone(changed.last_update_at)
+
+        # Неудачная проверка переносится, но не считается выполненной
+        failed.refresh_from_db()
+        self.assertEqual(failed.last_checked, before_failed.last_checked)
+        self.assertGreater(failed.next_check_at, timezone.now())
+        self.assertIsNone(failed.leased_until)
+
+        self.assertEqual([update_log.new_version for update_log in self.saved], ['1.1'])
+
+    def test_repeated_update_is_not_duplicated(self):
+        template = self.templates[0]
+        first = self._update_log(template, '1.1')
+        self.writer.add_update(template, first)
+        self.writer.flush()
+
+        # Повторная обработка того же ответа после сбоя
+        retry = self._update_log(template, '1.1')
+        retry.old_version = '1.0'
+        retry.idempotency_key = first.idempotency_key
+        self.writer.add_update(template, retry)
+        self.writer.flush()
+
+        self.assertEqual(UpdateLog.objects.filter(template=template).count(), 1)
+        self.assertEqual(len(self.saved), 1)
+
+    def test_same_payload_stored_once(self):
+        RawPayload.objects.bulk_create([RawPayload.from_text('<same/>')])
+        for template in self.templates[:2]:
+            self.writer.add_update(template, self._update_log(template, '2.0', raw_xml='<same/>'))
+        self.writer.flush()
+
+        self.assertEqual(RawPayload.objects.count(), 1)
+        self.assertEqual(
+            set(UpdateLog.objects.values_list('payload_id', flat=True)),
+            {RawPayload.from_text('<same/>').content_hash}
+        )
+
+    def test_flush_when_chunk_is_full(self):
+        writer = CheckResultWriter(2)
+        writer.add_checked(self.templates[0])
+        self.assertEqual(writer.written, 0)
+        writer.add_checked(self.templates[1])
+        self.assertEqual(writer.written, 2)
+
+
+class FakeMattermostService:
+    """Mattermost, запоминающий отправленные сводки"""
+
+    def __init__(self, success=True):
+        self.success = success
+        self.digests = []
+
+    def format_digest_line(self, update_log):
+        return f'{update_log.template.template_code}: {update_log.new_version}'
+
+    def send_digest_notification(self, digest):
+        self.digests.append([update_log.new_version for update_log in digest])
+        return self.success
+
+
+@override_settings(OUTBOX_RETRY_BASE=60, OUTBOX_RETRY_MAX=600, OUTBOX_LEASE=300)
+class OutboxTests(TestCase):
+    """Очередь неотправленных уведомлений"""
+
+    def setUp(self):
+        self.template = Template.objects.create(template_code='FORM.OUTBOX', current_version='1.0')
+
+    def _update_log(self, version, **fields):
+        return UpdateLog.objects.create(template=self.template, old_version='1.0', new_version=version, **fields)
+
+    def test_retry_delay_grows_and_is_capped(self):
+        self.assertEqual([Outbox.retry_delay(attempts) for attempts in range(6)], [60, 60, 120, 240, 480, 600])
+        self.assertEqual(Outbox.retry_delay(1000), 600)
+
+    def test_mark_failed_schedules_next_attempt(self):
+        update_log = self._update_log('1.1', next_attempt_at=timezone.now())
+        for attempts in range(1, 8):
+            before = timezone.now()
+            Outbox.mark_failed([update_log])
+            update_log.refresh_from_db()
+            self.assertEqual(update_log.delivery_attempts, attempts)
+            self.assertGreaterEqual(update_log.next_attempt_at, before + timedelta(seconds=Outbox.retry_delay(attempts)))
+        # После исчерпания роста задержки запись остается в очереди с максимальным интервалом
+        self.assertEqual(update_log.message_status, UpdateLog.MessageStatus.NOTSENT)
+        self.assertLessEqual(update_log.next_attempt_at, timezone.now() + timedelta(seconds=600))
+
+    def test_mark_sent(self):
+        update_log = self._update_log('1.1', next_attempt_at=timezone.now())
+        Outbox.mark_sent([update_log])
+        update_log.refresh_from_db()
+        self.assertEqual(update_log.message_status, UpdateLog.MessageStatus.SENT)
+        self.assertIsNone(update_log.next_attempt_at)
+        self.assertEqual(update_log.delivery_attempts, 1)
+
+    def test_claim_due_takes_only_due_logs_and_leases_them(self):
+        now = timezone.now()
+        due = self._update_log('1.1', next_attempt_at=now - timedelta(minutes=1))
+        self._update_log('1.2', next_attempt_at=now + timedelta(minutes=1))
+        self._update_log('1.3', next_attempt_at=now - timedelta(minutes=1), message_status=UpdateLog.MessageStatus.SENT)
+        self._update_log('1.4')
+
+        self.assertEqual([update_log.pk for update_log in Outbox().claim_due()], [due.pk])
+        due.refresh_from_db()
+        self.assertGreater(due.next_attempt_at, now + timedelta(seconds=200))
+        # Взятая в отправку запись не захватывается повторно до окончания аренды
+        self.assertEqual(Outbox().claim_due(), [])
+
+    def test_repeated_transition_gets_new_log(self):
+        writer = CheckResultWriter()
+        update_log = UpdateLog(template=self.template, old_version='1.0', new_version='1.1')
+        writer.add_update(self.template, update_log)
+        writer.flush()
+        # Версия откачена в админке, EIAS снова сообщает о той же новой версии
+        self.template.set_version('1.0')
+        repeated = UpdateLog(template=self.template, old_version='1.0', new_version='1.1')
+        writer.add_update(self.template, repeated)
+        writer.flush()
+
+        self.assertNotEqual(update_log.idempotency_key, repeated.idempotency_key)
+        self.assertEqual(UpdateLog.objects.filter(template=self.template).count(), 2)
+
+    def test_duplicate_key_in_one_batch(self):
+        writer = CheckResultWriter()
+        first = UpdateLog(template=self.template, old_version='1.0', new_version='1.1')
+        writer.add_update(self.template, first)
+        duplicate = UpdateLog(template=self.template, old_version='1.0', new_version='1.1')
+        duplicate.idempotency_key = first.idempotency_key
+        writer.add_update(self.template, duplicate)
+        writer.flush()
+        self.assertEqual(UpdateLog.objects.filter(template=self.template).count(), 1)
+
+
+class NotificationDispatcherTests(SimpleTestCase):
+    """Сводные уведомления в фоновом потоке"""
+
+    def _update_logs(self, count):
+        template = Template(template_code='FORM.DIGEST', current_version='1.0')
+        return [UpdateLog(template=template, old_version='1.0', new_version=f'1.{number}') for number in range(count)]
+
+    def _dispatch(self, mattermost_service, update_logs, **options):
+        options = {'rate_limit': 0, 'linger': 0.01, **options}
+        with patch.object(Outbox, 'mark_sent') as mark_sent, patch.object(Outbox, 'mark_failed') as mark_failed:
+            dispatcher = NotificationDispatcher(mattermost_service, **options).start()
+            dispatcher.submit(update_logs)
+            dispatcher.close(timeout=5)
+        return dispatcher, mark_sent, mark_failed
+
+    def test_digests_limited_by_items(self):
+        mattermost_service = FakeMattermostService()
+        dispatcher, mark_sent, mark_failed = self._dispatch(
+            mattermost_service, self._update_logs(5), max_items=2, max_chars=10000
+        )
+        self.assertEqual(mattermost_service.digests, [['1.0', '1.1'], ['1.2', '1.3'], ['1.4']])
+        self.assertEqual((dispatcher.sent, dispatcher.failed, dispatcher.messages), (5, 0, 3))
+        self.assertEqual(mark_sent.call_count, 3)
+        mark_failed.assert_not_called()
+
+    def test_digests_limited_by_length(self):
+        mattermost_service = FakeMattermostService()
+        # Строка сводки "FORM.DIGEST: 1.N" - 16 символов и перевод строки
+        self._dispatch(mattermost_service, self._update_logs(3), max_items=10, max_chars=40)
+        self.assertEqual(mattermost_service.digests, [['1.0', '1.1'], ['1.2']])
+
+    def test_failed_digest_is_rescheduled(self):
+        mattermost_service = FakeMattermostService(success=False)
+        update_logs = self._update_logs(2)
+        dispatcher, mark_sent, mark_failed = self._dispatch(mattermost_service, update_logs, max_items=10, max_chars=10000)
+        self.assertEqual((dispatcher.sent, dispatcher.failed), (0, 2))
+        mark_sent.assert_not_called()
+        mark_failed.assert_called_once_with(update_logs)
+
+
+@override_settings(METRICS_ALLOWED_IPS=['127.0.0.1', '10.1.0.0/16'], METRICS_TOKEN='secret', METRICS_TEXTFILE='')
+class MetricsViewTests(TestCase):
+    """Выгрузка метрик /metrics"""
+
+    def setUp(self):
+        # Показатели из БД запоминаются в коллекторе, общем для всех запросов
+        collector = TemplateStatsCollector()
+        patcher = patch.object(views, '_db_registry', CollectorRegistry())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        views._db_registry.register(collector)
+
+    def test_access(self):
+        cases = {
+            'локальный адрес': ({}, 200),
+            'разрешенная подсеть': ({'REMOTE_ADDR': '10.1.2.3'}, 200),
+            'чужой адрес': ({'REMOTE_ADDR': '192.0.2.1'}, 403),
+            'чужой адрес с токеном': ({'REMOTE_ADDR': '192.0.2.1', 'HTTP_AUTHORIZATION': 'Bearer secret'}, 200),
+            'неверный токен': ({'REMOTE_ADDR': '192.0.2.1', 'HTTP_AUTHORIZATION': 'Bearer wrong'}, 403),
+        }
+        for name, (extra, status) in cases.items():
+            with self.subTest(case=name):
+                self.assertEqual(self.client.get('/metrics', **extra).status_code, status)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_empty_token_does_not_grant_access(self):
+        response = self.client.get('/metrics', REMOTE_ADDR='192.0.2.1', HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_DB_CACHE_TTL=60)
+    def test_db_values_cached(self):
+        Template.objects.create(template_code='FORM.METRICS', current_version='1.0')
+        with QueryCounter().track() as counter:
+            first = self.client.get('/metrics').content.decode()
+            Template.objects.create(template_code='FORM.METRICS.2', current_version='1.0')
+            second = self.client.get('/metrics').content.decode()
+        self.assertIn('tpl_templates_active 1.0', first)
+        self.assertIn('tpl_templates_active 1.0', second)
+        # Три агрегатных запроса за первую выгрузку и вставка шаблона
+        self.assertEqual(counter.count, 4)
+
+
+class QueryCounterTests(TestCase):
+    """Подсчет SQL запросов"""
+
+    def test_counts_queries_inside_block(self):
+        counter = QueryCounter()
+        with counter.track():
+            Template.objects.count()
+            list(UpdateLog.objects.all())
+        Template.objects.count()
+        self.assertEqual(counter.count, 2)
+
+
+class KeysetChangeListTests(TestCase):
+    """Постраничный вывод логов обновлений по ключу"""
+
+    def setUp(self):
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        template = Template.objects.create(template_code='FORM.ADMIN', current_version='1.0')
+        now = timezone.now()
+        self.logs = []
+        for number in range(5):
+            update_log = UpdateLog.objects.create(template=template, old_version='1.0', new_version=f'1.{number + 1}')
+            # Две записи с одинаковым временем: порядок между ними задает id
+            UpdateLog.objects.filter(pk=update_log.pk).update(created_at=now - timedelta(hours=number // 2 * 2))
+            self.logs.append(update_log)
+        self.url = reverse('admin:templates_updatelog_changelist')
+
+    def _page(self, query=''):
+        response = self.client.get(self.url + query)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl']
+
+    def test_pages_follow_cursor(self):
+        expected = list(UpdateLog.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+        seen = []
+        with patch.object(UpdateLogAdmin, 'list_per_page', 2):
+            changelist = self._page()
+            self.assertIsNone(changelist.first_page_url)
+            while True:
+                self.assertTrue(changelist.keyset)
+                seen.extend(update_log.pk for update_log in changelist.result_list)
+                if not changelist.next_page_url:
+                    break
+                changelist = self._page(changelist.next_page_url)
+                self.assertIsNotNone(changelist.first_page_url)
+        self.assertEqual(seen, expected)
+
+    def test_other_ordering_uses_offset_pages(self):
+        with patch.object(UpdateLogAdmin, 'list_per_page', 2):
+            changelist = self._page('?o=2')
+        self.assertFalse(changelist.keyset)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url + '?cursor=broken')
+        # IncorrectLookupParameters: админка перенаправляет на список без параметров
+        self.assertEqual(response.status_code, 302)
+
+
+class ImportTemplatesTests(TestCase):
+    """Массовое добавление шаблонов"""
+
+    def _import(self, content, suffix='.csv', *args):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, encoding='utf-8', delete=False) as source:
+            source.write(content)
+        self.addCleanup(os.remove, source.name)
+        stdout = StringIO()
+        call_command('import_templates', source.name, *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_csv_import(self):
+        Template.objects.create(template_code='FORM.OLD', current_version='1.0')
+        output = self._import(
+            'template_code,version,status\n'
+            'FORM.NEW,2.1,active\n'
+            'FORM.OLD,3.0,active\n'
+            'FORM.NEW,2.2,active\n'
+            'FORM.BAD,1.0,unknown\n'
+            'FORM.DEFAULT,,inactive\n'
+        )
+        self.assertEqual(
+            dict(Template.objects.values_list('template_code', 'current_version')),
+            {'FORM.OLD': '1.0', 'FORM.NEW': '2.1', 'FORM.DEFAULT': '1.0.0'}
+        )
+        self.assertEqual(Template.objects.get(template_code='FORM.DEFAULT').status, Template.Status.INACTIVE)
+        self.assertEqual(
+            Template.objects.get(template_code='FORM.NEW').version_key,
+            version_sort_key('2.1')
+        )
+        self.assertIn('Добавлено шаблонов: 2', output)
+        self.assertIn('Уже отслеживаются: 1', output)
+        self.assertIn('Повторы во входных данных: 1', output)
+        self.assertIn('Некорректных записей: 1', output)
+
+    def test_jsonl_dry_run(self):
+        output = self._import('{"template_code": "FORM.A"}\n"FORM.B"\nnot json\n', '.jsonl', '--dry-run')
+        self.assertFalse(Template.objects.exists())
+        self.assertIn('[DRY RUN] Будет добавлено шаблонов: 2', output)
+        self.assertIn('Некорректных записей: 1', output)
+
+    def test_codes_added_concurrently_count_as_existing(self):
+        command = ImportTemplatesCommand(stdout=StringIO())
+        command.stats = {'created': 0, 'existing': 0}
+        command.eias_service = None
+        batch = [Template(template_code='FORM.RACE', current_version='1.0'),
+                 Template(template_code='FORM.FREE', current_version='1.0')]
+        # Шаблон добавлен другим процессом после загрузки известных кодов
+        Template.objects.create(template_code='FORM.RACE', current_version='1.0')
+        command._save(batch, dry_run=False)
+        self.assertEqual(command.stats, {'created': 1, 'existing': 1})
+
+
+class PollSchedulerTests(SimpleTestCase):
+    """Интервалы проверки шаблонов"""
+
+    def setUp(self):
+        self.scheduler = PollScheduler(min_interval=60, max_interval=6 * 3600, backoff=2, jitter=0,
+                                       cadence_fraction=0.25)
+        self.now = timezone.now()
+
+    def test_backoff_and_reset(self):
+        template = Template(check_interval=60)
+        self.scheduler.schedule(template, self.now, changed=False)
+        self.assertEqual(template.check_interval, 120)
+        self.assertEqual(template.next_check_at, self.now + timedelta(seconds=120))
+        template.check_interval = 5 * 3600
+        self.scheduler.schedule(template, self.now, changed=False)
+        self.assertEqual(template.check_interval, 6 * 3600)
+        self.scheduler.schedule(template, self.now, changed=True)
+        self.assertEqual(template.check_interval, 60)
+        self.assertEqual(template.last_update_at, self.now)
+
+    def test_update_cadence(self):
+        template = Template(check_interval=60)
+        self.scheduler.schedule(template, self.now, changed=True)
+        self.assertIsNone(template.update_cadence)
+        self.scheduler.schedule(template, self.now + timedelta(hours=4), changed=True)
+        self.assertEqual(template.update_cadence, 4 * 3600)
+        # Скользящее среднее: 0.3 * 14 ч + 0.7 * 4 ч = 7 ч
+        self.scheduler.schedule(template, self.now + timedelta(hours=18), changed=True)
+        self.assertEqual(template.update_cadence, 7 * 3600)
+
+    def test_interval_limited_by_cadence(self):
+        template = Template(check_interval=3600, update_cadence=4 * 3600)
+        self.scheduler.schedule(template, self.now, changed=False)
+        self.assertEqual(template.check_interval, 3600)
+        template = Template(check_interval=3600, update_cadence=60)
+        self.scheduler.schedule(template, self.now, changed=False)
+        self.assertEqual(template.check_interval, 60)
+        self.scheduler.cadence_fraction = 0
+        template = Template(check_interval=3600, update_cadence=4 * 3600)
+        self.scheduler.schedule(template, self.now, changed=False)
+        self.assertEqual(template.check_interval, 7200)
+
+
+class TemplateClaimerTests(TestCase):
+    """Захват шаблонов параллельными проверками"""
+
+    def setUp(self):
+        past = timezone.now() - timedelta(minutes=5)
+        Template.objects.bulk_create(
+            Template(template_code=f'FORM.{i}', current_version='1.0', next_check_at=past) for i in range(10)
+        )
+
+    def codes(self, templates):
+        return {template.template_code for template in templates}
+
+    def test_overlapping_claims_do_not_overlap(self):
+        first = TemplateClaimer(batch_size=4).claim_batch(due_before=timezone.now())
+        # Проверка без расписания (--ignore-schedule) не берет шаблоны, захваченные первой
+        second = list(TemplateClaimer(batch_size=4).claim())
+        third = list(TemplateClaimer(batch_size=4).claim(due_before=timezone.now()))
+        self.assertEqual(len(first), 4)
+        self.assertEqual(len(second), 6)
+        self.assertEqual(third, [])
+        self.assertFalse(self.codes(first) & self.codes(second))
+        self.assertEqual(list(TemplateClaimer().claim(template_code=first[0].template_code)), [])
+
+    def test_lease_released_by_writer_and_expiry(self):
+        claimed = TemplateClaimer(batch_size=2).claim_batch(due_before=timezone.now())
+        writer = CheckResultWriter()
+        writer.add_failed(claimed[0])
+        writer.flush()
+        # Шаблон с ошибкой снова доступен проверке без расписания, второй еще арендован
+        self.assertEqual(self.codes(TemplateClaimer().claim(template_code=claimed[0].template_code)),
+                         {claimed[0].template_code})
+        self.assertEqual(list(TemplateClaimer().claim(template_code=claimed[1].template_code)), [])
+        Template.objects.filter(pk=claimed[1].pk).update(leased_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(list(TemplateClaimer().claim(template_code=claimed[1].template_code))), 1)
+
+    @override_settings(EIAS_CACHE_ENABLED=False)
+    def test_push_deferred_for_leased_template(self):
+        leased, free = TemplateClaimer(batch_size=1).claim_batch(), Template.objects.get(template_code='FORM.9')
+        events = [
+            PushEvent.objects.create(template_code=leased[0].template_code, version='2.0'),
+            PushEvent.objects.create(template_code=free.template_code, version='2.0'),
+        ]
+        stats = {'processed': 0, 'updated': 0, 'ignored': 0, 'deferred': 0}
+        processor = PushProcessor(EIASAPIService(), None)
+        deferred = processor._process(events, stats, lambda logs: None)
+        self.assertEqual(deferred, [events[0].pk])
+        self.assertEqual((stats['updated'], stats['deferred']), (1, 1))
+        self.assertEqual(PushEvent.objects.get(pk=events[0].pk).status, PushEvent.Status.PENDING)
+        self.assertEqual(Template.objects.get(pk=leased[0].pk).current_version, '1.0')
+        self.assertEqual(Template.objects.get(pk=free.pk).current_version, '2.0')
+
+
+class RuleClassifierTests(SimpleTestCase):
+    """Классификация описаний обновлений"""
+
+    # Прежняя проверка изменений в проверках (до классификатора)
+    OLD_VALIDATION_RE = re.compile(r'\bпровер\w*\b', re.IGNORECASE)
+
+    def setUp(self):
+        self.classifier = RuleClassifier(DEFAULT_RULES)
+
+    def test_description_without_matches(self):
+        for text in (PLAIN_DESCRIPTION, '', None, 'Обновлена версия шаблона'):
+            with self.subTest(text=text):
+                result = self.classifier.classify(text)
+                self.assertEqual(result.categories, ())
+                self.assertIsNone(result.severity)
+                self.assertFalse(result.is_critical)
+
+    @override_settings(EIAS_CACHE_ENABLED=False)
+    def test_build_template_info_without_matches(self):
+        template = Template(template_code='FORM.TEST', current_version='1.0')
+        service = EIASAPIService()
+        for description in (PLAIN_DESCRIPTION, None):
+            with self.subTest(description=description):
+                info = service.build_template_info(
+                    template, {'VERSION': '1.1', 'DESCRIPTION_UPDATE': description}, '<RESPONSE/>'
+                )
+                self.assertFalse(info.has_validation_changes)
+                self.assertEqual(info.categories, ())
+        info = service.build_template_info(
+            template, {'VERSION': '1.1', 'DESCRIPTION_UPDATE': VALIDATION_DESCRIPTION}, '<RESPONSE/>'
+        )
+        self.assertTrue(info.has_validation_changes)
+
+    def test_parity_with_old_validation_regex(self):
+        texts = (
+            'ПРОВЕРКА', 'Проверочные соотношения', 'изменены проверки', 'провер', 'перепроверка',
+            'непроверенные данные', '(проверки)', 'лист-проверка', '_проверка', '1проверка',
+            'проверка_1', 'Исправлена ошибка', PLAIN_DESCRIPTION, VALIDATION_DESCRIPTION,
+        )
+        for text in texts:
+            with self.subTest(text=text):
+                self.assertEqual(
+                    self.classifier.classify(text).is_critical, bool(self.OLD_VALIDATION_RE.search(text))
+                )
+
+    def test_categories_and_highest_severity(self):
+        result = self.classifier.classify('Исправлены опечатки, добавлены столбцы и проверки')
+        self.assertEqual(set(result.categories), {'fix', 'structure', 'validation'})
+        self.assertEqual(result.severity, Severity.CRITICAL)
+        result = self.classifier.classify('Исправлена ошибка в справочнике')
+        self.assertEqual(set(result.categories), {'fix', 'reference'})
+        self.assertEqual(result.severity, Severity.MINOR)
+
+    def test_keyword_in_several_rules(self):
+        # Правила в порядке возрастания важности: засчитывается более важное
+        classifier = RuleClassifier([
+            Rule('minor', Severity.MINOR, keywords=('лист',)),
+            Rule('critical', Severity.CRITICAL, keywords=('лист', 'форм')),
+        ])
+        result = classifier.classify('Изменены листы')
+        self.assertEqual(result.categories, ('critical',))
+        self.assertEqual(result.severity, Severity.CRITICAL)
+
+    def test_pattern_rules(self):
+        classifier = RuleClassifier([Rule('year', Severity.MAJOR, pattern=r'\b20\d\d\s+год')])
+        self.assertEqual(classifier.classify('Отчет за 2026 ГОД').categories, ('year',))
+        self.assertEqual(classifier.classify('Отчет за год').categories, ())
+
+
+class LoadRulesTests(SimpleTestCase):
+    """Загрузка правил классификации из JSON файла"""
+
+    def load(self, items):
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.json', delete=False) as file:
+            json.dump(items, file, ensure_ascii=False)
+        self.addCleanup(os.remove, file.name)
+        return load_rules(file.name)
+
+    def test_valid_rules(self):
+        rules = self.load([
+            {'category': 'validation', 'severity': 'critical', 'keywords': ['провер']},
+            {'category': 'year', 'severity': 'minor', 'pattern': r'20\d\d'},
+        ])
+        self.assertEqual(rules, [
+            Rule('validation', Severity.CRITICAL, keywords=('провер',)),
+            Rule('year', Severity.MINOR, pattern=r'20\d\d'),
+        ])
+
+    def test_unknown_severity(self):
+        with self.assertRaisesMessage(ValueError, 'неизвестная важность'):
+            self.load([{'category': 'validation', 'severity': 'high', 'keywords': ['провер']}])
+
+    def test_invalid_pattern(self):
+        with self.assertRaisesMessage(ValueError, 'некорректное выражение'):
+            self.load([{'category': 'broken', 'severity': 'minor', 'pattern': '(провер'}])
+
+    def test_invalid_file(self):
+        with self.assertRaises(ValueError):
+            self.load({'category': 'validation', 'severity': 'critical'})
+        with self.assertRaises(ValueError):
+            load_rules(os.path.join(tempfile.gettempdir(), 'no-such-rules.json'))
+
+
+class FakeClock:
+    """Подменяет time.monotonic: время идет только при вызове advance"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class ResilienceTests(SimpleTestCase):
+    """Автоматический выключатель и адаптивный предел одновременных запросов"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = patch('templates.resilience.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _breaker(self, **options):
+        options = {'window': 4, 'min_calls': 4, 'failure_rate': 0.5, 'slow_call': 2.0, 'slow_rate': 0.5,
+                   'open_time': 30, 'half_open_calls': 2, **options}
+        return CircuitBreaker('eias.test', **options)
+
+    def _call(self, breaker, error=None, duration=0.1):
+        with breaker.call():
+            self.clock.advance(duration)
+            if error:
+                raise error
+
+    def _fail(self, breaker):
+        with self.assertRaises(requests.ConnectionError):
+            self._call(breaker, requests.ConnectionError())
+
+    def test_breaker_opens_half_opens_and_closes(self):
+        breaker = self._breaker()
+        self._call(breaker)
+        self._call(breaker)
+        self._fail(breaker)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self._fail(breaker)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        with self.assertRaises(CircuitOpenError):
+            self._call(breaker)
+        self.assertEqual(breaker.rejected, 1)
+
+        self.clock.advance(31)
+        self._call(breaker)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self._call(breaker)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(breaker.snapshot(), {'state': 'closed', 'opened': 1, 'rejected': 1})
+
+    def test_failed_trial_reopens_breaker(self):
+        breaker = self._breaker(min_calls=1)
+        self._fail(breaker)
+        self.clock.advance(31)
+        self._fail(breaker)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(breaker.transitions[CircuitBreaker.OPEN], 2)
+
+    def test_half_open_limits_trial_calls(self):
+        breaker = self._breaker(min_calls=1, half_open_calls=1)
+        self._fail(breaker)
+        self.clock.advance(31)
+        with breaker.call():
+            # Пока пробный запрос не завершен, остальные отклоняются
+            with self.assertRaises(CircuitOpenError):
+                self._call(breaker)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_slow_calls_open_breaker(self):
+        breaker = self._breaker()
+        self._call(breaker)
+        self._call(breaker)
+        self._call(breaker, duration=2.5)
+        self._call(breaker, duration=3.0)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_client_errors_do_not_open_breaker(self):
+        breaker = self._breaker(min_calls=1)
+        error = requests.HTTPError(response=self._response(404))
+        for _ in range(4):
+            with self.assertRaises(requests.HTTPError):
+                self._call(breaker, error)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def _response(self, status_code):
+        response = requests.Response()
+        response.status_code = status_code
+        return response
+
+    def test_is_overload_error(self):
+        cases = {
+            404: False,
+            400: False,
+            429: True,
+            500: True,
+            503: True,
+        }
+        for status_code, expected in cases.items():
+            with self.subTest(status=status_code):
+                error = requests.HTTPError(response=self._response(status_code))
+                self.assertIs(is_overload_error(error), expected)
+        self.assertTrue(is_overload_error(requests.Timeout()))
+        self.assertTrue(is_overload_error(TimeoutError()))
+        self.assertFalse(is_overload_error(ValueError()))
+
+    def _limiter(self, **options):
+        options = {'min_limit': 2, 'target_latency': 1.0, 'decrease_factor': 0.5, **options}
+        return AdaptiveConcurrencyLimiter('eias.test', 8, **options)
+
+    def _request(self, limiter, latency=0.1, error=None):
+        try:
+            with limiter.acquire():
+                self.clock.advance(latency)
+                if error:
+                    raise error
+        except type(error) if error else ():
+            pass
+
+    def test_limiter_decreases_once_per_target_latency(self):
+        limiter = self._limiter()
+        self._request(limiter, latency=1.5)
+        self.assertEqual(limiter.snapshot()['limit'], 4)
+        # Следующий медленный ответ завершился раньше, чем прошло target_latency
+        self._request(limiter, latency=0.5, error=requests.ConnectionError())
+        self.assertEqual(limiter.snapshot()['limit'], 4)
+        self._request(limiter, latency=1.5)
+        self.assertEqual(limiter.snapshot(), {'limit': 2, 'in_flight': 0, 'decreases': 2})
+        # Не ниже min_limit
+        self.clock.advance(5)
+        self._request(limiter, latency=1.5)
+        self.assertEqual(limiter.snapshot()['limit'], 2)
+
+    def test_limiter_increases_additively(self):
+        limiter = self._limiter()
+        self._request(limiter, latency=1.5)
+        self.assertEqual(limiter.snapshot()['limit'], 4)
+        # Примерно +1 за каждые limit быстрых ответов
+        for _ in range(4):
+            self._request(limiter)
+        self.assertEqual(limiter.snapshot()['limit'], 4)
+        self._request(limiter)
+        self.assertEqual(limiter.snapshot()['limit'], 5)
+        for _ in range(100):
+            self._request(limiter)
+        self.assertEqual(limiter.snapshot()['limit'], 8)
+
+    def test_rejected_calls_do_not_change_limit(self):
+        limiter = self._limiter()
+        breaker = self._breaker(min_calls=1)
+        self._fail(breaker)
+        limit = limiter.limit
+        for _ in range(5):
+            with self.assertRaises(CircuitOpenError):
+                with limiter.acquire(), breaker.call():
+                    pass
+        self.assertEqual(limiter.limit, limit)
+        self.assertEqual(limiter.snapshot()['in_flight'], 0)
+
+    @override_settings(EIAS_CACHE_ENABLED=False)
+    def test_limiter_queue_time_is_not_call_time(self):
+        clock = self.clock
+
+        class QueuedLimiter(AdaptiveConcurrencyLimiter):
+            @contextmanager
+            def acquire(self):
+                # Ожидание свободного места дольше порога медленного ответа
+                clock.advance(5)
+                with super().acquire():
+                    yield
+
+        response = requests.Response()
+        response.status_code = 200
+        response.encoding = 'utf-8'
+        response._content = build_response(1).encode('utf-8')
+        service = EIASAPIService()
+        service.session = Mock(get=Mock(return_value=response))
+        service.breaker = self._breaker(min_calls=1)
+        service.limiter = QueuedLimiter('eias.test', 8)
+
+        self.assertIsNotNone(service.get_template_info(Template(template_code='FORM.1', current_version='1.0')))
+        self.assertEqual(service.breaker.state, CircuitBreaker.CLOSED)
+
+
+class AsyncConcurrencyLimiterTests(SimpleTestCase):
+    """Адаптивный предел одновременных запросов в цикле событий"""
+
+    def test_concurrency_bounded_by_limit(self):
+        limiter = AsyncAdaptiveConcurrencyLimiter('eias.test', 2, min_limit=1)
+        running = []
+        peak = 0
+
+        async def request():
+            nonlocal peak
+            async with limiter.acquire():
+                running.append(1)
+                peak = max(peak, len(running))
+                await asyncio.sleep(0.01)
+                running.pop()
+
+        async def sweep():
+            await asyncio.gather(*(request() for _ in range(6)))
+
+        # Каждая проверка выполняется в новом цикле событий
+        asyncio.run(sweep())
+        asyncio.run(sweep())
+        self.assertEqual(peak, 2)
+        self.assertEqual(limiter.snapshot(), {'limit': 2, 'in_flight': 0, 'decreases': 0})
+
+    def test_overload_decreases_and_cancellation_keeps_limit(self):
+        limiter = AsyncAdaptiveConcurrencyLimiter('eias.test', 8, min_limit=1, decrease_factor=0.5)
+
+        async def fail():
+            async with limiter.acquire():
+                raise aiohttp.ServerDisconnectedError()
+
+        async def cancel():
+            async def hang():
+                async with limiter.acquire():
+                    await asyncio.sleep(10)
+            task = asyncio.create_task(hang())
+            await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        with self.assertRaises(aiohttp.ServerDisconnectedError):
+            asyncio.run(fail())
+        self.assertEqual(limiter.snapshot()['limit'], 4)
+
+        asyncio.run(cancel())
+        self.assertEqual(limiter.snapshot()['limit'], 4)
+        self.assertEqual(limiter.snapshot()['in_flight'], 0)
+
+
+class AsyncEIASAPIServiceTests(SimpleTestCase):
+    """Асинхронный клиент API EIAS"""
+
+    def setUp(self):
+        server = FakeEIASServer(latency=0, change_rate=0)
+        self.server = server.__enter__()
+        self.addCleanup(server.__exit__, None, None, None)
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        settings_override = override_settings(
+            EIAS_API_BASE_URL=f'{server.url}/GET_UPDATE_INFO',
+            EIAS_CACHE_ENABLED=True,
+            EIAS_CACHE_PATH=os.path.join(cache_dir.name, 'eias.sqlite3'),
+            EIAS_BATCH_SIZE=0
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _fetch(self, service, template):
+        async def fetch():
+            try:
+                return await service.aget_template_info(template)
+            finally:
+                await aclose_async_session()
+        return asyncio.run(fetch())
+
+    def test_unchanged_response_served_from_cache(self):
+        service = AsyncEIASAPIService(4)
+        self.addCleanup(service.cache.close)
+        template = Template(template_code='FORM.1', current_version='1.0')
+
+        first = self._fetch(service, template)
+        second = self._fetch(service, template)
+
+        self.assertEqual(first.version, '1.0')
+        self.assertFalse(first.not_modified)
+        self.assertTrue(second.not_modified)
+        self.assertEqual(second.version, '1.0')
+        self.assertEqual(self.server.requests, 2)
+
+    def test_uses_async_limiter(self):
+        service = AsyncEIASAPIService(4)
+        self.addCleanup(service.cache.close)
+        self.assertIsInstance(service.limiter, AsyncAdaptiveConcurrencyLimiter)
+        self.assertEqual(service.limiter.max_limit, 4)
+        # В итогах проверки выводится предел, которым ограничены асинхронные запросы
+        host = self.server.url.split('//')[1]
+        self.assertEqual(resilience_snapshot()[host]['limiter']['mode'], 'async')
+
+    @override_settings(EIAS_BATCH_SIZE=10)
+    def test_batch_requests_fail_fast(self):
+        with self.assertRaises(ImproperlyConfigured):
+            AsyncEIASAPIService()
+        with self.assertRaises(CommandError):
+            call_command('check_template_updates', '--async', stdout=StringIO())
+
+
+class SweepProfilerTests(SimpleTestCase):
+    """Замер фаз проверки"""
+
+    def test_nested_phases_of_interleaved_coroutines(self):
+        profiler = SweepProfiler()
+        profiler.enabled = True
+
+        async def check(code):
+            with profiler.phase('process', code):
+                await asyncio.sleep(0)
+                with profiler.phase('fetch', code):
+                    # Пока одна корутина ждет ответа, другая открывает и закрывает свои фазы
+                    await asyncio.sleep(0.02)
+
+        async def sweep():
+            await asyncio.gather(check('FORM.1'), check('FORM.2'))
+
+        asyncio.run(sweep())
+
+        report = {code: phases for code, total, phases in profiler.template_report()}
+        self.assertEqual(set(report), {'FORM.1', 'FORM.2'})
+        for code, phases in report.items():
+            with self.subTest(template=code):
+                self.assertGreaterEqual(phases['fetch'], 0.02)
+                # Время вложенной фазы вычтено из внешней фазы той же корутины
+                self.assertLess(phases['process'], 0.01)
+        self.assertEqual(profiler._stack.get(), ())
+
+    def test_disabled_profiler_records_nothing(self):
+        profiler = SweepProfiler()
+        with profiler.phase('fetch', 'FORM.1'):
+            pass
+        self.assertEqual(profiler.phase_report(), [])
+
+
+class BenchmarkSweepResultsTests(SimpleTestCase):
+    """Таблица результатов benchmark_sweep"""
+
+    def test_failed_and_empty_runs_are_listed(self):
+        stdout = StringIO()
+        options = {'templates': 10, 'latency': 50, 'error_rate': 0, 'xml_rows': 0,
+                   'change_rate': 0.05, 'validation_rate': 0.5}
+        results = [
+            {'mode': 'sync', 'workers': 1, 'eias_batch': 1, 'stats': None, 'p50': 0, 'p99': 0,
+             'eias_requests': 0, 'webhook_requests': 0},
+            {'mode': 'async', 'workers': 8, 'eias_batch': 1, 'error': 'нет соединения'},
+        ]
+        BenchmarkSweepCommand(stdout=stdout)._write_results(results, options)
+        output = stdout.getvalue()
+        self.assertIn('шаблоны не проверены', output)
+        self.assertIn('нет соединения', output)
+
+
+def make_response(status_code=200, text=''):
+    """Ответ requests с заданным статусом и телом"""
+    response = requests.Response()
+    response.status_code = status_code
+    response.encoding = 'utf-8'
+    response._content = text.encode('utf-8')
+    return response
+
+
+@override_settings(EIAS_CACHE_ENABLED=False, EIAS_BATCH_SIZE=10, EIAS_BATCH_SEPARATOR=',')
+class BatchRequestTests(SimpleTestCase):
+    """Пакетные запросы к EIAS и переход на запросы по одному шаблону"""
+
+    def setUp(self):
+        self.addCleanup(services._batch_unsupported.clear)
+        services._batch_unsupported.clear()
+        self.service = EIASAPIService()
+        self.service.session = Mock()
+        # Ошибки этих тестов не должны размыкать выключатель, общий для хоста EIAS
+        self.service.breaker = CircuitBreaker('eias.test')
+        self.service.limiter = AdaptiveConcurrencyLimiter('eias.test', 8)
+        self.templates = [
+            Template(template_code=f'FORM.{number}', current_version='1.0') for number in range(1, 4)
+        ]
+        self.single_codes = []
+
+    def _reply(self, batch_response):
+        def get(url, params, **kwargs):
+            if ',' in params['P_TC']:
+                return batch_response
+            self.single_codes.append(params['P_TC'])
+            return make_response(text=build_response(version='3.0', template_code=params['P_TC']))
+        self.service.session.get.side_effect = get
+
+    def test_templates_missing_from_batch_requested_one_by_one(self):
+        self._reply(make_response(text=build_batch_update_info_response([
+            ('FORM.1', '2.0', VALIDATION_DESCRIPTION),
+            ('FORM.3', '1.0', PLAIN_DESCRIPTION),
+        ])))
+        results = self.service.get_templates_info(self.templates)
+
+        self.assertEqual({code: info.version for code, info in results.items()},
+                         {'FORM.1': '2.0', 'FORM.2': '3.0', 'FORM.3': '1.0'})
+        self.assertEqual(self.single_codes, ['FORM.2'])
+        self.assertTrue(self.service.batch_enabled)
+
+    def test_client_error_disables_batch_once(self):
+        self._reply(make_response(400, 'Bad Request'))
+        with self.assertLogs('templates.services', 'WARNING') as logs:
+            results = self.service.get_templates_info(self.templates)
+            self.service.get_templates_info(self.templates)
+
+        self.assertTrue(all(info.version == '3.0' for info in results.values()))
+        self.assertFalse(self.service.batch_enabled)
+        # Пакетный запрос отправлен один раз, дальше - только запросы по одному шаблону
+        batch_calls = [call for call in self.service.session.get.call_args_list if ',' in call.kwargs['params']['P_TC']]
+        self.assertEqual(len(batch_calls), 1)
+        self.assertEqual(len(self.single_codes), 6)
+        self.assertEqual(len([line for line in logs.output if 'пакетные запросы' in line]), 1)
+        # Выключение общее для всех экземпляров сервиса с тем же адресом
+        self.assertFalse(EIASAPIService().batch_enabled)
+
+    def test_server_error_keeps_batch_enabled(self):
+        self._reply(make_response(503, 'Service Unavailable'))
+        results = self.service._get_batch_info(self.templates)
+        self.assertEqual(results, dict.fromkeys(['FORM.1', 'FORM.2', 'FORM.3']))
+        self.assertTrue(self.service.batch_enabled)
+
+    def test_decode_error_keeps_batch_enabled(self):
+        response = make_response()
+        response._content = b'\xff\xfe<broken'
+        self._reply(response)
+        results = self.service._get_batch_info(self.templates)
+        self.assertEqual(results, dict.fromkeys(['FORM.1', 'FORM.2', 'FORM.3']))
+        self.assertTrue(self.service.batch_enabled)
+
+
+class UpdateInfoParserTests(SimpleTestCase):
+    """Потоковый разбор ответов EIAS совпадает с разбором через полное дерево"""
+
+    def test_parity_with_tree(self):
+        variants = {
+            'namespace, поля в начале': build_response(50),
+            'namespace, поля в конце': build_response(50, position='end'),
+            'без namespace': build_response(50, namespace=''),
+            'без изменений в проверках': build_response(50, description=PLAIN_DESCRIPTION),
+        }
+        for name, xml_text in variants.items():
+            with self.subTest(variant=name):
+                self.assertEqual(parse_update_info(xml_text), parse_with_tree(xml_text))
+
+    def test_parity_with_tree_large_response(self):
+        for position in ('start', 'end'):
+            xml_text = build_response(2000, position=position)
+            self.assertGreater(len(xml_text), STREAM_PREFIX_SIZE)
+            with self.subTest(position=position):
+                self.assertEqual(parse_update_info(xml_text), parse_with_tree(xml_text))
+
+    def test_late_fields_fall_back_to_tree(self):
+        xml_text = build_response(2000, position='end')
+        with patch('templates.xml_parser.ET.XMLPullParser') as pull_parser:
+            self.assertEqual(parse_update_info(xml_text), parse_with_tree(xml_text))
+        pull_parser.assert_not_called()
+
+    def test_missing_field(self):
+        xml_text = build_response(5).replace('DESCRIPTION_UPDATE', 'COMMENT')
+        with self.assertRaises(ValueError):
+            parse_update_info(xml_text)
+
+    def test_batch_response(self):
+        xml_text = build_batch_update_info_response([
+            ('FORM.1', '1.1', VALIDATION_DESCRIPTION),
+            ('FORM.2', '2.0', PLAIN_DESCRIPTION),
+        ])
+        self.assertEqual(parse_update_info_batch(xml_text), {
+            'FORM.1': {'VERSION': '1.1', 'DESCRIPTION_UPDATE': VALIDATION_DESCRIPTION},
+            'FORM.2': {'VERSION': '2.0', 'DESCRIPTION_UPDATE': PLAIN_DESCRIPTION},
+        })
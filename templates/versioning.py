@@ -0,0 +1,130 @@
+import re
+from typing import List, Optional, Tuple
+
+# Допустимые символы версии: цифры, латинские буквы и разделители (точка, дефис,
+# подчеркивание, пробел). Версия с другими символами (1.2а с кириллицей, 1.2 (испр.))
+# не разбирается, иначе эти символы терялись бы и 1.2а совпадала бы с 1.2
+_VERSION_RE = re.compile(r'[0-9a-z._\-\s]+', re.ASCII)
+# Части версии: числа и слова из латинских букв
+_TOKEN_RE = re.compile(r'[0-9]+|[a-z]+')
+
+# Необязательный префикс версии: v1.2, ver. 1.2, version 1.2
+_PREFIXES = {'v', 'ver', 'version'}
+
+# Предварительные выпуски (раньше выпуска с тем же номером) и их порядок между собой
+_PRE_RELEASE = {
+    'dev': 0,
+    'a': 1, 'alpha': 1,
+    'b': 2, 'beta': 2,
+    'c': 3, 'rc': 3, 'pre': 3, 'preview': 3,
+}
+# Исправления выпуска (позже выпуска с тем же номером)
+_POST_RELEASE = {'post', 'p', 'patch', 'r', 'rev', 'fix', 'hotfix'}
+
+# Длина ключа сортировки (поля version_key и new_version_key)
+SORT_KEY_MAX_LENGTH = 128
+
+
+def parse_version(version: str) -> Optional[Tuple[Tuple[int, ...], Optional[Tuple[int, int]], Optional[int]]]:
+    """
+    Разбирает строку версии
+
+    Поддерживаются числовые версии с разделителями ".", "-", "_" и пробелом (1.2,
+    1.2.0, 2026-01, v1.2), за которыми может следовать предварительный выпуск (1.2rc1, 1.2-beta,
+    1.2.dev3) и исправление (1.2-post1, 1.2 patch 2). Нули в конце номера не
+    значимы: 1.2 и 1.2.0 - одна версия.
+
+    Args:
+        version: Строка версии
+
+    Returns:
+        Кортеж (номер выпуска, (порядок предварительного выпуска, номер) или None,
+        номер исправления или None) либо None, если строка не является версией
+        этого формата
+    """
+    version = version.lower()
+    if not _VERSION_RE.fullmatch(version):
+        return None
+    tokens = _TOKEN_RE.findall(version)
+    if tokens and tokens[0] in _PREFIXES:
+        tokens = tokens[1:]
+
+    release: List[int] = []
+    while tokens and tokens[0].isdigit():
+        release.append(int(tokens.pop(0)))
+    if not release:
+        return None
+    while release and release[-1] == 0:
+        release.pop()
+
+    def take_number():
+        return int(tokens.pop(0)) if tokens and tokens[0].isdigit() else 0
+
+    pre = post = None
+    if tokens and tokens[0] in _PRE_RELEASE:
+        pre = (_PRE_RELEASE[tokens.pop(0)], take_number())
+    if tokens and tokens[0] in _POST_RELEASE:
+        tokens.pop(0)
+        post = take_number()
+    if tokens:
+        return None
+    return tuple(release), pre, post
+
+
+def _encode_number(number: int) -> str:
+    # Длина числа перед цифрами: строки сравниваются так же, как числа
+    digits = str(number)
+    return f'{len(digits):02d}{digits}'
+
+
+def version_sort_key(version: str) -> str:
+    """
+    Вычисляет ключ сортировки версии
+
+    Ключ состоит только из цифр, поэтому сравнение ключей как строк (в Python
+    и в БД при любой сортировке) совпадает со сравнением версий: 1.10 > 1.9,
+    1.2rc1 < 1.2 < 1.2.post1, у 1.2 и v1.2.0 ключи равны. Ключ хранится рядом с
+    версией и индексируется, чтобы выбирать и сравнивать версии в запросе к БД.
+
+    Args:
+        version: Строка версии
+
+    Returns:
+        Ключ сортировки или пустая строка, если версию не удалось разобрать
+    """
+    parsed = parse_version(version or '')
+    if parsed is None:
+        return ''
+    release, pre, post = parsed
+
+    # Номер выпуска, затем маркер 00 (меньше длины любого числа) и вид выпуска:
+    # 1 - предварительный, 2 - обычный, 3 - с исправлением
+    key = ''.join(_encode_number(number) for number in release) + '00'
+    if pre is not None:
+        key += f'1{pre[0]}{_encode_number(pre[1])}'
+    else:
+        key += '2'
+    if post is not None:
+        key += f'3{_encode_number(post)}'
+    return key if len(key) <= SORT_KEY_MAX_LENGTH else ''
+
+
+def is_newer(version: str, current: str, current_key: Optional[str] = None) -> bool:
+    """
+    Проверяет, новее ли версия текущей
+
+    Понижение версии и та же версия в другой записи (1.2 и 1.2.0) новой версией
+    не считаются. Если одну из версий разобрать не удалось, новой считается
+    любая отличающаяся версия.
+
+    Args:
+        version: Проверяемая версия (например, из ответа EIAS)
+        current: Текущая версия
+        current_key: Сохраненный ключ сортировки текущей версии (чтобы не вычислять повторно)
+    """
+    if current_key is None:
+        current_key = version_sort_key(current)
+    key = version_sort_key(version)
+    if key and current_key:
+        return key > current_key
+    return version.strip() != current.strip()
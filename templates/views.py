@@ -1,3 +1,96 @@
-from django.shortcuts import render
+import hmac
+import ipaddress
+import logging
+import xml.etree.ElementTree as ET
 
-# Create your views here.
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest
+
+from .metrics import TemplateStatsCollector
+from .push import enqueue_push
+
+logger = logging.getLogger(__name__)
+
+# Показатели из БД запрашиваются не чаще раза в METRICS_DB_CACHE_TTL секунд
+_db_registry = CollectorRegistry()
+_db_registry.register(TemplateStatsCollector())
+
+
+def _bearer_token_valid(request, expected: str) -> bool:
+    """Совпадает ли токен из заголовка Authorization: Bearer с ожидаемым"""
+    authorization = request.headers.get('Authorization', '')
+    token = authorization[7:] if authorization.startswith('Bearer ') else ''
+    return hmac.compare_digest(token.encode(), expected.encode())
+
+
+def _address_allowed(address: str, networks) -> bool:
+    """Входит ли адрес клиента в один из адресов или подсетей"""
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    for network in networks:
+        try:
+            if address in ipaddress.ip_network(network.strip(), strict=False):
+                return True
+        except ValueError:
+            logger.error(f'Некорректный адрес в METRICS_ALLOWED_IPS: {network}')
+    return False
+
+
+@require_GET
+def metrics(request):
+    """
+    Метрики в формате Prometheus
+
+    Возвращает показатели очереди проверок и уведомлений из БД и метрики
+    последнего прохода проверки, выгруженные процессом cron или run_monitor
+    в METRICS_TEXTFILE. Доступны клиентам из METRICS_ALLOWED_IPS или с
+    токеном METRICS_TOKEN в заголовке Authorization: Bearer.
+    """
+    allowed = _address_allowed(request.META.get('REMOTE_ADDR', ''), settings.METRICS_ALLOWED_IPS) or (
+        settings.METRICS_TOKEN and _bearer_token_valid(request, settings.METRICS_TOKEN)
+    )
+    if not allowed:
+        return HttpResponse('Доступ запрещен', status=403, content_type='text/plain; charset=utf-8')
+
+    output = generate_latest(_db_registry)
+    if settings.METRICS_TEXTFILE:
+        try:
+            with open(settings.METRICS_TEXTFILE, 'rb') as textfile:
+                output += textfile.read()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f'Ошибка чтения метрик из {settings.METRICS_TEXTFILE}: {e}')
+    return HttpResponse(output, content_type=CONTENT_TYPE_LATEST)
+
+
+@csrf_exempt
+@require_POST
+def push(request):
+    """
+    Прием уведомлений EIAS о новых версиях шаблонов
+
+    Тело запроса - XML в формате ответа GET_UPDATE_INFO (пакетный или по одному
+    шаблону с кодом в параметре P_TC). События ставятся в очередь и
+    обрабатываются командой process_push_events или run_monitor, ответ 202
+    возвращается сразу после сохранения. Запрос должен содержать заголовок
+    Authorization: Bearer <PUSH_TOKEN>; без PUSH_TOKEN прием выключен.
+    """
+    if not settings.PUSH_TOKEN:
+        raise Http404
+    if not _bearer_token_valid(request, settings.PUSH_TOKEN):
+        return JsonResponse({'error': 'Неверный токен'}, status=401)
+
+    try:
+        xml_text = request.body.decode(request.encoding or 'utf-8')
+        accepted = enqueue_push(xml_text, request.GET.get('P_TC') or None)
+    except (ET.ParseError, ValueError) as e:
+        # UnicodeDecodeError - тоже ValueError
+        logger.warning(f'Некорректное входящее уведомление: {e}')
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'accepted': accepted}, status=202)
@@ -0,0 +1,160 @@
+import xml.etree.ElementTree as ET
+from typing import Dict
+
+# Поля ответа GET_UPDATE_INFO, которые нужны для проверки шаблона
+UPDATE_INFO_FIELDS = ('VERSION', 'DESCRIPTION_UPDATE')
+
+# Размер порции текста, подаваемой парсеру за один раз
+FEED_CHUNK_SIZE = 8 * 1024
+
+# Сколько текста разбирать потоково; если поля не найдены раньше, быстрее разобрать
+# ответ целиком через C-реализацию ElementTree, чем обрабатывать события в Python
+STREAM_PREFIX_SIZE = 16 * 1024
+
+
+def _parse_tree(xml_text: str, fields) -> Dict[str, str]:
+    """Разбор через полное дерево (для ответов, где поля далеко от начала)"""
+    root = ET.fromstring(xml_text)
+    namespace = root.tag.split('}')[0][1:] if '}' in root.tag else ''
+    result = {}
+    for field in fields:
+        element = root.find(f'.//{{{namespace}}}{field}')
+        if element is None:
+            raise ValueError(f'В ответе нет элемента {field}')
+        result[field] = element.text
+    return result
+
+
+def parse_update_info(xml_text: str, fields=UPDATE_INFO_FIELDS) -> Dict[str, str]:
+    """
+    Извлекает поля из XML ответа API EIAS за один потоковый проход
+
+    Результат совпадает с root.find('.//{ns}FIELD').text, где ns - namespace
+    корневого элемента: берется первый в порядке документа потомок корня с
+    нужным именем. Разбор прекращается, как только получены все поля, поэтому
+    хвост больших ответов (P_EXTENDED_INFO) не разбирается и ошибки в нем не
+    обнаруживаются. Потоковый разбор выгоден, только если поля в начале ответа
+    (так отвечает EIAS: TEMPLATE перед EXTENDED_INFO). Если имен полей нет в
+    первых STREAM_PREFIX_SIZE символах, первый дочерний элемент корня закрыт
+    без них или они не найдены в первых STREAM_PREFIX_SIZE символах, ответ
+    разбирается целиком через дерево: события обрабатываются в Python
+    медленнее C-реализации, и дочитывать ответ потоково дороже, чем
+    разобрать его заново.
+
+    Args:
+        xml_text: XML текст ответа
+        fields: Имена элементов без namespace
+
+    Returns:
+        Словарь {имя элемента: текст элемента}
+
+    Raises:
+        ET.ParseError: Если XML некорректен до того, как найдены все поля
+        ValueError: Если какого-либо элемента нет в ответе
+    """
+    # Имен полей нет даже в тексте начала ответа - сразу разбираем через дерево
+    if len(xml_text) > STREAM_PREFIX_SIZE and any(
+        xml_text.find(f'{field}>', 0, STREAM_PREFIX_SIZE) < 0 for field in fields
+    ):
+        return _parse_tree(xml_text, fields)
+
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    wanted = None
+    root = None
+    # Элементы, найденные по событию start (порядок документа), текст берем по событию end
+    found = {}
+    result = {}
+    depth = 0
+
+    for offset in range(0, len(xml_text), FEED_CHUNK_SIZE):
+        if offset >= STREAM_PREFIX_SIZE:
+            return _parse_tree(xml_text, fields)
+        parser.feed(xml_text[offset:offset + FEED_CHUNK_SIZE])
+        for event, element in parser.read_events():
+            if event == 'start':
+                depth += 1
+                if root is None:
+                    root = element
+                    namespace = root.tag.split('}')[0][1:] if '}' in root.tag else ''
+                    wanted = {f'{{{namespace}}}{field}' if namespace else field: field for field in fields}
+                    continue
+                field = wanted.get(element.tag)
+                if field is not None and field not in found:
+                    found[field] = element
+            elif element is not root:
+                depth -= 1
+                field = wanted.get(element.tag)
+                if field is not None and found.get(field) is element:
+                    result[field] = element.text
+                    if len(result) == len(fields):
+                        return result
+                elif depth == 1 and len(xml_text) > offset + FEED_CHUNK_SIZE:
+                    # Первый дочерний элемент корня разобран, а полей в нем нет
+                    return _parse_tree(xml_text, fields)
+                else:
+                    # Освобождаем память от уже ненужных элементов
+                    element.clear()
+
+    parser.close()
+    missing = [field for field in fields if field not in result]
+    raise ValueError(f'В ответе нет элементов: {", ".join(missing)}')
+
+
+def parse_update_info_batch(xml_text: str, fields=UPDATE_INFO_FIELDS) -> Dict[str, Dict[str, str]]:
+    """
+    Извлекает поля шаблонов из пакетного XML ответа API EIAS
+
+    Пакетный ответ содержит по элементу TEMPLATE (прямой потомок корня) на
+    каждый шаблон, код шаблона - в дочернем элементе CODE. Элементы
+    освобождаются сразу после разбора, поэтому память не зависит от
+    количества шаблонов в ответе. Шаблоны, в которых нет какого-либо из полей,
+    в результат не попадают.
+
+    Args:
+        xml_text: XML текст ответа
+        fields: Имена дочерних элементов TEMPLATE без namespace
+
+    Returns:
+        Словарь {код шаблона: {имя элемента: текст элемента}}
+
+    Raises:
+        ET.ParseError: Если XML некорректен
+        ValueError: Если в ответе нет ни одного элемента TEMPLATE с кодом
+            (ответ не в пакетном формате)
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    root = None
+    depth = 0
+    result = {}
+    found_templates = False
+
+    for offset in range(0, len(xml_text), FEED_CHUNK_SIZE):
+        parser.feed(xml_text[offset:offset + FEED_CHUNK_SIZE])
+        for event, element in parser.read_events():
+            if event == 'start':
+                depth += 1
+                if root is None:
+                    root = element
+                    namespace = root.tag.split('}')[0][1:] if '}' in root.tag else ''
+                    prefix = f'{{{namespace}}}' if namespace else ''
+                    template_tag = f'{prefix}TEMPLATE'
+                    code_tag = f'{prefix}CODE'
+                    wanted = {field: f'{prefix}{field}' for field in fields}
+                continue
+            depth -= 1
+            if depth != 1:
+                continue
+            # Прямой потомок корня разобран целиком
+            if element.tag == template_tag:
+                code = element.findtext(code_tag)
+                if code:
+                    found_templates = True
+                    values = {field: element.find(tag) for field, tag in wanted.items()}
+                    if all(value is not None for value in values.values()):
+                        result[code.strip()] = {field: value.text for field, value in values.items()}
+            element.clear()
+
+    parser.close()
+    if not found_templates:
+        raise ValueError('В ответе нет элементов TEMPLATE с кодом шаблона')
+    return result
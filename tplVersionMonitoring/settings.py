@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 import os
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 
 # Настройка кодировки для Windows
 os.environ.setdefault('PYTHONIOENCODING', 'utf-8')
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'templates',
 ]
 
@@ -130,12 +131,109 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Адаптивное расписание проверок шаблонов (интервалы в секундах)
+SCHEDULE_MIN_INTERVAL = config('SCHEDULE_MIN_INTERVAL', default=60, cast=int)
+SCHEDULE_MAX_INTERVAL = config('SCHEDULE_MAX_INTERVAL', default=6 * 60 * 60, cast=int)
+# Множитель интервала после каждой проверки без изменений
+SCHEDULE_BACKOFF = config('SCHEDULE_BACKOFF', default=1.5, cast=float)
+# Случайный разброс времени следующей проверки (доля интервала)
+SCHEDULE_JITTER = config('SCHEDULE_JITTER', default=0.1, cast=float)
+# Доля типичного промежутка между обновлениями шаблона, больше которой интервал не растет (0 - не учитывать)
+SCHEDULE_CADENCE_FRACTION = config('SCHEDULE_CADENCE_FRACTION', default=0.25, cast=float)
+
+# Аренда захваченных для проверки шаблонов в секундах (защита от наложения запусков)
+SWEEP_CLAIM_LEASE = config('SWEEP_CLAIM_LEASE', default=10 * 60, cast=int)
+
+# Количество шаблонов в одной транзакции записи результатов проверки
+SWEEP_DB_BATCH_SIZE = config('SWEEP_DB_BATCH_SIZE', default=500, cast=int)
+
+# Списки в админке: до этого числа записей показывается точное количество, для больших таблиц
+# без фильтров - оценка из статистики PostgreSQL, с фильтрами - "более ADMIN_COUNT_LIMIT"
+ADMIN_COUNT_LIMIT = config('ADMIN_COUNT_LIMIT', default=10000, cast=int)
+
+# Срок хранения отправленных логов обновлений в днях (0 - бессрочно), см. prune_update_logs
+UPDATELOG_RETENTION_DAYS = config('UPDATELOG_RETENTION_DAYS', default=365, cast=int)
+
+# Токен входящих уведомлений EIAS (POST /push, заголовок Authorization: Bearer <токен>).
+# Пустая строка - прием уведомлений выключен
+PUSH_TOKEN = config('PUSH_TOKEN', default='')
+
+# Файл для выгрузки метрик процесса проверки в формате Prometheus (пустая строка - не выгружать).
+# Каталог logs общий у контейнеров web и cron, файл отдается вместе с метриками по адресу /metrics
+METRICS_TEXTFILE = config('METRICS_TEXTFILE', default=str(BASE_DIR / 'logs' / 'sweep_metrics.prom'))
+
+# Доступ к /metrics: адреса и подсети клиентов (через запятую) и/или токен (заголовок
+# Authorization: Bearer <токен>). Запрос с другого адреса без верного токена отклоняется
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='127.0.0.1,::1', cast=Csv())
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Сколько секунд /metrics отдает показатели из БД без повторных запросов к ней
+METRICS_DB_CACHE_TTL = config('METRICS_DB_CACHE_TTL', default=30, cast=int)
+
+# HTTP settings
+# Размер пула keep-alive соединений на хост (должен быть не меньше EIAS_WORKERS)
+HTTP_POOL_SIZE = config('HTTP_POOL_SIZE', default=10, cast=int)
+
 # Mattermost settings
 MATTERMOST_WEBHOOK_URL = config('MATTERMOST_WEBHOOK_URL', default='')
 MATTERMOST_CHANNEL = config('MATTERMOST_CHANNEL', default='')
+# Сводные уведомления: максимум обновлений и символов в одном сообщении
+MATTERMOST_DIGEST_MAX_ITEMS = config('MATTERMOST_DIGEST_MAX_ITEMS', default=30, cast=int)
+MATTERMOST_DIGEST_MAX_CHARS = config('MATTERMOST_DIGEST_MAX_CHARS', default=12000, cast=int)
+# Сколько секунд ждать следующие обновления, прежде чем отправить неполную сводку
+MATTERMOST_DIGEST_LINGER = config('MATTERMOST_DIGEST_LINGER', default=5.0, cast=float)
+# Максимум сообщений в секунду (0 - без ограничения)
+MATTERMOST_RATE_LIMIT = config('MATTERMOST_RATE_LIMIT', default=1.0, cast=float)
+# Повторная отправка неотправленных уведомлений (секунды)
+OUTBOX_RETRY_BASE = config('OUTBOX_RETRY_BASE', default=60, cast=int)
+OUTBOX_RETRY_MAX = config('OUTBOX_RETRY_MAX', default=6 * 60 * 60, cast=int)
+# Аренда уведомления, взятого в отправку одним процессом
+OUTBOX_LEASE = config('OUTBOX_LEASE', default=10 * 60, cast=int)
 
 # EIAS API settings
 EIAS_API_BASE_URL = 'https://eias.ru/procwsxls/GET_UPDATE_INFO'
+# Количество параллельных запросов к API EIAS при проверке шаблонов (1 - последовательно)
+EIAS_WORKERS = config('EIAS_WORKERS', default=1, cast=int)
+# Асинхронная проверка (asyncio, aiohttp): включается по умолчанию для check_template_updates
+# и run_monitor, EIAS_ASYNC_CONCURRENCY - одновременных запросов к API EIAS в одном процессе
+SWEEP_ASYNC = config('SWEEP_ASYNC', default=False, cast=bool)
+EIAS_ASYNC_CONCURRENCY = config('EIAS_ASYNC_CONCURRENCY', default=100, cast=int)
+# Максимум одновременных запросов к одному хосту
+EIAS_MAX_PER_HOST = config('EIAS_MAX_PER_HOST', default=8, cast=int)
+# Пакетные запросы: до EIAS_BATCH_SIZE шаблонов в одном запросе GET_UPDATE_INFO (коды и версии
+# в P_TC и P_V через EIAS_BATCH_SEPARATOR), 0 - отдельный запрос на каждый шаблон. Если EIAS
+# отклоняет пакетный запрос, сервис до перезапуска переходит на запросы по одному шаблону
+EIAS_BATCH_SIZE = config('EIAS_BATCH_SIZE', default=0, cast=int)
+EIAS_BATCH_SEPARATOR = config('EIAS_BATCH_SEPARATOR', default=',')
+# Таймаут запроса к API EIAS в секундах
+EIAS_TIMEOUT = config('EIAS_TIMEOUT', default=30, cast=float)
+# Адаптивный предел одновременных запросов (AIMD): снижается в EIAS_CONCURRENCY_DECREASE раз,
+# если ответ дольше EIAS_TARGET_LATENCY секунд, и растет до EIAS_MAX_PER_HOST при быстрых ответах
+EIAS_TARGET_LATENCY = config('EIAS_TARGET_LATENCY', default=2.0, cast=float)
+EIAS_MIN_CONCURRENCY = config('EIAS_MIN_CONCURRENCY', default=1, cast=int)
+EIAS_CONCURRENCY_DECREASE = config('EIAS_CONCURRENCY_DECREASE', default=0.5, cast=float)
+# Выключатель: размыкается, если среди последних EIAS_BREAKER_WINDOW запросов (но не менее
+# EIAS_BREAKER_MIN_CALLS) доля отказов или ответов дольше EIAS_BREAKER_SLOW_CALL секунд
+# достигла порога, и пробует запросы снова через EIAS_BREAKER_OPEN_TIME секунд
+EIAS_BREAKER_WINDOW = config('EIAS_BREAKER_WINDOW', default=20, cast=int)
+EIAS_BREAKER_MIN_CALLS = config('EIAS_BREAKER_MIN_CALLS', default=10, cast=int)
+EIAS_BREAKER_FAILURE_RATE = config('EIAS_BREAKER_FAILURE_RATE', default=0.5, cast=float)
+EIAS_BREAKER_SLOW_CALL = config('EIAS_BREAKER_SLOW_CALL', default=10.0, cast=float)
+EIAS_BREAKER_SLOW_RATE = config('EIAS_BREAKER_SLOW_RATE', default=0.8, cast=float)
+EIAS_BREAKER_OPEN_TIME = config('EIAS_BREAKER_OPEN_TIME', default=60, cast=int)
+EIAS_BREAKER_HALF_OPEN_CALLS = config('EIAS_BREAKER_HALF_OPEN_CALLS', default=2, cast=int)
+# Дисковый кэш ответов API EIAS (ключ - код и версия шаблона)
+EIAS_CACHE_ENABLED = config('EIAS_CACHE_ENABLED', default=True, cast=bool)
+# Файл кэша (каталог cache в .gitignore; в контейнерах можно вынести в отдельный том)
+EIAS_CACHE_PATH = config('EIAS_CACHE_PATH', default=str(BASE_DIR / 'cache' / 'eias_responses.sqlite3'))
+# Время жизни записи кэша в секундах
+EIAS_CACHE_TTL = config('EIAS_CACHE_TTL', default=24 * 60 * 60, cast=int)
+# Максимум записей в кэше (старые вытесняются по LRU)
+EIAS_CACHE_MAX_ENTRIES = config('EIAS_CACHE_MAX_ENTRIES', default=20000, cast=int)
+# Классификация описаний обновлений: класс классификатора и JSON файл с правилами
+# (пустая строка - правила по умолчанию, см. templates/classification.py)
+UPDATE_CLASSIFIER = config('UPDATE_CLASSIFIER', default='templates.classification.RuleClassifier')
+UPDATE_CLASSIFIER_RULES = config('UPDATE_CLASSIFIER_RULES', default='')
 
 # Logging configuration
 import os